@@ -36,4 +36,5 @@ class Command(BaseCommand):
             courses=course_dirs,
             dis=do_import_static))
         import_from_xml(modulestore('direct'), data_dir, course_dirs, load_error_modules=False,
-                        static_content_store=contentstore(), verbose=True, do_import_static=do_import_static)
+                        static_content_store=contentstore(), verbose=True, do_import_static=do_import_static,
+                        bulk_write=True)
@@ -0,0 +1,141 @@
+"""
+Table recording the course imports and exports run in the background, and their progress.
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.db import models, transaction
+
+
+class ImportExportJob(models.Model):
+    """
+    A course import or export, run by a celery task.
+
+    The status views read the `stage` and `percent` of the job, which the task updates as it
+    goes, so they don't depend on which web worker (or session) started the job.
+    """
+    IMPORT = 'import'
+    EXPORT = 'export'
+    JOB_TYPES = (
+        (IMPORT, 'import'),
+        (EXPORT, 'export'),
+    )
+
+    QUEUED = 'queued'
+    IN_PROGRESS = 'in_progress'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATES = (
+        (QUEUED, 'queued'),
+        (IN_PROGRESS, 'in progress'),
+        (SUCCEEDED, 'succeeded'),
+        (FAILED, 'failed'),
+    )
+
+    # The stages of an import, as shown on the import page, and how much of the import is done
+    # when each starts (roughly, its share of the time)
+    IMPORT_UNPACKING = 1
+    IMPORT_VERIFYING = 2
+    IMPORT_UPDATING = 3
+    IMPORT_DONE = 4
+    IMPORT_STAGE_PERCENTS = {
+        IMPORT_UNPACKING: 5,
+        IMPORT_VERIFYING: 25,
+        IMPORT_UPDATING: 40,
+        IMPORT_DONE: 100,
+    }
+
+    # The stages of an export, and how much of the export is done when each starts
+    EXPORT_EXPORTING = 1
+    EXPORT_COMPRESSING = 2
+    EXPORT_DONE = 3
+    EXPORT_STAGE_PERCENTS = {
+        EXPORT_EXPORTING: 5,
+        EXPORT_COMPRESSING: 70,
+        EXPORT_DONE: 100,
+    }
+
+    job_type = models.CharField(max_length=8, choices=JOB_TYPES, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+    user = models.ForeignKey(User)
+    # the name of the uploaded tarball for imports, or of the tarball to download for exports
+    filename = models.CharField(max_length=255, blank=True)
+    # where the task reads the uploaded tarball from, or writes the exported one to
+    path = models.CharField(max_length=512, blank=True)
+    state = models.CharField(max_length=16, choices=STATES, default=QUEUED, db_index=True)
+    stage = models.PositiveSmallIntegerField(default=0)
+    percent = models.PositiveSmallIntegerField(default=0)
+    # JSON details of the job's failure, if any
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return u"{0} of {1} [{2}, stage {3}]".format(self.job_type, self.course_id, self.state, self.stage)
+
+    @classmethod
+    def create(cls, job_type, course_id, user, filename, path='', stage=0):
+        """
+        Create a queued job, committing it so the task can read it.
+        """
+        job = cls(job_type=job_type, course_id=course_id, user=user, filename=filename, path=path, stage=stage)
+        job.save_now()
+        return job
+
+    @classmethod
+    def latest(cls, job_type, course_id, user, filename=None):
+        """
+        Return the latest job of `job_type` that `user` started on the course (for the
+        given `filename`, if any), or None.
+        """
+        jobs = cls.objects.filter(job_type=job_type, course_id=course_id, user=user)
+        if filename is not None:
+            jobs = jobs.filter(filename=filename)
+        try:
+            return jobs.order_by('-id')[0]
+        except IndexError:
+            return None
+
+    def set_progress(self, stage):
+        """
+        Record that the job has reached `stage`, and the percentage of the job done by then.
+        """
+        stage_percents = self.IMPORT_STAGE_PERCENTS if self.job_type == self.IMPORT else self.EXPORT_STAGE_PERCENTS
+        self.state = self.IN_PROGRESS
+        self.stage = stage
+        self.percent = stage_percents[stage]
+        self.save_now()
+
+    def succeed(self, stage):
+        """
+        Record that the job finished, at its final `stage`.
+        """
+        self.state = self.SUCCEEDED
+        self.stage = stage
+        self.percent = 100
+        self.save_now()
+
+    def fail(self, message, **details):
+        """
+        Record that the job failed at its current stage, with an error `message` and any
+        other `details` the page needs to describe the failure.
+        """
+        details['message'] = message
+        self.state = self.FAILED
+        self.error = json.dumps(details)
+        self.save_now()
+
+    @transaction.autocommit
+    def save_now(self):
+        """
+        Write the job immediately, committing the transaction, so that the progress is
+        visible to the status views (and the job to the task) straight away.
+        """
+        self.save()
+
+    @property
+    def error_details(self):
+        """
+        The details of the job's failure, as a dict.
+        """
+        return json.loads(self.error) if self.error else {}
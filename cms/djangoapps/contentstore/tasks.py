@@ -0,0 +1,198 @@
+"""
+Celery tasks importing and exporting courses in the background.
+
+Both tasks record their progress in an ImportExportJob, which the import and export views
+read to report it. The uploaded tarball of an import, and the tarball an export creates,
+are kept under GITHUB_REPO_ROOT and COURSE_EXPORT_ROOT, which must be shared by the web
+and celery workers.
+"""
+import logging
+import os
+import shutil
+import tarfile
+from tempfile import mkdtemp
+
+from celery import task
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.utils.translation import ugettext_noop
+from path import path
+
+from auth.authz import create_all_course_groups
+from extract_tar import safetar_extractall
+from xmodule.contentstore.django import contentstore
+from xmodule.exceptions import SerializationError
+from xmodule.modulestore import Location
+from xmodule.modulestore.django import modulestore, loc_mapper
+from xmodule.modulestore.xml_exporter import export_to_xml
+from xmodule.modulestore.xml_importer import import_from_xml
+
+from contentstore.models import ImportExportJob
+
+
+log = logging.getLogger(__name__)
+
+
+def course_import_dir(location):
+    """
+    Return the directory the course at `location` is uploaded to and unpacked in.
+    """
+    course_subdir = "{0}-{1}-{2}".format(location.org, location.course, location.name)
+    return path(settings.GITHUB_REPO_ROOT) / course_subdir
+
+
+def _get_dir_for_fname(directory, filename):
+    """
+    Returns the dirpath for the first file found in the directory
+    with the given name.  If there is no file in the directory with
+    the specified name, return None.
+    """
+    for dirpath, _dirnames, filenames in os.walk(directory):
+        if filename in filenames:
+            return path(dirpath)
+    return None
+
+
+@task()  # pylint: disable=E1102
+def import_course(job_id, location_url):
+    """
+    Unpack the tarball uploaded for the ImportExportJob `job_id`, and import it into the
+    course at `location_url`.
+    """
+    job = ImportExportJob.objects.get(id=job_id)
+    old_location = Location(location_url)
+    course_dir = course_import_dir(old_location)
+
+    # Do everything from now on in a try-finally block to make sure
+    # everything is properly cleaned up.
+    try:
+        job.set_progress(ImportExportJob.IMPORT_UNPACKING)
+        tar_file = tarfile.open(job.path)
+        try:
+            safetar_extractall(tar_file, (course_dir + '/').encode('utf-8'))
+        except SuspiciousOperation as exc:
+            job.fail(
+                ugettext_noop('Unsafe tar file. Aborting import.'),
+                SuspiciousFileOperationMsg=exc.args[0]
+            )
+            return
+        finally:
+            tar_file.close()
+
+        job.set_progress(ImportExportJob.IMPORT_VERIFYING)
+
+        # find the 'course.xml' file
+        dirpath = _get_dir_for_fname(course_dir, "course.xml")
+        if not dirpath:
+            job.fail(ugettext_noop('Could not find the course.xml file in the package.'))
+            return
+
+        log.debug('found course.xml at {0}'.format(dirpath))
+
+        if dirpath != course_dir:
+            for fname in os.listdir(dirpath):
+                shutil.move(dirpath / fname, course_dir)
+
+        job.set_progress(ImportExportJob.IMPORT_UPDATING)
+
+        _module_store, course_items = import_from_xml(
+            modulestore('direct'),
+            settings.GITHUB_REPO_ROOT,
+            [course_dir.name],
+            load_error_modules=False,
+            static_content_store=contentstore(),
+            target_location_namespace=old_location,
+            draft_store=modulestore(),
+            bulk_write=True
+        )
+
+        log.debug('new course at {0}'.format(course_items[0].location))
+
+        create_all_course_groups(job.user, course_items[0].location)
+        log.debug('created all course groups at {0}'.format(course_items[0].location))
+
+        job.succeed(ImportExportJob.IMPORT_DONE)
+
+    # Record errors with the stage at which they occured.
+    except Exception as exception:   # pylint: disable=W0703
+        log.exception('Error importing course {0}'.format(old_location))
+        job.fail(str(exception))
+
+    finally:
+        shutil.rmtree(course_dir, ignore_errors=True)
+
+
+def _export_error_details(course_location, exc):
+    """
+    Return the url of the unit which holds the module that failed to export, if any.
+    """
+    try:
+        failed_item = modulestore().get_instance(course_location.course_id, exc.location)
+        parent_locs = modulestore().get_parent_locations(failed_item.location, course_location.course_id)
+        if len(parent_locs) > 0:
+            parent = modulestore().get_item(parent_locs[0])
+            unit_locator = loc_mapper().translate_location(course_location.course_id, parent.location, False, True)
+            return {
+                'has_unit': parent.location.category == 'vertical',
+                'edit_unit_url': unit_locator.url_reverse("unit"),
+            }
+    except:  # pylint: disable=W0702
+        # if we have a nested exception, then we'll show the more generic error message
+        pass
+    return {'has_unit': False, 'edit_unit_url': ''}
+
+
+def _remove_older_exports(job):
+    """
+    Remove the tarballs of the user's previous exports of the course.
+    """
+    previous_jobs = ImportExportJob.objects.filter(
+        job_type=ImportExportJob.EXPORT, course_id=job.course_id, user=job.user, id__lt=job.id
+    ).exclude(path='')
+    for previous_job in previous_jobs:
+        shutil.rmtree(os.path.dirname(previous_job.path), ignore_errors=True)
+        previous_job.path = ''
+        previous_job.save_now()
+
+
+@task()  # pylint: disable=E1102
+def export_course(job_id, location_url):
+    """
+    Export the course at `location_url` to a tarball, for the ImportExportJob `job_id`.
+    """
+    job = ImportExportJob.objects.get(id=job_id)
+    old_location = Location(location_url)
+    name = old_location.name
+    root_dir = path(mkdtemp())
+
+    try:
+        job.set_progress(ImportExportJob.EXPORT_EXPORTING)
+        try:
+            export_to_xml(modulestore('direct'), contentstore(), old_location, root_dir, name, modulestore())
+        except SerializationError as exc:
+            log.exception('There was an error exporting course {0}. {1}'.format(old_location, unicode(exc)))
+            job.fail(unicode(exc), **_export_error_details(old_location, exc))
+            return
+
+        job.set_progress(ImportExportJob.EXPORT_COMPRESSING)
+
+        export_dir = path(settings.COURSE_EXPORT_ROOT) / str(job.id)
+        if not export_dir.isdir():
+            os.makedirs(export_dir)
+        export_path = export_dir / job.filename
+
+        log.debug('tar file being generated at {0}'.format(export_path))
+        tar_file = tarfile.open(name=export_path, mode='w:gz')
+        tar_file.add(root_dir / name, arcname=name)
+        tar_file.close()
+
+        job.path = export_path
+        job.succeed(ImportExportJob.EXPORT_DONE)
+        _remove_older_exports(job)
+
+    except Exception as exc:  # pylint: disable=W0703
+        log.exception('There was an error exporting course {0}. {1}'.format(old_location, unicode(exc)))
+        job.fail(unicode(exc))
+
+    finally:
+        shutil.rmtree(root_dir, ignore_errors=True)
@@ -19,6 +19,9 @@ from xmodule.modulestore.django import loc_mapper
 
 from xmodule.contentstore.django import _CONTENTSTORE
 from xmodule.modulestore.tests.factories import ItemFactory
+from student.tests.factories import UserFactory
+
+from contentstore.models import ImportExportJob
 
 TEST_DATA_CONTENTSTORE = copy.deepcopy(settings.CONTENTSTORE)
 TEST_DATA_CONTENTSTORE['DOC_STORE_CONFIG']['db'] = 'test_xcontent_%s' % uuid4().hex
@@ -71,6 +74,18 @@ class ImportTestCase(CourseTestCase):
         MongoClient().drop_database(TEST_DATA_CONTENTSTORE['DOC_STORE_CONFIG']['db'])
         _CONTENTSTORE.clear()
 
+    def _import_status(self, tarpath):
+        """
+        Returns the status of the import of the tarball at `tarpath`.
+        """
+        resp_status = self.client.get(
+            self.new_location.url_reverse(
+                'import_status',
+                os.path.split(tarpath)[1]
+            )
+        )
+        return json.loads(resp_status.content)
+
     def test_no_coursexml(self):
         """
         Check that the response for a tar.gz import without a course.xml is
@@ -83,17 +98,14 @@ class ImportTestCase(CourseTestCase):
                     "name": self.bad_tar,
                     "course-data": [btar]
                 })
-        self.assertEquals(resp.status_code, 415)
+        # the import runs in the background, so the upload itself succeeds
+        self.assertEquals(resp.status_code, 200)
         # Check that `import_status` returns the appropriate stage (i.e., the
         # stage at which import failed).
-        resp_status = self.client.get(
-            self.new_location.url_reverse(
-                'import_status',
-                os.path.split(self.bad_tar)[1]
-            )
-        )
-
-        self.assertEquals(json.loads(resp_status.content)["ImportStatus"], 2)
+        status = self._import_status(self.bad_tar)
+        self.assertEquals(status["ImportStatus"], 2)
+        self.assertEquals(status["State"], "failed")
+        self.assertIn("course.xml", status["ErrMsg"])
 
     def test_with_coursexml(self):
         """
@@ -105,6 +117,16 @@ class ImportTestCase(CourseTestCase):
             resp = self.client.post(self.url, args)
 
         self.assertEquals(resp.status_code, 200)
+        status = self._import_status(self.good_tar)
+        self.assertEquals(status["ImportStatus"], 4)
+        self.assertEquals(status["State"], "succeeded")
+        self.assertEquals(status["Percent"], 100)
+
+    def test_status_without_import(self):
+        """
+        Check that `import_status` returns 0 for files which weren't uploaded.
+        """
+        self.assertEquals(self._import_status(self.good_tar), {"ImportStatus": 0})
 
     ## Unsafe tar methods #####################################################
     # Each of these methods creates a tarfile with a single type of unsafe
@@ -173,31 +195,23 @@ class ImportTestCase(CourseTestCase):
         outside or directly in the working directory,
             'special files' (character device, block device or FIFOs),
 
-        all raise exceptions/400s.
+        all fail the import while unpacking the file.
         """
 
         def try_tar(tarpath):
             with open(tarpath) as tar:
                 args = { "name": tarpath, "course-data": [tar] }
                 resp = self.client.post(self.url, args)
-            self.assertEquals(resp.status_code, 400)
-            self.assertTrue("SuspiciousFileOperation" in resp.content)
+            self.assertEquals(resp.status_code, 200)
+            status = self._import_status(tarpath)
+            self.assertEquals(status["ImportStatus"], 1)
+            self.assertEquals(status["State"], "failed")
+            self.assertIn("SuspiciousFileOperationMsg", status)
 
         try_tar(self._fifo_tar())
         try_tar(self._symlink_tar())
         try_tar(self._outside_tar())
         try_tar(self._outside_tar2())
-        # Check that `import_status` returns the appropriate stage (i.e.,
-        # either 3, indicating all previous steps are completed, or 0,
-        # indicating no upload in progress)
-        resp_status = self.client.get(
-            self.new_location.url_reverse(
-                'import_status',
-                os.path.split(self.good_tar)[1]
-            )
-        )
-        import_status = json.loads(resp_status.content)["ImportStatus"]
-        self.assertIn(import_status, (0, 3))
 
 
 @override_settings(CONTENTSTORE=TEST_DATA_CONTENTSTORE)
@@ -221,12 +235,57 @@ class ExportTestCase(CourseTestCase):
         self.assertEquals(resp.status_code, 200)
         self.assertContains(resp, "Export My Course Content")
 
-    def test_export_json_unsupported(self):
+    def test_export_status_without_export(self):
+        """
+        JSON returns the status of the latest export, if any.
+        """
+        resp = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        self.assertEquals(resp.status_code, 200)
+        self.assertEquals(json.loads(resp.content), {'ExportStatus': 0})
+
+    def test_export_background(self):
         """
-        JSON is unsupported.
+        Export in the background, then download the tar.gz file.
         """
+        resp = self.client.ajax_post(self.url, {})
+        self.assertEquals(resp.status_code, 200)
+        status = json.loads(resp.content)
+        self.assertEquals(status['ExportStatus'], 1)
+
+        # the export ran eagerly, so it's already done
+        resp = self.client.get(self.url, {'job': status['JobId']}, HTTP_ACCEPT='application/json')
+        status = json.loads(resp.content)
+        self.assertEquals(status['ExportStatus'], 3)
+        self.assertEquals(status['State'], 'succeeded')
+        # which is the latest export
         resp = self.client.get(self.url, HTTP_ACCEPT='application/json')
-        self.assertEquals(resp.status_code, 406)
+        self.assertEquals(json.loads(resp.content), status)
+
+        self._verify_export_succeeded(self.client.get(status['DownloadUrl']))
+
+    def test_export_background_failure(self):
+        """
+        Background export failure.
+        """
+        ItemFactory.create(parent_location=self.course.location, category='aawefawef')
+        resp = self.client.ajax_post(self.url, {})
+        resp = self.client.get(self.url, {'job': json.loads(resp.content)['JobId']}, HTTP_ACCEPT='application/json')
+        status = json.loads(resp.content)
+        self.assertEquals(status['State'], 'failed')
+        self.assertIn('Unable to create xml for module', status['ErrMsg'])
+
+        resp = self.client.get_html(status['ErrorUrl'])
+        self.assertContains(resp, 'Unable to create xml for module')
+
+    def test_export_other_users_job(self):
+        """
+        Users can only download their own exports.
+        """
+        resp = self.client.ajax_post(self.url, {})
+        job_id = json.loads(resp.content)['JobId']
+        ImportExportJob.objects.filter(id=job_id).update(user=UserFactory())
+        resp = self.client.get(self.url, {'_accept': 'application/x-tgz', 'job': job_id})
+        self.assertEquals(resp.status_code, 404)
 
     def test_export_targz(self):
         """
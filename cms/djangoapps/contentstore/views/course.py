@@ -18,7 +18,6 @@ from django.http import HttpResponseBadRequest, HttpResponseNotFound
 from util.json_request import JsonResponse
 from edxmako.shortcuts import render_to_response
 
-from xmodule.error_module import ErrorDescriptor
 from xmodule.modulestore.django import modulestore, loc_mapper
 from xmodule.modulestore.inheritance import own_metadata
 from xmodule.contentstore.content import StaticContent
@@ -128,7 +127,9 @@ def course_listing(request):
     """
     List all courses available to the logged in user
     """
-    courses = modulestore('direct').get_items(['i4x', None, None, 'course', None])
+    store = modulestore('direct')
+    # the summaries of the courses, so the listing doesn't load every course
+    courses = store.get_course_summaries()
 
     # filter out courses that we don't have access too
     def course_filter(course):
@@ -148,10 +149,14 @@ def course_listing(request):
         """
         return tuple of the data which the view requires for each course
         """
-        # published = false b/c studio manipulates draft versions not b/c the course isn't pub'd
-        course_loc = loc_mapper().translate_location(
-            course.location.course_id, course.location, published=False, add_entry_if_missing=True
-        )
+        if course.locator is None:
+            # published = false b/c studio manipulates draft versions not b/c the course isn't pub'd
+            course_loc = loc_mapper().translate_location(
+                course.location.course_id, course.location, published=False, add_entry_if_missing=True
+            )
+            store.set_course_summary_locator(course.id, course_loc.url())
+        else:
+            course_loc = BlockUsageLocator(url=course.locator)
         return (
             course.display_name,
             # note, couldn't get django reverse to work; so, wrote workaround
@@ -165,7 +170,7 @@ def course_listing(request):
         )
 
     return render_to_response('index.html', {
-        'courses': [format_course_for_view(c) for c in courses if not isinstance(c, ErrorDescriptor)],
+        'courses': [format_course_for_view(c) for c in courses],
         'user': request.user,
         'request_course_creator_url': reverse('contentstore.views.request_course_creator'),
         'course_creator_status': _get_course_creator_status(request.user),
@@ -4,37 +4,27 @@ courses
 """
 import logging
 import os
-import tarfile
-import shutil
 import re
-from tempfile import mkdtemp
-from path import path
 
-from django.conf import settings
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
 from django_future.csrf import ensure_csrf_cookie
 from django.core.servers.basehttp import FileWrapper
-from django.core.files.temp import NamedTemporaryFile
-from django.core.exceptions import SuspiciousOperation, PermissionDenied
+from django.core.exceptions import PermissionDenied
 from django.http import HttpResponseNotFound
 from django.views.decorators.http import require_http_methods, require_GET
 from django.utils.translation import ugettext as _
 
 from edxmako.shortcuts import render_to_response
-from auth.authz import create_all_course_groups
 
-from xmodule.modulestore.xml_importer import import_from_xml
-from xmodule.contentstore.django import contentstore
-from xmodule.modulestore.xml_exporter import export_to_xml
 from xmodule.modulestore.django import modulestore, loc_mapper
-from xmodule.exceptions import SerializationError
 
 from xmodule.modulestore.locator import BlockUsageLocator
 from .access import has_access
 
+from contentstore.models import ImportExportJob
+from contentstore.tasks import import_course, export_course, course_import_dir
 from util.json_request import JsonResponse
-from extract_tar import safetar_extractall
 
 
 __all__ = ['import_handler', 'import_status_handler', 'export_handler']
@@ -70,9 +60,7 @@ def import_handler(request, tag=None, course_id=None, branch=None, version_guid=
         if request.method == 'GET':
             raise NotImplementedError('coming soon')
         else:
-            data_root = path(settings.GITHUB_REPO_ROOT)
-            course_subdir = "{0}-{1}-{2}".format(old_location.org, old_location.course, old_location.name)
-            course_dir = data_root / course_subdir
+            course_dir = course_import_dir(old_location)
 
             filename = request.FILES['course-data'].name
             if not filename.endswith('.tar.gz'):
@@ -146,107 +134,15 @@ def import_handler(request, tag=None, course_id=None, branch=None, version_guid=
 
             else:   # This was the last chunk.
 
-                # Use sessions to keep info about import progress
-                session_status = request.session.setdefault("import_status", {})
-                key = location.course_id + filename
-                session_status[key] = 1
-                request.session.modified = True
-
-                # Do everything from now on in a try-finally block to make sure
-                # everything is properly cleaned up.
-                try:
-
-                    tar_file = tarfile.open(temp_filepath)
-                    try:
-                        safetar_extractall(tar_file, (course_dir + '/').encode('utf-8'))
-                    except SuspiciousOperation as exc:
-                        return JsonResponse(
-                            {
-                                'ErrMsg': 'Unsafe tar file. Aborting import.',
-                                'SuspiciousFileOperationMsg': exc.args[0],
-                                'Stage': 1
-                            },
-                            status=400
-                        )
-                    finally:
-                        tar_file.close()
-
-                    session_status[key] = 2
-                    request.session.modified = True
-
-                    # find the 'course.xml' file
-                    def get_all_files(directory):
-                        """
-                        For each file in the directory, yield a 2-tuple of (file-name,
-                        directory-path)
-                        """
-                        for dirpath, _dirnames, filenames in os.walk(directory):
-                            for filename in filenames:
-                                yield (filename, dirpath)
-
-                    def get_dir_for_fname(directory, filename):
-                        """
-                        Returns the dirpath for the first file found in the directory
-                        with the given name.  If there is no file in the directory with
-                        the specified name, return None.
-                        """
-                        for fname, dirpath in get_all_files(directory):
-                            if fname == filename:
-                                return dirpath
-                        return None
-
-                    fname = "course.xml"
-
-                    dirpath = get_dir_for_fname(course_dir, fname)
-
-                    if not dirpath:
-                        return JsonResponse(
-                            {
-
-                                'ErrMsg': _('Could not find the course.xml file in the package.'),
-                                'Stage': 2
-                            },
-                            status=415
-                        )
-
-                    logging.debug('found course.xml at {0}'.format(dirpath))
-
-                    if dirpath != course_dir:
-                        for fname in os.listdir(dirpath):
-                            shutil.move(dirpath / fname, course_dir)
-
-                    _module_store, course_items = import_from_xml(
-                        modulestore('direct'),
-                        settings.GITHUB_REPO_ROOT,
-                        [course_subdir],
-                        load_error_modules=False,
-                        static_content_store=contentstore(),
-                        target_location_namespace=old_location,
-                        draft_store=modulestore()
-                    )
-
-                    logging.debug('new course at {0}'.format(course_items[0].location))
-
-                    session_status[key] = 3
-                    request.session.modified = True
-
-                    create_all_course_groups(request.user, course_items[0].location)
-                    logging.debug('created all course groups at {0}'.format(course_items[0].location))
-
-                # Send errors to client with stage at which error occured.
-                except Exception as exception:   # pylint: disable=W0703
-                    return JsonResponse(
-                        {
-                            'ErrMsg': str(exception),
-                            'Stage': session_status[key]
-                        },
-                        status=400
-                    )
-
-                finally:
-                    shutil.rmtree(course_dir)
+                # Unpack and import the course in the background, recording its
+                # progress in a job which import_status_handler reports
+                job = ImportExportJob.create(
+                    ImportExportJob.IMPORT, location.course_id, request.user, filename,
+                    path=temp_filepath, stage=ImportExportJob.IMPORT_UNPACKING
+                )
+                import_course.delay(job.id, old_location.url())
 
-                return JsonResponse({'Status': 'OK'})
+                return JsonResponse({'Status': 'OK', 'ImportStatus': job.stage})
     elif request.method == 'GET':  # assume html
         course_module = modulestore().get_item(old_location)
         return render_to_response('import.html', {
@@ -263,38 +159,82 @@ def import_handler(request, tag=None, course_id=None, branch=None, version_guid=
 @login_required
 def import_status_handler(request, tag=None, course_id=None, branch=None, version_guid=None, block=None, filename=None):
     """
-    Returns an integer corresponding to the status of a file import. These are:
+    Returns an integer corresponding to the status of the latest import of the file. These are:
 
-        0 : No status info found (import done or upload still in progress)
+        0 : No status info found (upload still in progress)
         1 : Extracting file
         2 : Validating.
         3 : Importing to mongo
+        4 : Import done
 
+    along with the percentage of the import done and its state. If the import failed, the
+    status is the stage at which it failed, and the error message is returned as ErrMsg.
     """
     location = BlockUsageLocator(course_id=course_id, branch=branch, version_guid=version_guid, usage_id=block)
     if not has_access(request.user, location):
         raise PermissionDenied()
 
-    try:
-        session_status = request.session["import_status"]
-        status = session_status[location.course_id + filename]
-    except KeyError:
-        status = 0
+    job = ImportExportJob.latest(ImportExportJob.IMPORT, location.course_id, request.user, filename)
+    if job is None:
+        return JsonResponse({"ImportStatus": 0})
 
-    return JsonResponse({"ImportStatus": status})
+    status = {"ImportStatus": job.stage, "Percent": job.percent, "State": job.state}
+    if job.state == ImportExportJob.FAILED:
+        details = job.error_details
+        status['ErrMsg'] = _(details.pop('message'))
+        status.update(details)
+    return JsonResponse(status)
+
+
+def _export_status(job, location):
+    """
+    Returns the status of the export `job` (if any), for the export page to poll. The
+    ExportStatus is 0 without a job, then 1 while exporting, 2 while compressing and 3 when
+    the tarball is ready at DownloadUrl. If the export failed, the page at ErrorUrl describes
+    the error.
+    """
+    if job is None:
+        return {'ExportStatus': 0}
+
+    status = {'ExportStatus': job.stage, 'Percent': job.percent, 'State': job.state, 'JobId': job.id}
+    if job.state == ImportExportJob.SUCCEEDED:
+        status['DownloadUrl'] = location.url_reverse('export') + '?_accept=application/x-tgz&job={0}'.format(job.id)
+    elif job.state == ImportExportJob.FAILED:
+        status['ErrMsg'] = job.error_details.get('message', '')
+        status['ErrorUrl'] = location.url_reverse('export') + '?job={0}'.format(job.id)
+    return status
+
+
+def _export_error_response(course_module, location, job, export_url):
+    """
+    Returns the export page, describing why the export `job` failed.
+    """
+    details = job.error_details
+    return render_to_response('export.html', {
+        'context_course': course_module,
+        'in_err': True,
+        'raw_err_msg': details.get('message', ''),
+        'unit': details.get('has_unit', False),
+        'edit_unit_url': details.get('edit_unit_url', ''),
+        'course_home_url': location.url_reverse("course"),
+        'export_url': export_url
+    })
 
 
 @ensure_csrf_cookie
 @login_required
-@require_http_methods(("GET",))
+@require_http_methods(("GET", "POST"))
 def export_handler(request, tag=None, course_id=None, branch=None, version_guid=None, block=None):
     """
     The restful handler for exporting a course.
 
     GET
-        html: return html page for import page
-        application/x-tgz: return tar.gz file containing exported course
-        json: not supported
+        html: return html page for export page (describing the error of the export `job`, if given)
+        application/x-tgz: return tar.gz file of the export `job`, or, without a `job`, export
+            the course and return its tar.gz file
+        json: return the status of the export `job`, or of the latest export of the course
+    POST
+        json: start exporting the course in the background, and return the export's status
 
     Note that there are 2 ways to request the tar.gz file. The request header can specify
     application/x-tgz via HTTP_ACCEPT, or a query parameter can be used (?_accept=application/x-tgz).
@@ -313,75 +253,60 @@ def export_handler(request, tag=None, course_id=None, branch=None, version_guid=
     requested_format = request.REQUEST.get('_accept', request.META.get('HTTP_ACCEPT', 'text/html'))
 
     export_url = location.url_reverse('export') + '?_accept=application/x-tgz'
-    if 'application/x-tgz' in requested_format:
-        name = old_location.name
-        export_file = NamedTemporaryFile(prefix=name + '.', suffix=".tar.gz")
-        root_dir = path(mkdtemp())
 
+    if request.method == 'POST':
+        job = ImportExportJob.create(
+            ImportExportJob.EXPORT, location.course_id, request.user, old_location.name + '.tar.gz',
+            stage=ImportExportJob.EXPORT_EXPORTING
+        )
+        export_course.delay(job.id, old_location.url())
+        return JsonResponse(_export_status(job, location))
+
+    job = None
+    if 'job' in request.GET:
         try:
-            export_to_xml(modulestore('direct'), contentstore(), old_location, root_dir, name, modulestore())
+            job = ImportExportJob.objects.get(
+                id=request.GET['job'], job_type=ImportExportJob.EXPORT,
+                course_id=location.course_id, user=request.user
+            )
+        except (ImportExportJob.DoesNotExist, ValueError):
+            return HttpResponseNotFound()
 
-        except SerializationError, e:
-            logging.exception('There was an error exporting course {0}. {1}'.format(course_module.location, unicode(e)))
-            unit = None
-            failed_item = None
-            parent = None
-            try:
-                failed_item = modulestore().get_instance(course_module.location.course_id, e.location)
-                parent_locs = modulestore().get_parent_locations(failed_item.location, course_module.location.course_id)
-
-                if len(parent_locs) > 0:
-                    parent = modulestore().get_item(parent_locs[0])
-                    if parent.location.category == 'vertical':
-                        unit = parent
-            except:
-                # if we have a nested exception, then we'll show the more generic error message
-                pass
-
-            unit_locator = loc_mapper().translate_location(old_location.course_id, parent.location, False, True)
-
-            return render_to_response('export.html', {
-                'context_course': course_module,
-                'in_err': True,
-                'raw_err_msg': str(e),
-                'failed_module': failed_item,
-                'unit': unit,
-                'edit_unit_url': unit_locator.url_reverse("unit") if parent else "",
-                'course_home_url': location.url_reverse("course"),
-                'export_url': export_url
-
-            })
-        except Exception, e:
-            logging.exception('There was an error exporting course {0}. {1}'.format(course_module.location, unicode(e)))
-            return render_to_response('export.html', {
-                'context_course': course_module,
-                'in_err': True,
-                'unit': None,
-                'raw_err_msg': str(e),
-                'course_home_url': location.url_reverse("course"),
-                'export_url': export_url
-            })
-
-        logging.debug('tar file being generated at {0}'.format(export_file.name))
-        tar_file = tarfile.open(name=export_file.name, mode='w:gz')
-        tar_file.add(root_dir / name, arcname=name)
-        tar_file.close()
-
-        # remove temp dir
-        shutil.rmtree(root_dir / name)
-
-        wrapper = FileWrapper(export_file)
+    if 'application/x-tgz' in requested_format:
+        if job is None:
+            # export the course in this request
+            job = ImportExportJob.create(
+                ImportExportJob.EXPORT, location.course_id, request.user, old_location.name + '.tar.gz',
+                stage=ImportExportJob.EXPORT_EXPORTING
+            )
+            export_course(job.id, old_location.url())
+            job = ImportExportJob.objects.get(id=job.id)
+
+        if job.state == ImportExportJob.FAILED:
+            return _export_error_response(course_module, location, job, export_url)
+        if job.state != ImportExportJob.SUCCEEDED or not os.path.isfile(job.path):
+            return HttpResponseNotFound()
+
+        wrapper = FileWrapper(open(job.path, 'rb'))
         response = HttpResponse(wrapper, content_type='application/x-tgz')
-        response['Content-Disposition'] = 'attachment; filename=%s' % os.path.basename(export_file.name)
-        response['Content-Length'] = os.path.getsize(export_file.name)
+        response['Content-Disposition'] = 'attachment; filename=%s' % job.filename
+        response['Content-Length'] = os.path.getsize(job.path)
         return response
 
+    elif 'application/json' in requested_format:
+        if job is None:
+            job = ImportExportJob.latest(ImportExportJob.EXPORT, location.course_id, request.user)
+        return JsonResponse(_export_status(job, location))
+
     elif 'text/html' in requested_format:
+        if job is not None and job.state == ImportExportJob.FAILED:
+            return _export_error_response(course_module, location, job, export_url)
         return render_to_response('export.html', {
             'context_course': course_module,
-            'export_url': export_url
+            'export_url': export_url,
+            'export_status_url': location.url_reverse('export'),
         })
 
     else:
-        # Only HTML or x-tgz request formats are supported (no JSON).
+        # Only HTML, JSON or x-tgz request formats are supported.
         return HttpResponse(status=406)
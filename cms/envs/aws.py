@@ -98,6 +98,7 @@ if STATIC_URL_BASE:
 # GITHUB_REPO_ROOT is the base directory
 # for course data
 GITHUB_REPO_ROOT = ENV_TOKENS.get('GITHUB_REPO_ROOT', GITHUB_REPO_ROOT)
+COURSE_EXPORT_ROOT = ENV_TOKENS.get('COURSE_EXPORT_ROOT', path(GITHUB_REPO_ROOT) / 'exports')
 
 # STATIC_ROOT specifies the directory where static files are
 # collected
@@ -120,6 +121,10 @@ CACHES = ENV_TOKENS['CACHES']
 SESSION_COOKIE_DOMAIN = ENV_TOKENS.get('SESSION_COOKIE_DOMAIN')
 SESSION_ENGINE = ENV_TOKENS.get('SESSION_ENGINE', SESSION_ENGINE)
 
+MAKO_PRECOMPILED_DIR = ENV_TOKENS.get('MAKO_PRECOMPILED_DIR', MAKO_PRECOMPILED_DIR)
+MAKO_FILESYSTEM_CHECKS = ENV_TOKENS.get('MAKO_FILESYSTEM_CHECKS', MAKO_FILESYSTEM_CHECKS)
+MAKO_PRELOAD_TEMPLATES = ENV_TOKENS.get('MAKO_PRELOAD_TEMPLATES', MAKO_PRELOAD_TEMPLATES)
+
 # allow for environments to specify what cookie name our login subsystem should use
 # this is to fix a bug regarding simultaneous logins between edx.org and edge.edx.org which can
 # happen with some browsers (e.g. Firefox)
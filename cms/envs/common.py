@@ -75,6 +75,9 @@ ENV_ROOT = REPO_ROOT.dirname()  # virtualenv dir /mitx is in
 
 GITHUB_REPO_ROOT = ENV_ROOT / "data"
 
+# Where the tarballs of course exports are written, for the user to download
+COURSE_EXPORT_ROOT = GITHUB_REPO_ROOT / "exports"
+
 sys.path.append(REPO_ROOT)
 sys.path.append(PROJECT_ROOT / 'djangoapps')
 sys.path.append(PROJECT_ROOT / 'lib')
@@ -97,6 +100,14 @@ MAKO_TEMPLATES['main'] = [
 for namespace, template_dirs in lms.envs.common.MAKO_TEMPLATES.iteritems():
     MAKO_TEMPLATES['lms.' + namespace] = template_dirs
 
+# When set, the compiled templates are kept in a subdirectory of this directory for the version of the
+# templates, which the precompile_templates management command fills in ahead of time.
+MAKO_PRECOMPILED_DIR = None
+# Turn off to compile (or load) each template once, without checking whether it has changed on each lookup.
+MAKO_FILESYSTEM_CHECKS = True
+# The uris of the templates of each namespace to load when the process starts, e.g. {'main': ['main.html']}
+MAKO_PRELOAD_TEMPLATES = {}
+
 TEMPLATE_DIRS = MAKO_TEMPLATES['main']
 
 EDX_ROOT_URL = ''
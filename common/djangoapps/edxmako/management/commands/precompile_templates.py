@@ -0,0 +1,44 @@
+"""
+Compile all the mako templates ahead of time, into the directory of compiled templates
+the web processes share.
+
+With MAKO_PRECOMPILED_DIR set, the compiled templates are kept in a subdirectory of it named
+for the version of the templates, so this is run once per deploy, before the processes start.
+Processes serving the same templates then load the compiled modules instead of each compiling
+every template on its first use.
+"""
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import NoArgsCommand
+
+from edxmako.startup import create_lookup, get_module_directory, precompile_templates
+
+
+class Command(NoArgsCommand):
+    """
+    Management command to compile all the mako templates into their module directory.
+    """
+
+    help = "Compile all the mako templates into the directory of compiled templates."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--module_dir',
+                    action='store',
+                    dest='module_dir',
+                    default=None,
+                    help='Compile the templates into this directory, instead of the one from the settings'),
+    )
+
+    def handle_noargs(self, **options):
+        template_locations = settings.MAKO_TEMPLATES
+        module_directory = options['module_dir'] or get_module_directory(template_locations)
+
+        total_compiled = 0
+        for namespace in sorted(template_locations):
+            lookup = create_lookup(template_locations[namespace], module_directory)
+            compiled, failures = precompile_templates(lookup)
+            total_compiled += compiled
+            for uri, exc in failures:
+                self.stderr.write("Could not compile {0} of {1}: {2}\n".format(uri, namespace, exc))
+        self.stdout.write("Compiled {0} templates into {1}\n".format(total_compiled, module_directory))
@@ -12,14 +12,52 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import threading
+
 from django.template import RequestContext
-requestcontext = None
+
+# The context of the request each thread is handling.  Each thread of a multi-threaded
+# server handles its own request, so this can't be a module global.
+_request_context = threading.local()
+
+
+def get_template_request_context():
+    """
+    Returns the RequestContext of the current request, or None outside of a request.
+    """
+    return getattr(_request_context, 'context', None)
+
+
+def get_template_context_dictionary():
+    """
+    Returns the RequestContext of the current request, collapsed into a single dictionary
+    for mako, or None outside of a request.
+
+    The RequestContext is collapsed on the first call in each request, and the same dictionary
+    is returned for the rest of the request, so it must not be changed: copy it instead.
+    """
+    if getattr(_request_context, 'dictionary', None) is None:
+        context = get_template_request_context()
+        if context is None:
+            return None
+        dictionary = {}
+        for d in context:
+            dictionary.update(d)
+        _request_context.dictionary = dictionary
+    return _request_context.dictionary
 
 
 class MakoMiddleware(object):
 
     def process_request(self, request):
-        global requestcontext
-        requestcontext = RequestContext(request)
-        requestcontext['is_secure'] = request.is_secure()
-        requestcontext['site'] = request.get_host()
+        context = RequestContext(request)
+        context['is_secure'] = request.is_secure()
+        context['site'] = request.get_host()
+        _request_context.context = context
+        _request_context.dictionary = None
+
+    def process_response(self, request, response):
+        # don't leave the request's context to whatever the thread renders next
+        _request_context.context = None
+        _request_context.dictionary = None
+        return response
@@ -12,7 +12,6 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
-from django.template import Context
 from django.http import HttpResponse
 import logging
 
@@ -71,21 +70,15 @@ def marketing_link_context_processor(request):
 
 
 def render_to_string(template_name, dictionary, context=None, namespace='main'):
-    context_instance = Context(dictionary)
-    # add dictionary to context_instance
-    context_instance.update(dictionary or {})
-    # collapse context_instance to a single dictionary for mako
-    context_dictionary = {}
-    context_instance['settings'] = settings
-    context_instance['EDX_ROOT_URL'] = settings.EDX_ROOT_URL
-    context_instance['marketing_link'] = marketing_link
-
+    # The request's context is collapsed to a single dictionary once per request, since modules
+    # render many templates per request: each call copies it, and adds its own values over it.
     # In various testing contexts, there might not be a current request context.
-    if edxmako.middleware.requestcontext is not None:
-        for d in edxmako.middleware.requestcontext:
-            context_dictionary.update(d)
-    for d in context_instance:
-        context_dictionary.update(d)
+    context_dictionary = dict(edxmako.middleware.get_template_context_dictionary() or {})
+    if dictionary:
+        context_dictionary.update(dictionary)
+    context_dictionary['settings'] = settings
+    context_dictionary['EDX_ROOT_URL'] = settings.EDX_ROOT_URL
+    context_dictionary['marketing_link'] = marketing_link
     if context:
         context_dictionary.update(context)
     # fetch and render template
@@ -1,6 +1,9 @@
 """
 Initialize the mako template lookup
 """
+import hashlib
+import logging
+import os
 
 import tempdir
 from django.conf import settings
@@ -8,26 +11,130 @@ from mako.lookup import TemplateLookup
 
 import edxmako
 
+log = logging.getLogger(__name__)
+
+# The options of the lookups of all the namespaces.  These change the compiled templates,
+# so they are part of the version of the precompiled templates.
+LOOKUP_OPTIONS = {
+    'output_encoding': 'utf-8',
+    'input_encoding': 'utf-8',
+    'default_filters': ['decode.utf8'],
+    'encoding_errors': 'replace',
+}
+
 
 def run():
     """Setup mako variables and lookup object"""
     # Set all mako variables based on django settings
     template_locations = settings.MAKO_TEMPLATES
-    module_directory = getattr(settings, 'MAKO_MODULE_DIR', None)
-
-    if module_directory is None:
-        module_directory = tempdir.mkdtemp_clean()
+    module_directory = get_module_directory(template_locations)
+    # Without filesystem checks, a template is compiled (or loaded from the module directory)
+    # once, and isn't checked for changes on each lookup.
+    filesystem_checks = getattr(settings, 'MAKO_FILESYSTEM_CHECKS', True)
 
     lookup = {}
 
     for location in template_locations:
-        lookup[location] = TemplateLookup(
-            directories=template_locations[location],
-            module_directory=module_directory,
-            output_encoding='utf-8',
-            input_encoding='utf-8',
-            default_filters=['decode.utf8'],
-            encoding_errors='replace',
-        )
+        lookup[location] = create_lookup(template_locations[location], module_directory, filesystem_checks)
 
     edxmako.lookup = lookup
+
+    preload_templates(getattr(settings, 'MAKO_PRELOAD_TEMPLATES', {}))
+
+
+def create_lookup(directories, module_directory, filesystem_checks=True):
+    """
+    Returns the TemplateLookup of the templates in `directories`, compiled into `module_directory`.
+    """
+    return TemplateLookup(
+        directories=directories,
+        module_directory=module_directory,
+        filesystem_checks=filesystem_checks,
+        **LOOKUP_OPTIONS
+    )
+
+
+def get_module_directory(template_locations):
+    """
+    Returns the directory to keep the compiled templates of `template_locations` in.
+
+    If MAKO_PRECOMPILED_DIR is set, this is the subdirectory of it for the current version of
+    the templates, which the precompile_templates command fills in, and which all the processes
+    running the same templates share.  Otherwise, it is MAKO_MODULE_DIR, or a new temporary directory.
+    """
+    precompiled_directory = getattr(settings, 'MAKO_PRECOMPILED_DIR', None)
+    if precompiled_directory is not None:
+        module_directory = os.path.join(precompiled_directory, templates_version(template_locations))
+        if not os.path.isdir(module_directory):
+            log.warning("Mako templates have not been precompiled into %s: they will be compiled on first use",
+                        module_directory)
+        return module_directory
+
+    module_directory = getattr(settings, 'MAKO_MODULE_DIR', None)
+    if module_directory is None:
+        module_directory = tempdir.mkdtemp_clean()
+    return module_directory
+
+
+def template_uris(directories):
+    """
+    Returns the sorted uris of the templates in `directories`, which are their paths relative to their directory.
+    """
+    uris = set()
+    for directory in directories:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            # skip hidden directories and files, like .git and editors' swap files
+            dirnames[:] = [dirname for dirname in dirnames if not dirname.startswith('.')]
+            for filename in filenames:
+                if not filename.startswith('.'):
+                    uris.add(os.path.relpath(os.path.join(dirpath, filename), directory))
+    return sorted(uris)
+
+
+def templates_version(template_locations):
+    """
+    Returns a digest of the contents of the templates of `template_locations`, and of how they are compiled.
+
+    Only the templates' contents and paths relative to their directories are included, so that
+    checkouts of the same templates at different times and places have the same version.
+    """
+    digest = hashlib.sha1(repr(sorted(LOOKUP_OPTIONS.items())))
+    for namespace in sorted(template_locations):
+        for index, directory in enumerate(template_locations[namespace]):
+            for uri in template_uris([directory]):
+                with open(os.path.join(directory, uri), 'rb') as template_file:
+                    content_digest = hashlib.sha1(template_file.read()).hexdigest()
+                digest.update(repr((namespace, index, uri, content_digest)))
+    return digest.hexdigest()
+
+
+def precompile_templates(lookup):
+    """
+    Compiles all the templates of the TemplateLookup `lookup` into its module directory.
+
+    Returns the number of templates compiled, and a list of (uri, exception) of the files
+    which could not be compiled (template directories contain some files which aren't mako templates).
+    """
+    compiled = 0
+    failures = []
+    for uri in template_uris(lookup.directories):
+        try:
+            lookup.get_template(uri)
+        except Exception as exc:  # pylint: disable=W0703
+            failures.append((uri, exc))
+        else:
+            compiled += 1
+    return compiled, failures
+
+
+def preload_templates(templates):
+    """
+    Loads the templates listed in `templates`, a dict of the uris of the templates of each namespace,
+    so that the first requests which render them don't have to.
+    """
+    for namespace, uris in templates.items():
+        for uri in uris:
+            try:
+                edxmako.lookup[namespace].get_template(uri)
+            except Exception:  # pylint: disable=W0703
+                log.exception("Could not preload mako template %s of %s", uri, namespace)
@@ -44,13 +44,9 @@ class Template(MakoTemplate):
         This takes a render call with a context (from Django) and translates
         it to a render call on the mako template.
         """
-        # collapse context_instance to a single dictionary for mako
-        context_dictionary = {}
-
+        # collapse context_instance to a single dictionary for mako, over a copy of the request's context
         # In various testing contexts, there might not be a current request context.
-        if edxmako.middleware.requestcontext is not None:
-            for d in edxmako.middleware.requestcontext:
-                context_dictionary.update(d)
+        context_dictionary = dict(edxmako.middleware.get_template_context_dictionary() or {})
         for d in context_instance:
             context_dictionary.update(d)
         context_dictionary['settings'] = settings
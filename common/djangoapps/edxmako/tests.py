@@ -1,7 +1,19 @@
+import os
+import shutil
+import tempfile
+import threading
+
 from django.test import TestCase
 from django.test.utils import override_settings
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
-from edxmako.shortcuts import marketing_link
+from django.http import HttpResponse
+from django.test.client import RequestFactory
+from mako.lookup import TemplateLookup
+import edxmako
+from edxmako import startup
+from edxmako.middleware import MakoMiddleware, get_template_context_dictionary
+from edxmako.shortcuts import marketing_link, render_to_string
 from mock import patch
 from util.testing import UrlResetMixin
 
@@ -24,3 +36,125 @@ class ShortcutsTests(UrlResetMixin, TestCase):
             expected_link = reverse('login')
             link = marketing_link('ABOUT')
             self.assertEquals(link, expected_link)
+
+
+class PrecompiledTemplatesTests(TestCase):
+    """
+    Test precompiling the mako templates into a shared, versioned module directory
+    """
+    def setUp(self):
+        self.template_dir = tempfile.mkdtemp()
+        self.precompiled_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.template_dir)
+        self.addCleanup(shutil.rmtree, self.precompiled_dir)
+        self._write_template('main.html', u'<p>${message}</p>')
+        os.mkdir(os.path.join(self.template_dir, 'courseware'))
+        self._write_template(os.path.join('courseware', 'tab.html'), u'<%include file="/main.html"/>')
+        self.template_locations = {'main': [self.template_dir]}
+
+        old_lookup = edxmako.lookup
+        self.addCleanup(setattr, edxmako, 'lookup', old_lookup)
+
+    def _write_template(self, uri, content):
+        """Write the template `uri` with `content`."""
+        with open(os.path.join(self.template_dir, uri), 'w') as template_file:
+            template_file.write(content)
+
+    def _module_directory(self):
+        """The versioned directory of the compiled templates."""
+        return os.path.join(self.precompiled_dir, startup.templates_version(self.template_locations))
+
+    def test_template_uris(self):
+        self._write_template('.main.html.swp', u'')
+        self.assertEqual(startup.template_uris([self.template_dir]), ['courseware/tab.html', 'main.html'])
+
+    def test_version(self):
+        version = startup.templates_version(self.template_locations)
+        # the version only depends on the contents of the templates
+        self.assertEqual(version, startup.templates_version(self.template_locations))
+        self._write_template('main.html', u'<p>${message | h}</p>')
+        self.assertNotEqual(version, startup.templates_version(self.template_locations))
+
+    def test_precompile_command(self):
+        with override_settings(MAKO_TEMPLATES=self.template_locations, MAKO_PRECOMPILED_DIR=self.precompiled_dir):
+            call_command('precompile_templates')
+        module_directory = self._module_directory()
+        self.assertTrue(os.path.exists(os.path.join(module_directory, 'main.html.py')))
+        self.assertTrue(os.path.exists(os.path.join(module_directory, 'courseware', 'tab.html.py')))
+
+    def test_run_uses_precompiled_templates(self):
+        with override_settings(MAKO_TEMPLATES=self.template_locations, MAKO_PRECOMPILED_DIR=self.precompiled_dir,
+                               MAKO_FILESYSTEM_CHECKS=False, MAKO_PRELOAD_TEMPLATES={'main': ['main.html']}):
+            call_command('precompile_templates')
+            with patch('mako.template._compile') as mock_compile:
+                startup.run()
+                # the preloaded template is loaded from its compiled module, without being compiled again
+                self.assertFalse(mock_compile.called)
+        lookup = edxmako.lookup['main']
+        self.assertEqual(lookup.module_directory, self._module_directory())
+        self.assertIn('main.html', lookup._collection)  # pylint: disable=W0212
+        self.assertEqual(lookup.get_template('courseware/tab.html').render(message='hello').strip(), '<p>hello</p>')
+
+    def test_preload_missing_template(self):
+        with override_settings(MAKO_TEMPLATES=self.template_locations, MAKO_PRECOMPILED_DIR=self.precompiled_dir,
+                               MAKO_PRELOAD_TEMPLATES={'main': ['missing.html']}):
+            with patch('edxmako.startup.log') as mock_log:
+                startup.run()
+        self.assertTrue(mock_log.warning.called)
+        self.assertTrue(mock_log.exception.called)
+
+
+class RenderToStringTests(TestCase):
+    """
+    Test rendering templates with the context of the current request
+    """
+    def setUp(self):
+        lookup = TemplateLookup()
+        lookup.put_string('site.html', u'${site} ${message}')
+        old_lookup = edxmako.lookup
+        edxmako.lookup = {'main': lookup}
+        self.addCleanup(setattr, edxmako, 'lookup', old_lookup)
+        self.middleware = MakoMiddleware()
+        self.addCleanup(self.middleware.process_response, None, None)
+
+    def _start_request(self, host):
+        """Start handling a request to `host` in this thread."""
+        self.middleware.process_request(RequestFactory().get('/', HTTP_HOST=host))
+
+    def test_request_context(self):
+        self._start_request('example.com')
+        dictionary = {'message': 'hello'}
+        self.assertEqual(render_to_string('site.html', dictionary), 'example.com hello')
+        # neither the caller's dictionary nor the request's context are changed
+        self.assertEqual(dictionary, {'message': 'hello'})
+        self.assertNotIn('message', get_template_context_dictionary())
+        # values of the call override those of the request
+        self.assertEqual(render_to_string('site.html', {'message': 'hi', 'site': 'other.com'}), 'other.com hi')
+        self.assertEqual(render_to_string('site.html', {'message': 'hi'}, {'site': 'third.com'}), 'third.com hi')
+
+    def test_context_collapsed_once_per_request(self):
+        self._start_request('example.com')
+        dictionary = get_template_context_dictionary()
+        render_to_string('site.html', {'message': 'hello'})
+        self.assertIs(get_template_context_dictionary(), dictionary)
+
+        self._start_request('other.com')
+        self.assertEqual(get_template_context_dictionary()['site'], 'other.com')
+        self.middleware.process_response(None, HttpResponse())
+        self.assertIsNone(get_template_context_dictionary())
+        self.assertEqual(render_to_string('site.html', {'message': 'hello', 'site': ''}), ' hello')
+
+    def test_request_context_per_thread(self):
+        self._start_request('example.com')
+        rendered = {}
+
+        def render_in_thread():
+            """Render while handling another request in another thread."""
+            self._start_request('other.com')
+            rendered['thread'] = render_to_string('site.html', {'message': 'hello'})
+
+        thread = threading.Thread(target=render_in_thread)
+        thread.start()
+        thread.join()
+        self.assertEqual(rendered['thread'], 'other.com hello')
+        self.assertEqual(render_to_string('site.html', {'message': 'hello'}), 'example.com hello')
@@ -13,7 +13,7 @@ import csv
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand, CommandError
 
-from student.models import anonymous_id_for_user
+from student.models import anonymous_ids_for_users
 
 
 class Command(BaseCommand):
@@ -46,6 +46,10 @@ class Command(BaseCommand):
             self.stdout.write("No students enrolled in %s" % course_id)
             return
 
+        # Look up the anonymized ids of all the students at once
+        per_student_ids = anonymous_ids_for_users(students, '')
+        per_course_ids = anonymous_ids_for_users(students, course_id)
+
         # Write mapping to output file in CSV format with a simple header
         try:
             with open(output_filename, 'wb') as output_file:
@@ -58,8 +62,8 @@ class Command(BaseCommand):
                 for student in students:
                     csv_writer.writerow((
                         student.id,
-                        anonymous_id_for_user(student, ''),
-                        anonymous_id_for_user(student, course_id)
+                        per_student_ids[student.id],
+                        per_course_ids[student.id]
                     ))
         except IOError:
             raise CommandError("Error writing to file: %s" % output_filename)
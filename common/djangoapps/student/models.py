@@ -19,18 +19,20 @@ import uuid
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth.signals import user_logged_in, user_logged_out
-from django.db import models, IntegrityError
+from django.db import models, IntegrityError, transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver, Signal
 import django.dispatch
 from django.forms import ModelForm, forms
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.cache import cache
 
 from course_modes.models import CourseMode
 import lms.lib.comment_client as cc
 from pytz import UTC
 import crum
 
+from request_cache.middleware import RequestCache
 from track import contexts
 from track.views import server_track
 from eventtracking import tracker
@@ -57,48 +59,156 @@ class AnonymousUserId(models.Model):
     unique_together = (user, course_id)
 
 
+# How long (in seconds) to remember in the cache that a user's AnonymousUserId row exists
+ANONYMOUS_ID_CACHE_TIMEOUT = 24 * 60 * 60
+
+# How many users to look up AnonymousUserIds for in a single query
+ANONYMOUS_ID_CHUNK_SIZE = 500
+
+# The most anonymous ids remembered in the request cache. The request cache is only cleared
+# between requests, so this bounds it in celery tasks and management commands which compute
+# the anonymous ids of every student of a course.
+ANONYMOUS_ID_REQUEST_CACHE_SIZE = 1000
+
+
+def _compute_anonymous_id(user_id, course_id):
+    """
+    Return the anonymous id of the user with id `user_id` in `course_id`.
+    """
+    # include the secret key as a salt, and to make the ids unique across different LMS installs.
+    hasher = hashlib.md5()
+    hasher.update(settings.SECRET_KEY)
+    hasher.update(str(user_id))
+    hasher.update(course_id)
+    return hasher.hexdigest()
+
+
+def _anonymous_id_cache_key(user_id, course_id):
+    """
+    Return the cache key under which the anonymous id of a user in a course is remembered.
+    """
+    return u"student.anonymous_id.{0}.{1}".format(user_id, course_id)
+
+
+def _anonymous_ids_in_request():
+    """
+    Return the dict of the anonymous ids computed during this request, keyed by
+    (user id, course id).
+
+    Outside of requests, the dict is emptied whenever it reaches ANONYMOUS_ID_REQUEST_CACHE_SIZE ids.
+    """
+    request_cache = RequestCache.get_request_cache()
+    # the request cache is only initialized on the thread which imported it
+    if not hasattr(request_cache, 'data'):
+        request_cache.data = {}
+    known_ids = request_cache.data.setdefault('anonymous_id_for_user', {})
+    if len(known_ids) >= ANONYMOUS_ID_REQUEST_CACHE_SIZE:
+        known_ids.clear()
+    return known_ids
+
+
+def _check_stored_anonymous_id(user_id, course_id, stored, digest):
+    """
+    Log an error if the anonymous id `stored` for a user doesn't match the `digest` computed for it.
+    """
+    if stored != digest:
+        log.error(
+            "Stored anonymous user id {stored!r} for user {user!r} "
+            "in course {course!r} doesn't match computed id {digest!r}".format(
+                user=user_id,
+                course=course_id,
+                stored=stored,
+                digest=digest
+            )
+        )
+
+
 def anonymous_id_for_user(user, course_id):
     """
     Return a unique id for a (user, course) pair, suitable for inserting
     into e.g. personalized survey links.
 
     If user is an `AnonymousUser`, returns `None`
+
+    The id is remembered for the rest of the request, and whether its AnonymousUserId
+    row has been stored is remembered in the cache, so that rendering many modules
+    for the same user only hits the database once.
+
+    The cache only remembers rows which were already stored before this call: a row created
+    here is in the request's transaction, which may still be rolled back.
     """
     # This part is for ability to get xblock instance in xblock_noauth handlers, where user is unauthenticated.
     if user.is_anonymous():
         return None
 
-    # include the secret key as a salt, and to make the ids unique across different LMS installs.
-    hasher = hashlib.md5()
-    hasher.update(settings.SECRET_KEY)
-    hasher.update(str(user.id))
-    hasher.update(course_id)
-    digest = hasher.hexdigest()
+    known_ids = _anonymous_ids_in_request()
+    if (user.id, course_id) in known_ids:
+        return known_ids[(user.id, course_id)]
 
-    try:
-        anonymous_user_id, created = AnonymousUserId.objects.get_or_create(
-            defaults={'anonymous_user_id': digest},
-            user=user,
-            course_id=course_id
-        )
-        if anonymous_user_id.anonymous_user_id != digest:
-            log.error(
-                "Stored anonymous user id {stored!r} for user {user!r} "
-                "in course {course!r} doesn't match computed id {digest!r}".format(
-                    user=user,
-                    course=course_id,
-                    stored=anonymous_user_id.anonymous_user_id,
-                    digest=digest
-                )
+    digest = _compute_anonymous_id(user.id, course_id)
+    cache_key = _anonymous_id_cache_key(user.id, course_id)
+    if cache.get(cache_key) != digest:
+        try:
+            anonymous_user_id, created = AnonymousUserId.objects.get_or_create(
+                defaults={'anonymous_user_id': digest},
+                user=user,
+                course_id=course_id
             )
-    except IntegrityError:
-        # Another thread has already created this entry, so
-        # continue
-        pass
-
+            _check_stored_anonymous_id(user, course_id, anonymous_user_id.anonymous_user_id, digest)
+            if not created:
+                cache.set(cache_key, digest, ANONYMOUS_ID_CACHE_TIMEOUT)
+        except IntegrityError:
+            # Another thread has already created this entry, so
+            # continue
+            pass
+
+    known_ids[(user.id, course_id)] = digest
     return digest
 
 
+def anonymous_ids_for_users(users, course_id):
+    """
+    Return a dict mapping the id of each of `users` to its unique id in `course_id` (see
+    `anonymous_id_for_user`). Anonymous users are left out.
+
+    The AnonymousUserId rows of the users are looked up, and the missing ones created, a
+    chunk of users at a time rather than one user at a time.
+    """
+    users = [user for user in users if not user.is_anonymous()]
+    anonymous_ids = {}
+    for start in xrange(0, len(users), ANONYMOUS_ID_CHUNK_SIZE):
+        chunk = users[start:start + ANONYMOUS_ID_CHUNK_SIZE]
+        digests = dict((user.id, _compute_anonymous_id(user.id, course_id)) for user in chunk)
+        stored_ids = dict(
+            AnonymousUserId.objects.filter(
+                course_id=course_id,
+                user__in=digests.keys(),
+            ).values_list('user_id', 'anonymous_user_id')
+        )
+        for user_id, stored in stored_ids.iteritems():
+            _check_stored_anonymous_id(user_id, course_id, stored, digests[user_id])
+
+        missing = [user for user in chunk if user.id not in stored_ids]
+        if missing:
+            # a failed insert aborts the whole transaction on some databases (e.g. postgres),
+            # so roll it back to this savepoint before looking the rows up again
+            savepoint = transaction.savepoint()
+            try:
+                AnonymousUserId.objects.bulk_create([
+                    AnonymousUserId(user=user, course_id=course_id, anonymous_user_id=digests[user.id])
+                    for user in missing
+                ])
+                transaction.savepoint_commit(savepoint)
+            except IntegrityError:
+                transaction.savepoint_rollback(savepoint)
+                # Another thread has already created some of these entries,
+                # so create the rest one by one
+                for user in missing:
+                    anonymous_id_for_user(user, course_id)
+        anonymous_ids.update(digests)
+    return anonymous_ids
+
+
 def user_by_anonymous_id(id):
     """
     Return user by anonymous_user_id using AnonymousUserId lookup table.
@@ -20,6 +20,7 @@ from django.contrib.auth.hashers import UNUSABLE_PASSWORD
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import int_to_base36
 from django.core.urlresolvers import reverse
+from django.core.cache import cache
 
 from xmodule.modulestore.tests.factories import CourseFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
@@ -28,10 +29,13 @@ from courseware.tests.tests import TEST_DATA_MIXED_MODULESTORE
 from mock import Mock, patch, sentinel
 from textwrap import dedent
 
-from student.models import anonymous_id_for_user, user_by_anonymous_id, CourseEnrollment, unique_id_for_user
+from student.models import (
+    anonymous_id_for_user, anonymous_ids_for_users, user_by_anonymous_id, CourseEnrollment, unique_id_for_user
+)
 from student.views import (process_survey_link, _cert_info, password_reset, password_reset_confirm_wrapper,
                            change_enrollment, complete_course_mode_info)
 from student.tests.factories import UserFactory, CourseModeFactory
+from request_cache.middleware import RequestCache
 from student.tests.test_email import mock_render_to_string
 
 import shoppingcart
@@ -546,6 +550,8 @@ class AnonymousLookupTable(TestCase):
         patcher = patch('student.models.server_track')
         self.mock_server_track = patcher.start()
         self.addCleanup(patcher.stop)
+        cache.clear()
+        RequestCache().clear_request_cache()
 
     def test_for_unregistered_user(self):  # same path as for logged out user
         self.assertEqual(None, anonymous_id_for_user(AnonymousUser(), self.course.id))
@@ -556,3 +562,39 @@ class AnonymousLookupTable(TestCase):
         anonymous_id = anonymous_id_for_user(self.user, self.course.id)
         real_user = user_by_anonymous_id(anonymous_id)
         self.assertEqual(self.user, real_user)
+
+    def test_memoized_for_request(self):
+        anonymous_id = anonymous_id_for_user(self.user, self.course.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(anonymous_id, anonymous_id_for_user(self.user, self.course.id))
+
+        # the row created by the first request isn't remembered in the cache, as that request's
+        # transaction could be rolled back; a later request which finds it stored remembers it
+        RequestCache().clear_request_cache()
+        with self.assertNumQueries(1):
+            self.assertEqual(anonymous_id, anonymous_id_for_user(self.user, self.course.id))
+
+        # so other requests only need the cache to know the id has been stored
+        RequestCache().clear_request_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(anonymous_id, anonymous_id_for_user(self.user, self.course.id))
+
+    @patch('student.models.ANONYMOUS_ID_REQUEST_CACHE_SIZE', 2)
+    def test_request_memo_is_bounded(self):
+        other_users = [UserFactory(), UserFactory()]
+        for user in [self.user] + other_users:
+            anonymous_id_for_user(user, self.course.id)
+        known_ids = RequestCache.get_request_cache().data['anonymous_id_for_user']
+        self.assertEqual(known_ids.keys(), [(other_users[1].id, self.course.id)])
+
+    def test_bulk_lookup(self):
+        other_user = UserFactory()
+        stored_id = anonymous_id_for_user(self.user, self.course.id)
+
+        with self.assertNumQueries(2):
+            anonymous_ids = anonymous_ids_for_users([self.user, other_user, AnonymousUser()], self.course.id)
+        self.assertEqual(anonymous_ids, {
+            self.user.id: stored_id,
+            other_user.id: anonymous_id_for_user(other_user, self.course.id),
+        })
+        self.assertEqual(other_user, user_by_anonymous_id(anonymous_ids[other_user.id]))
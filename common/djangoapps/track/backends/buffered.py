@@ -0,0 +1,206 @@
+"""
+Event tracker backend that queues events in memory and hands them to
+another backend in batches, from a background thread.
+
+The wrapped backend is configured like the ones in TRACKING_BACKENDS::
+
+  TRACKING_BACKENDS = {
+      'mongo': {
+          'ENGINE': 'track.backends.buffered.BufferedBackend',
+          'OPTIONS': {
+              'backend': {
+                  'ENGINE': 'track.backends.mongodb.MongoBackend',
+                  'OPTIONS': {...}
+              },
+              'batch_size': 100,
+              'flush_interval': 1,
+              'max_queue_size': 10000,
+              'overflow': 'spill',
+              'spill_path': '/var/log/tracking/overflow.log',
+          }
+      }
+  }
+
+"""
+
+from __future__ import absolute_import
+
+import atexit
+import json
+import logging
+import os
+import Queue
+import threading
+import time
+
+from dogapi import dog_stats_api
+
+from track.backends import BaseBackend
+from track.utils import DateTimeJSONEncoder
+
+
+log = logging.getLogger(__name__)
+
+
+OVERFLOW_DROP = 'drop'
+OVERFLOW_SPILL = 'spill'
+
+
+class BufferedBackend(BaseBackend):
+    """
+    Event tracker backend that queues events and sends them to another
+    backend in batches.
+
+    A batch is sent when `batch_size` events are queued, or when the
+    oldest queued event has waited for `flush_interval` seconds. At most
+    `max_queue_size` events are kept in memory: the ones sent while the
+    queue is full are either dropped or, if `overflow` is 'spill',
+    appended as JSON lines to the file at `spill_path`.
+
+    """
+
+    def __init__(self, backend, batch_size=100, flush_interval=1.0,
+                 max_queue_size=10000, overflow=OVERFLOW_DROP, spill_path=None,
+                 **kwargs):
+        """
+        :Parameters:
+
+          - `backend`: dict with the 'ENGINE' and (optional) 'OPTIONS' of
+            the backend to send the batches of events to.
+          - `batch_size`: the most events to send at once.
+          - `flush_interval`: the longest (in seconds) an event is queued.
+          - `max_queue_size`: the most events to keep in memory.
+          - `overflow`: 'drop' or 'spill' the events sent while the queue
+            is full.
+          - `spill_path`: the file to spill events to.
+
+        """
+        super(BufferedBackend, self).__init__(**kwargs)
+
+        # imported here, as the tracker instantiates the backends when it's imported
+        from track.tracker import _instantiate_backend_from_name  # pylint: disable=protected-access
+        self.backend = _instantiate_backend_from_name(backend['ENGINE'], backend.get('OPTIONS', {}))
+
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_SPILL):
+            raise ValueError('Invalid overflow policy %s' % overflow)
+        if overflow == OVERFLOW_SPILL and not spill_path:
+            raise ValueError('A spill_path is needed to spill events')
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.spill_path = spill_path
+
+        self.queue = Queue.Queue(max_queue_size)
+        self.dropped = 0
+        self.spilled = 0
+        self.flushed = 0
+        self.last_flush_latency = None
+
+        self._spill_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+        self._thread_pid = None
+
+        atexit.register(self.flush)
+
+    @property
+    def queue_depth(self):
+        """The number of events waiting to be sent"""
+        return self.queue.qsize()
+
+    def send(self, event):
+        """Queue the event, to be sent from the background thread"""
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(event)
+        except Queue.Full:
+            self._overflow(event)
+
+    def send_batch(self, events):
+        for event in events:
+            self.send(event)
+
+    def flush(self):
+        """Send all the queued events now"""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+            if not batch:
+                return
+            self._send_batch(batch)
+
+    def _ensure_thread(self):
+        """
+        Start the background thread, if it isn't running in this process
+        (e.g. because the process was forked after the first event).
+        """
+        if self._thread is not None and self._thread_pid == os.getpid():
+            return
+        with self._thread_lock:
+            if self._thread is not None and self._thread_pid == os.getpid():
+                return
+            thread = threading.Thread(target=self._run, name='track-buffered-backend')
+            thread.daemon = True
+            thread.start()
+            self._thread = thread
+            self._thread_pid = os.getpid()
+
+    def _run(self):
+        """Send batches of events, for as long as the process runs"""
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._send_batch(batch)
+
+    def _next_batch(self):
+        """
+        Wait for an event, then return it with the ones queued after it until
+        the batch is full or `flush_interval` has passed.
+        """
+        batch = [self.queue.get()]
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except Queue.Empty:
+                break
+        return batch
+
+    def _send_batch(self, batch):
+        """Send a batch of events to the wrapped backend, and record the stats"""
+        start = time.time()
+        try:
+            self.backend.send_batch(batch)
+        except Exception:  # pylint: disable=broad-except
+            log.exception('Error sending a batch of %d events', len(batch))
+        self.last_flush_latency = time.time() - start
+        self.flushed += len(batch)
+
+        dog_stats_api.histogram('track.buffered.flush_latency', self.last_flush_latency)
+        dog_stats_api.increment('track.buffered.flushed', len(batch))
+        dog_stats_api.gauge('track.buffered.queue_depth', self.queue_depth)
+
+    def _overflow(self, event):
+        """Drop or spill an event which doesn't fit in the queue"""
+        if self.overflow == OVERFLOW_SPILL:
+            try:
+                line = json.dumps(event, cls=DateTimeJSONEncoder)
+                with self._spill_lock:
+                    with open(self.spill_path, 'a') as spill_file:
+                        spill_file.write(line + '\n')
+                self.spilled += 1
+                dog_stats_api.increment('track.buffered.spilled')
+                return
+            except (IOError, TypeError, ValueError):
+                log.exception('Error spilling event to %s', self.spill_path)
+
+        self.dropped += 1
+        dog_stats_api.increment('track.buffered.dropped')
@@ -95,3 +95,12 @@ class MongoBackend(BaseBackend):
             # during the next event.
             msg = 'Error inserting to MongoDB event tracker backend'
             log.exception(msg)
+
+    def send_batch(self, events):
+        """Insert the events in to the Mongo collection at once"""
+        try:
+            self.collection.insert(events, manipulate=False)
+        except PyMongoError:
+            # The events will be lost in case of a connection error.
+            msg = 'Error inserting to MongoDB event tracker backend'
+            log.exception(msg)
@@ -0,0 +1,101 @@
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from mock import patch, Mock
+
+from django.test import TestCase
+
+from track.backends.buffered import BufferedBackend
+
+
+LOGGER_BACKEND = {
+    'ENGINE': 'track.backends.logger.LoggerBackend',
+    'OPTIONS': {'name': 'test'}
+}
+
+
+class TestBufferedBackend(TestCase):
+    """
+    Test the queueing, batching and overflow of events, flushed from the
+    test's thread.
+    """
+    def setUp(self):
+        # send from the test's thread, by flushing, unless the test starts the background thread
+        thread_patcher = patch.object(BufferedBackend, '_ensure_thread')
+        self.addCleanup(thread_patcher.stop)
+        self.ensure_thread = thread_patcher.start()
+
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def _backend(self, **options):
+        backend = BufferedBackend(LOGGER_BACKEND, **options)
+        backend.backend = Mock()
+        return backend
+
+    def test_flush_in_batches(self):
+        backend = self._backend(batch_size=2)
+        events = [{'test': index} for index in range(5)]
+        for event in events:
+            backend.send(event)
+        self.assertEqual(backend.queue_depth, 5)
+        self.assertFalse(backend.backend.send_batch.called)
+
+        backend.flush()
+
+        self.assertEqual(
+            [call[0][0] for call in backend.backend.send_batch.call_args_list],
+            [events[0:2], events[2:4], events[4:5]]
+        )
+        self.assertEqual(backend.queue_depth, 0)
+        self.assertEqual(backend.flushed, 5)
+        self.assertIsNotNone(backend.last_flush_latency)
+
+    def test_drop_overflow(self):
+        backend = self._backend(max_queue_size=2)
+        for index in range(3):
+            backend.send({'test': index})
+
+        self.assertEqual(backend.queue_depth, 2)
+        self.assertEqual(backend.dropped, 1)
+        backend.flush()
+        backend.backend.send_batch.assert_called_once_with([{'test': 0}, {'test': 1}])
+
+    def test_spill_overflow(self):
+        spill_path = os.path.join(self.tempdir, 'spill.log')
+        backend = self._backend(max_queue_size=1, overflow='spill', spill_path=spill_path)
+        for index in range(3):
+            backend.send({'test': index})
+
+        self.assertEqual(backend.spilled, 2)
+        self.assertEqual(backend.dropped, 0)
+        with open(spill_path) as spill_file:
+            self.assertEqual([json.loads(line) for line in spill_file], [{'test': 1}, {'test': 2}])
+
+    def test_invalid_overflow(self):
+        with self.assertRaises(ValueError):
+            BufferedBackend(LOGGER_BACKEND, overflow='ignore')
+        with self.assertRaises(ValueError):
+            BufferedBackend(LOGGER_BACKEND, overflow='spill')
+
+
+class TestBufferedBackendThread(TestCase):
+    """
+    Test that the background thread sends the queued events.
+    """
+    def test_flush_from_thread(self):
+        backend = BufferedBackend(LOGGER_BACKEND, batch_size=10, flush_interval=0.01)
+        sent = threading.Event()
+        backend.backend = Mock()
+        backend.backend.send_batch.side_effect = lambda batch: sent.set()
+        backend.send({'test': 1})
+
+        # the batch is sent once the flush interval has passed
+        self.assertTrue(sent.wait(10))
+        backend.backend.send_batch.assert_called_once_with([{'test': 1}])
+        self.assertEqual(backend.queue_depth, 0)
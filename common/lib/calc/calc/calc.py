@@ -4,9 +4,11 @@ Parser and evaluator for FormulaResponse and NumericalResponse
 Uses pyparsing to parse. Main function as of now is evaluator().
 """
 
+from collections import OrderedDict
 import math
 import operator
 import numbers
+import threading
 import numpy
 import scipy.constants
 import functions
@@ -72,6 +74,9 @@ SUFFIXES = {
     'c': 1e-2, 'm': 1e-3, 'u': 1e-6, 'n': 1e-9, 'p': 1e-12
 }
 
+# How many parsed expressions to keep around, see `ParseAugmenter.parse_algebra`.
+PARSE_CACHE_SIZE = 1000
+
 
 class UndefinedVariable(Exception):
     """
@@ -121,8 +126,8 @@ def eval_atom(parse_result):
 
     In the case of parenthesis, ignore them.
     """
-    # Find first number in the list
-    result = next(k for k in parse_result if isinstance(k, numbers.Number))
+    # Find first number (or array of numbers) in the list
+    result = next(k for k in parse_result if isinstance(k, (numbers.Number, numpy.ndarray)))
     return result
 
 
@@ -136,7 +141,7 @@ def eval_power(parse_result):
     # `reduce` will go from left to right; reverse the list.
     parse_result = reversed(
         [k for k in parse_result
-         if isinstance(k, numbers.Number)]  # Ignore the '^' marks.
+         if isinstance(k, (numbers.Number, numpy.ndarray))]  # Ignore the '^' marks.
     )
     # Having reversed it, raise `b` to the power of `a`.
     power = reduce(lambda a, b: b ** a, parse_result)
@@ -155,6 +160,11 @@ def eval_parallel(parse_result):
     """
     if len(parse_result) == 1:
         return parse_result[0]
+    if any(isinstance(e, numpy.ndarray) for e in parse_result):
+        # Evaluating many samples at once, see `evaluate_samples`
+        inputs = [e for e in parse_result if not isinstance(e, basestring)]
+        has_zero = reduce(numpy.logical_or, [e == 0 for e in inputs])
+        return numpy.where(has_zero, float('nan'), 1. / sum(1. / e for e in inputs))
     if 0 in parse_result:
         return float('nan')
     reciprocals = [1. / e for e in parse_result
@@ -173,12 +183,12 @@ def eval_sum(parse_result):
     total = 0.0
     current_op = operator.add
     for token in parse_result:
-        if token == '+':
+        if not isinstance(token, basestring):
+            total = current_op(total, token)
+        elif token == '+':
             current_op = operator.add
         elif token == '-':
             current_op = operator.sub
-        else:
-            total = current_op(total, token)
     return total
 
 
@@ -191,12 +201,12 @@ def eval_product(parse_result):
     prod = 1.0
     current_op = operator.mul
     for token in parse_result:
-        if token == '*':
+        if not isinstance(token, basestring):
+            prod = current_op(prod, token)
+        elif token == '*':
             current_op = operator.mul
         elif token == '/':
             current_op = operator.truediv
-        else:
-            prod = current_op(prod, token)
     return prod
 
 
@@ -232,6 +242,63 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     math_interpreter = ParseAugmenter(math_expr, case_sensitive)
     math_interpreter.parse_algebra()
 
+    return evaluate_tree(math_interpreter, variables, functions)
+
+
+def evaluate_samples(variables_list, functions, math_expr, case_sensitive=False):
+    """
+    Evaluate an expression for each dictionary of variables in
+    `variables_list`, and return the list of results. This is the same as
+    calling `evaluator` for every one of them, but faster.
+
+    The expression is parsed once and evaluated for all the samples at once,
+    with each variable bound to a NumPy array of its values. If that is not
+    possible (e.g. a function that doesn't accept arrays), or if the result for
+    any sample isn't finite, the samples are evaluated one at a time instead,
+    so that errors are reported exactly as `evaluator` reports them.
+    """
+    if math_expr.strip() == "":
+        return [float('nan')] * len(variables_list)
+    if not variables_list:
+        return []
+
+    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+    math_interpreter.parse_algebra()
+
+    num_samples = len(variables_list)
+    variable_names = set(variables_list[0])
+    if all(set(variables) == variable_names for variables in variables_list):
+        sample_variables = {
+            name: numpy.array([variables[name] for variables in variables_list])
+            for name in variable_names
+        }
+        try:
+            with numpy.errstate(all='ignore'):
+                results = numpy.asarray(evaluate_tree(math_interpreter, sample_variables, functions))
+        except UndefinedVariable:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            results = None
+
+        if results is not None and results.shape == ():
+            # The expression doesn't depend on any of the variables
+            results = numpy.repeat(results, num_samples)
+        if results is not None and results.shape == (num_samples,) and numpy.all(numpy.isfinite(results)):
+            return results.tolist()
+
+    return [
+        evaluate_tree(math_interpreter, variables, functions)
+        for variables in variables_list
+    ]
+
+
+def evaluate_tree(math_interpreter, variables, functions):
+    """
+    Evaluate the parsed expression of `math_interpreter` (a ParseAugmenter)
+    with the given variables and functions.
+    """
+    case_sensitive = math_interpreter.case_sensitive
+
     # Get our variables together.
     all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
 
@@ -258,6 +325,78 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     return math_interpreter.reduce_tree(evaluate_actions)
 
 
+# Built by `algebra_grammar`
+_ALGEBRA_GRAMMAR = None
+
+# Maps math_expr -> (tree, variables_used, functions_used), least recently used first
+_PARSE_CACHE = OrderedDict()
+_PARSE_CACHE_LOCK = threading.Lock()
+
+
+def algebra_grammar():
+    """
+    Return the pyparsing grammar for algebraic expressions.
+
+    The grammar is built on the first call and shared afterwards. It is the
+    same whether or not variables are case sensitive, since the parse tree
+    keeps the names as they were typed.
+    """
+    global _ALGEBRA_GRAMMAR  # pylint: disable=global-statement
+    if _ALGEBRA_GRAMMAR is not None:
+        return _ALGEBRA_GRAMMAR
+
+    # 0.33 or 7 or .34 or 16.
+    number_part = Word(nums)
+    inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
+    # pyparsing allows spaces between tokens--`Combine` prevents that.
+    inner_number = Combine(inner_number)
+
+    # SI suffixes and percent.
+    number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
+
+    # 0.33k or 17
+    plus_minus = Literal('+') | Literal('-')
+    number = Group(
+        Optional(plus_minus) +
+        inner_number +
+        Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
+        Optional(number_suffix)
+    )
+    number = number("number")
+
+    # Predefine recursive variables.
+    expr = Forward()
+
+    # Handle variables passed in. They must start with letters/underscores
+    # and may contain numbers afterward.
+    inner_varname = Word(alphas + "_", alphanums + "_")
+    varname = Group(inner_varname)("variable")
+
+    # Same thing for functions.
+    function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
+
+    atom = number | function | varname | "(" + expr + ")"
+    atom = Group(atom)("atom")
+
+    # Do the following in the correct order to preserve order of operation.
+    pow_term = atom + ZeroOrMore("^" + atom)
+    pow_term = Group(pow_term)("power")
+
+    par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
+    par_term = Group(par_term)("parallel")
+
+    prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
+    prod_term = Group(prod_term)("product")
+
+    sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
+    sum_term = Group(sum_term)("sum")
+
+    # Finish the recursion.
+    expr << sum_term  # pylint: disable=W0104
+    _ALGEBRA_GRAMMAR = expr + stringEnd
+    return _ALGEBRA_GRAMMAR
+
+
 class ParseAugmenter(object):
     """
     Holds the data for a particular parse.
@@ -278,23 +417,6 @@ class ParseAugmenter(object):
         self.variables_used = set()
         self.functions_used = set()
 
-        def vpa(tokens):
-            """
-            When a variable is recognized, store it in `variables_used`.
-            """
-            varname = tokens[0][0]
-            self.variables_used.add(varname)
-
-        def fpa(tokens):
-            """
-            When a function is recognized, store it in `functions_used`.
-            """
-            varname = tokens[0][0]
-            self.functions_used.add(varname)
-
-        self.variable_parse_action = vpa
-        self.function_parse_action = fpa
-
     def parse_algebra(self):
         """
         Parse an algebraic expression into a tree.
@@ -303,61 +425,52 @@ class ParseAugmenter(object):
         reflect parenthesis and order of operations. Leave all operators in the
         tree and do not parse any strings of numbers into their float versions.
 
+        Parsed trees are kept in a bounded cache shared by the process, keyed
+        by the expression, so they must not be modified.
+
         Adding the groups and result names makes the `repr()` of the result
         really gross. For debugging, use something like
           print OBJ.tree.asXML()
         """
-        # 0.33 or 7 or .34 or 16.
-        number_part = Word(nums)
-        inner_number = (number_part + Optional("." + Optional(number_part))) | ("." + number_part)
-        # pyparsing allows spaces between tokens--`Combine` prevents that.
-        inner_number = Combine(inner_number)
-
-        # SI suffixes and percent.
-        number_suffix = MatchFirst(Literal(k) for k in SUFFIXES.keys())
-
-        # 0.33k or 17
-        plus_minus = Literal('+') | Literal('-')
-        number = Group(
-            Optional(plus_minus) +
-            inner_number +
-            Optional(CaselessLiteral("E") + Optional(plus_minus) + number_part) +
-            Optional(number_suffix)
-        )
-        number = number("number")
-
-        # Predefine recursive variables.
-        expr = Forward()
-
-        # Handle variables passed in. They must start with letters/underscores
-        # and may contain numbers afterward.
-        inner_varname = Word(alphas + "_", alphanums + "_")
-        varname = Group(inner_varname)("variable")
-        varname.setParseAction(self.variable_parse_action)
-
-        # Same thing for functions.
-        function = Group(inner_varname + Suppress("(") + expr + Suppress(")"))("function")
-        function.setParseAction(self.function_parse_action)
-
-        atom = number | function | varname | "(" + expr + ")"
-        atom = Group(atom)("atom")
-
-        # Do the following in the correct order to preserve order of operation.
-        pow_term = atom + ZeroOrMore("^" + atom)
-        pow_term = Group(pow_term)("power")
-
-        par_term = pow_term + ZeroOrMore('||' + pow_term)  # 5k || 4k
-        par_term = Group(par_term)("parallel")
-
-        prod_term = par_term + ZeroOrMore((Literal('*') | Literal('/')) + par_term)  # 7 * 5 / 4
-        prod_term = Group(prod_term)("product")
-
-        sum_term = Optional(plus_minus) + prod_term + ZeroOrMore(plus_minus + prod_term)  # -5 + 4 - 3
-        sum_term = Group(sum_term)("sum")
-
-        # Finish the recursion.
-        expr << sum_term  # pylint: disable=W0104
-        self.tree = (expr + stringEnd).parseString(self.math_expr)[0]
+        with _PARSE_CACHE_LOCK:
+            parsed = _PARSE_CACHE.pop(self.math_expr, None)
+            if parsed is not None:
+                _PARSE_CACHE[self.math_expr] = parsed
+
+        if parsed is None:
+            tree = algebra_grammar().parseString(self.math_expr)[0]
+            variables_used = set()
+            functions_used = set()
+            self._find_names(tree, variables_used, functions_used)
+            parsed = (tree, frozenset(variables_used), frozenset(functions_used))
+
+            with _PARSE_CACHE_LOCK:
+                _PARSE_CACHE[self.math_expr] = parsed
+                while len(_PARSE_CACHE) > PARSE_CACHE_SIZE:
+                    _PARSE_CACHE.popitem(last=False)
+
+        tree, variables_used, functions_used = parsed
+        self.tree = tree
+        self.variables_used = set(variables_used)
+        self.functions_used = set(functions_used)
+
+    @classmethod
+    def _find_names(cls, node, variables_used, functions_used):
+        """
+        Add the names of the variables and functions in the tree under `node`
+        to `variables_used` and `functions_used`.
+        """
+        if not isinstance(node, ParseResults):
+            return
+
+        node_name = node.getName()
+        if node_name == 'variable':
+            variables_used.add(node[0])
+        elif node_name == 'function':
+            functions_used.add(node[0])
+
+        for child in node:
+            cls._find_names(child, variables_used, functions_used)
 
     def reduce_tree(self, handle_actions, terminal_converter=None):
         """
@@ -558,3 +558,65 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class EvaluateSamplesTest(unittest.TestCase):
+    """
+    Run tests for calc.evaluate_samples, which should always agree with
+    evaluating every sample separately with calc.evaluator
+    """
+    SAMPLES = [{'x': 1.0, 'y': 2.0}, {'x': -0.5, 'y': 3.0}, {'x': 4.0, 'y': 0.25}]
+
+    def assert_same_as_evaluator(self, math_expr, functions=None, case_sensitive=False):
+        """
+        Check that `evaluate_samples` returns what `evaluator` returns for each sample
+        """
+        functions = functions or {}
+        results = calc.evaluate_samples(self.SAMPLES, functions, math_expr, case_sensitive)
+        expected = [calc.evaluator(sample, functions, math_expr, case_sensitive) for sample in self.SAMPLES]
+        self.assertEqual(len(results), len(expected))
+        for result, expected_result in zip(results, expected):
+            self.assertAlmostEqual(result, expected_result)
+
+    def test_expressions(self):
+        for math_expr in ["x + y", "-x^2 * y / 3", "2^x^y", "x || y", "sin(x) + sqrt(y)", "x*i", "3k + x"]:
+            self.assert_same_as_evaluator(math_expr)
+
+    def test_constant_expression(self):
+        self.assertEqual(calc.evaluate_samples(self.SAMPLES, {}, "2 + 3"), [5.0, 5.0, 5.0])
+
+    def test_fallback(self):
+        # `fact` doesn't accept arrays, `x||0` is NaN and `x/0` raises
+        self.assert_same_as_evaluator("fact(3) * x")
+        results = calc.evaluate_samples(self.SAMPLES, {}, "x || 0")
+        self.assertTrue(all(numpy.isnan(result) for result in results))
+        with self.assertRaises(ZeroDivisionError):
+            calc.evaluate_samples(self.SAMPLES, {}, "x / 0")
+
+    def test_undefined_vars(self):
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'z'):
+            calc.evaluate_samples(self.SAMPLES, {}, "x + z")
+
+    def test_empty(self):
+        self.assertEqual(calc.evaluate_samples([], {}, "x"), [])
+        results = calc.evaluate_samples(self.SAMPLES, {}, "")
+        self.assertTrue(all(numpy.isnan(result) for result in results))
+
+
+class ParseCacheTest(unittest.TestCase):
+    """
+    Test that parsed expressions are reused
+    """
+    def test_parse_once(self):
+        first = calc.ParseAugmenter("a*b + f(c)")
+        first.parse_algebra()
+        second = calc.ParseAugmenter("a*b + f(c)", case_sensitive=True)
+        second.parse_algebra()
+        self.assertIs(first.tree, second.tree)
+        self.assertEqual(second.variables_used, set(['a', 'b', 'c']))
+        self.assertEqual(second.functions_used, set(['f']))
+
+    def test_cache_is_bounded(self):
+        for i in range(calc.PARSE_CACHE_SIZE + 10):
+            calc.ParseAugmenter("x + {0}".format(i)).parse_algebra()
+        self.assertLessEqual(len(calc.calc._PARSE_CACHE), calc.PARSE_CACHE_SIZE)  # pylint: disable=protected-access
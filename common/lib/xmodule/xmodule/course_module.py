@@ -387,7 +387,153 @@ class CourseFields(object):
     display_coursenumber = String(help="An optional display string for the course number that will get rendered in the LMS",
                                   scope=Scope.settings)
 
-class CourseDescriptor(CourseFields, SequenceDescriptor):
+
+class CourseSummaryMixin(object):
+    """
+    The properties of a course computed from the few fields which its CourseSummary
+    records, shared by CourseDescriptor and CourseSummary.
+    """
+
+    def has_ended(self):
+        """
+        Returns True if the current time is after the specified course end date.
+        Returns False if there is no end date specified.
+        """
+        if self.end is None:
+            return False
+
+        return datetime.now(UTC()) > self.end
+
+    def has_started(self):
+        return datetime.now(UTC()) > self.start
+
+    @property
+    def is_newish(self):
+        """
+        Returns if the course has been flagged as new. If
+        there is no flag, return a heuristic value considering the
+        announcement and the start dates.
+        """
+        flag = self.is_new
+        if flag is None:
+            # Use a heuristic if the course has not been flagged
+            announcement, start, now = self._sorting_dates()
+            if announcement and (now - announcement).days < 30:
+                # The course has been announced for less that month
+                return True
+            elif (now - start).days < 1:
+                # The course has not started yet
+                return True
+            else:
+                return False
+        elif isinstance(flag, basestring):
+            return flag.lower() in ['true', 'yes', 'y']
+        else:
+            return bool(flag)
+
+    @property
+    def sorting_score(self):
+        """
+        Returns a tuple that can be used to sort the courses according
+        the how "new" they are. The "newness" score is computed using a
+        heuristic that takes into account the announcement and
+        (advertized) start dates of the course if available.
+
+        The lower the number the "newer" the course.
+        """
+        # Make courses that have an announcement date shave a lower
+        # score than courses than don't, older courses should have a
+        # higher score.
+        announcement, start, now = self._sorting_dates()
+        scale = 300.0  # about a year
+        if announcement:
+            days = (now - announcement).days
+            score = -exp(-days / scale)
+        else:
+            days = (now - start).days
+            score = exp(days / scale)
+        return score
+
+    def _sorting_dates(self):
+        # utility function to get datetime objects for dates used to
+        # compute the is_new flag and the sorting_score
+
+        announcement = self.announcement
+        if announcement is not None:
+            announcement = announcement
+
+        try:
+            start = dateutil.parser.parse(self.advertised_start)
+            if start.tzinfo is None:
+                start = start.replace(tzinfo=UTC())
+        except (ValueError, AttributeError):
+            start = self.start
+
+        now = datetime.now(UTC())
+
+        return announcement, start, now
+
+    @property
+    def start_date_text(self):
+        def try_parse_iso_8601(text):
+            try:
+                result = Date().from_json(text)
+                if result is None:
+                    result = text.title()
+                else:
+                    result = result.strftime("%b %d, %Y")
+            except ValueError:
+                result = text.title()
+
+            return result
+
+        if isinstance(self.advertised_start, basestring):
+            return try_parse_iso_8601(self.advertised_start)
+        elif self.advertised_start is None and self.start is None:
+            # TODO this is an impossible state since the init function forces start to have a value
+            return 'TBD'
+        else:
+            return (self.advertised_start or self.start).strftime("%b %d, %Y")
+
+    @property
+    def end_date_text(self):
+        """
+        Returns the end date for the course formatted as a string.
+
+        If the course does not have an end date set (course.end is None), an empty string will be returned.
+        """
+        return '' if self.end is None else self.end.strftime("%b %d, %Y")
+
+    @property
+    def number(self):
+        return self.location.course
+
+    @property
+    def display_number_with_default(self):
+        """
+        Return a display course number if it has been specified, otherwise return the 'course' that is in the location
+        """
+        if self.display_coursenumber:
+            return self.display_coursenumber
+
+        return self.number
+
+    @property
+    def org(self):
+        return self.location.org
+
+    @property
+    def display_org_with_default(self):
+        """
+        Return a display organization if it has been specified, otherwise return the 'org' that is in the location
+        """
+        if self.display_organization:
+            return self.display_organization
+
+        return self.org
+
+
+class CourseDescriptor(CourseSummaryMixin, CourseFields, SequenceDescriptor):
     module_class = SequenceModule
 
     def __init__(self, *args, **kwargs):
@@ -563,19 +709,6 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
 
         return xml_object
 
-    def has_ended(self):
-        """
-        Returns True if the current time is after the specified course end date.
-        Returns False if there is no end date specified.
-        """
-        if self.end is None:
-            return False
-
-        return datetime.now(UTC()) > self.end
-
-    def has_started(self):
-        return datetime.now(UTC()) > self.start
-
     @property
     def grader(self):
         return grader_from_conf(self.raw_grader)
@@ -665,72 +798,6 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
 
         return set(config.get("cohorted_discussions", []))
 
-    @property
-    def is_newish(self):
-        """
-        Returns if the course has been flagged as new. If
-        there is no flag, return a heuristic value considering the
-        announcement and the start dates.
-        """
-        flag = self.is_new
-        if flag is None:
-            # Use a heuristic if the course has not been flagged
-            announcement, start, now = self._sorting_dates()
-            if announcement and (now - announcement).days < 30:
-                # The course has been announced for less that month
-                return True
-            elif (now - start).days < 1:
-                # The course has not started yet
-                return True
-            else:
-                return False
-        elif isinstance(flag, basestring):
-            return flag.lower() in ['true', 'yes', 'y']
-        else:
-            return bool(flag)
-
-    @property
-    def sorting_score(self):
-        """
-        Returns a tuple that can be used to sort the courses according
-        the how "new" they are. The "newness" score is computed using a
-        heuristic that takes into account the announcement and
-        (advertized) start dates of the course if available.
-
-        The lower the number the "newer" the course.
-        """
-        # Make courses that have an announcement date shave a lower
-        # score than courses than don't, older courses should have a
-        # higher score.
-        announcement, start, now = self._sorting_dates()
-        scale = 300.0  # about a year
-        if announcement:
-            days = (now - announcement).days
-            score = -exp(-days / scale)
-        else:
-            days = (now - start).days
-            score = exp(days / scale)
-        return score
-
-    def _sorting_dates(self):
-        # utility function to get datetime objects for dates used to
-        # compute the is_new flag and the sorting_score
-
-        announcement = self.announcement
-        if announcement is not None:
-            announcement = announcement
-
-        try:
-            start = dateutil.parser.parse(self.advertised_start)
-            if start.tzinfo is None:
-                start = start.replace(tzinfo=UTC())
-        except (ValueError, AttributeError):
-            start = self.start
-
-        now = datetime.now(UTC())
-
-        return announcement, start, now
-
     @lazy
     def grading_context(self):
         """
@@ -813,37 +880,6 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
         """Return the course_id for this course"""
         return self.location_to_id(self.location)
 
-    @property
-    def start_date_text(self):
-        def try_parse_iso_8601(text):
-            try:
-                result = Date().from_json(text)
-                if result is None:
-                    result = text.title()
-                else:
-                    result = result.strftime("%b %d, %Y")
-            except ValueError:
-                result = text.title()
-
-            return result
-
-        if isinstance(self.advertised_start, basestring):
-            return try_parse_iso_8601(self.advertised_start)
-        elif self.advertised_start is None and self.start is None:
-            # TODO this is an impossible state since the init function forces start to have a value
-            return 'TBD'
-        else:
-            return (self.advertised_start or self.start).strftime("%b %d, %Y")
-
-    @property
-    def end_date_text(self):
-        """
-        Returns the end date for the course formatted as a string.
-
-        If the course does not have an end date set (course.end is None), an empty string will be returned.
-        """
-        return '' if self.end is None else self.end.strftime("%b %d, %Y")
-
     @property
     def forum_posts_allowed(self):
         date_proxy = Date()
@@ -861,30 +897,62 @@ class CourseDescriptor(CourseFields, SequenceDescriptor):
 
         return True
 
-    @property
-    def number(self):
-        return self.location.course
 
-    @property
-    def display_number_with_default(self):
+class CourseSummary(CourseSummaryMixin):
+    """
+    The few fields of a course needed to list it, in Studio's course listing and the LMS
+    course catalog, which modulestores can keep without loading the course's descriptor.
+    """
+    # The fields of the course which summaries record
+    FIELDS = (
+        'display_name', 'display_organization', 'display_coursenumber', 'start', 'end',
+        'enrollment_start', 'enrollment_end', 'enrollment_domain', 'advertised_start',
+        'announcement', 'is_new', 'ispublic', 'days_early_for_beta', 'course_image',
+        'static_asset_path',
+    )
+
+    def __init__(self, location, fields, data_dir='', locator=None):
         """
-        Return a display course number if it has been specified, otherwise return the 'course' that is in the location
+        location: the Location of the course
+        fields: a dict of the values of the summarized FIELDS of the course
+        data_dir: the directory of the course, for xml courses
+        locator: the url of the course's BlockUsageLocator (in its draft branch), if known
         """
-        if self.display_coursenumber:
-            return self.display_coursenumber
+        self.location = Location(location)
+        self.fields = dict((name, fields.get(name)) for name in self.FIELDS)
+        self.data_dir = data_dir
+        self.locator = locator
 
-        return self.number
+    @classmethod
+    def from_course(cls, course):
+        """
+        Return the summary of the CourseDescriptor `course`.
+        """
+        return cls(
+            course.location,
+            dict((name, getattr(course, name)) for name in cls.FIELDS),
+            data_dir=getattr(course, 'data_dir', ''),
+        )
+
+    def __getattr__(self, name):
+        if name in self.FIELDS:
+            return self.fields[name]
+        raise AttributeError(name)
 
     @property
-    def org(self):
-        return self.location.org
+    def id(self):
+        """Return the course_id of the course"""
+        return CourseDescriptor.location_to_id(self.location)
 
     @property
-    def display_org_with_default(self):
+    def display_name_with_default(self):
         """
-        Return a display organization if it has been specified, otherwise return the 'org' that is in the location
+        Return the display name of the course, or its converted url name if it has none.
         """
-        if self.display_organization:
-            return self.display_organization
+        name = self.display_name
+        if name is None:
+            name = self.location.name.replace('_', ' ')
+        return name
 
-        return self.org
+    def __repr__(self):
+        return "CourseSummary({0!r})".format(self.id)
@@ -478,6 +478,21 @@ class ModuleStoreReadBase(ModuleStoreRead):
         """
         return {}
 
+    def get_course_summaries(self):
+        """
+        Returns a CourseSummary of each course in this modulestore.
+
+        Default impl--summarize the course descriptors. Modulestores which would have to
+        load them should keep the summaries instead.
+        """
+        # imported here, as course_module imports this module
+        from xmodule.course_module import CourseDescriptor, CourseSummary
+        return [
+            CourseSummary.from_course(course)
+            for course in self.get_courses()
+            if isinstance(course, CourseDescriptor)
+        ]
+
     def get_course(self, course_id):
         """Default impl--linear search through course list"""
         for c in self.get_courses():
@@ -129,8 +129,16 @@ def loc_mapper():
     global _loc_singleton
     # pylint: disable=W0212
     if _loc_singleton is None:
+        try:
+            loc_cache = get_cache('loc_cache')
+        except InvalidCacheBackendError:
+            loc_cache = get_cache('default')
         # instantiate
-        _loc_singleton = LocMapperStore(**settings.DOC_STORE_CONFIG)
+        _loc_singleton = LocMapperStore(
+            cache=loc_cache,
+            request_cache=RequestCache.get_request_cache() if HAS_REQUEST_CACHE else None,
+            **settings.DOC_STORE_CONFIG
+        )
     # inject into split mongo modulestore
     if 'split' in _MODULESTORES:
         _MODULESTORES['split'].loc_mapper = _loc_singleton
@@ -1,6 +1,8 @@
 '''
 Method for converting among our differing Location/Locator whatever reprs
 '''
+import cPickle as pickle
+import logging
 from random import randint
 import re
 import pymongo
@@ -11,6 +13,12 @@ from xmodule.modulestore.mongo import draft
 from xmodule.modulestore import Location
 import urllib
 
+log = logging.getLogger(__name__)
+
+# The largest value memcached stores by default. The cache drops larger values silently, so they
+# aren't sent to it; instead, they are looked up in the map on each request, and logged.
+MAX_CACHED_VALUE_SIZE = 1024 * 1024
+
 
 class LocMapperStore(object):
     '''
@@ -25,14 +33,23 @@ class LocMapperStore(object):
 
     The expectation is that the configuration will have this use the same store as whatever is the default
     or dominant store, but that's not a requirement. This store creates its own connection.
+
+    The map entries of each org/course, and the index from the usage_ids of each new style course_id to
+    Locations, are cached in the request cache and the optional (e.g. django) cache, so that translations
+    are dictionary lookups. Writes to the map invalidate the cached entries and indexes they change. As
+    other processes may have changed the map, a translation which misses in the cache is checked against
+    the map itself before adding to the map (or failing).
     '''
 
     def __init__(
-        self, host, db, collection, port=27017, user=None, password=None,
+        self, host, db, collection, port=27017, user=None, password=None, cache=None, request_cache=None,
         **kwargs
     ):
         '''
         Constructor
+
+        :param cache: an optional cache shared by the processes, with get, set and delete methods
+        :param request_cache: an optional request cache, whose data dict is cleared on each request
         '''
         self.db = pymongo.database.Database(
             pymongo.MongoClient(
@@ -48,6 +65,8 @@ class LocMapperStore(object):
 
         self.location_map = self.db[collection + '.location_map']
         self.location_map.write_concern = {'w': 1}
+        self.cache = cache
+        self.request_cache = request_cache
 
     # location_map functions
     def create_map_entry(self, course_location, course_id=None, draft_branch='draft', prod_branch='published',
@@ -102,6 +121,7 @@ class LocMapperStore(object):
             'prod_branch': prod_branch,
             'block_map': block_map or {},
         })
+        self._invalidate_cache({'_id.org': course_location.org, '_id.course': course_location.course})
         return course_id
 
     def translate_location(self, old_style_course_id, location, published=True, add_entry_if_missing=True):
@@ -128,43 +148,33 @@ class LocMapperStore(object):
         """
         location_id = self._interpret_location_course_id(old_style_course_id, location)
 
-        maps = self.location_map.find(location_id).sort('_id.name', pymongo.ASCENDING)
-        if maps.count() == 0:
-            if add_entry_if_missing:
-                # create a new map
-                course_location = location.replace(category='course', name=location_id['_id.name'])
-                self.create_map_entry(course_location)
-                entry = self.location_map.find_one(location_id)
-            else:
-                raise ItemNotFoundError()
-        elif maps.count() > 1:
-            # if more than one, prefer the one w/o a name if that exists. Otherwise, choose the first (alphabetically)
-            entry = maps[0]
-        else:
-            entry = maps[0]
+        entries = self._get_map_entries(location_id)
+        usage_id = self._get_usage_id(entries[0], location) if entries else None
+        if usage_id is None:
+            if self._is_caching():
+                # the cached entries may be stale, so check the map itself before adding to it (or failing)
+                entries = self._get_map_entries(location_id, use_cache=False)
+            if not entries:
+                if add_entry_if_missing:
+                    # create a new map
+                    course_location = location.replace(category='course', name=location_id['_id.name'])
+                    self.create_map_entry(course_location)
+                    entries = self._get_map_entries(location_id, use_cache=False)
+                else:
+                    raise ItemNotFoundError()
+            usage_id = self._get_usage_id(entries[0], location)
+            if usage_id is None:
+                if add_entry_if_missing:
+                    usage_id = self._add_to_block_map(location, location_id, entries[0]['block_map'])
+                else:
+                    raise ItemNotFoundError(location)
 
+        entry = entries[0]
         if published:
             branch = entry['prod_branch']
         else:
             branch = entry['draft_branch']
 
-        usage_id = entry['block_map'].get(self._encode_for_mongo(location.name))
-        if usage_id is None:
-            if add_entry_if_missing:
-                usage_id = self._add_to_block_map(location, location_id, entry['block_map'])
-            else:
-                raise ItemNotFoundError(location)
-        elif isinstance(usage_id, dict):
-            # name is not unique, look through for the right category
-            if location.category in usage_id:
-                usage_id = usage_id[location.category]
-            elif add_entry_if_missing:
-                usage_id = self._add_to_block_map(location, location_id, entry['block_map'])
-            else:
-                raise ItemNotFoundError()
-        else:
-            raise InvalidLocationError()
-
         return BlockUsageLocator(course_id=entry['course_id'], branch=branch, usage_id=usage_id)
 
     def translate_locator_to_location(self, locator, get_course=False):
@@ -187,34 +197,18 @@ class LocMapperStore(object):
         """
         # This does not require that the course exist in any modulestore
         # only that it has a mapping entry.
-        maps = self.location_map.find({'course_id': locator.course_id})
-        # look for one which maps to this block usage_id
-        if maps.count() == 0:
+        index = self._get_locator_index(locator.course_id)
+        location = index['course'] if get_course else index['usage_ids'].get(locator.usage_id)
+        if location is None and self._is_caching():
+            # the cached index may be stale
+            index = self._get_locator_index(locator.course_id, use_cache=False)
+            location = index['course'] if get_course else index['usage_ids'].get(locator.usage_id)
+        if location is None:
             return None
-        for candidate in maps:
-            for old_name, cat_to_usage in candidate['block_map'].iteritems():
-                for category, usage_id in cat_to_usage.iteritems():
-                    if get_course:
-                        if category == 'course':
-                            return Location(
-                                'i4x',
-                                candidate['_id']['org'],
-                                candidate['_id']['course'],
-                                'course',
-                                self._decode_from_mongo(old_name),
-                                None)
-                    elif usage_id == locator.usage_id:
-                        # Always return revision=None because the
-                        # old draft module store wraps locations as draft before
-                        # trying to access things.
-                        return Location(
-                            'i4x',
-                            candidate['_id']['org'],
-                            candidate['_id']['course'],
-                            category,
-                            self._decode_from_mongo(old_name),
-                            None)
-        return None
+        # Always return revision=None because the
+        # old draft module store wraps locations as draft before
+        # trying to access things.
+        return Location(location)
 
     def add_block_location_translator(self, location, old_course_id=None, usage_id=None):
         """
@@ -281,6 +275,7 @@ class LocMapperStore(object):
                 map_entry['block_map'].setdefault(encoded_location_name, {})[location.category] = computed_usage_id
                 self.location_map.update({'_id': map_entry['_id']}, {'$set': {'block_map': map_entry['block_map']}})
 
+        self._invalidate_cache(location_id)
         return computed_usage_id
 
     def update_block_location_translator(self, location, usage_id, old_course_id=None, autogenerated_usage_id=False):
@@ -319,6 +314,7 @@ class LocMapperStore(object):
                 map_entry['block_map'][encoded_location_name][location.category] = usage_id
                 self.location_map.update({'_id': map_entry['_id']}, {'$set': {'block_map': map_entry['block_map']}})
 
+        self._invalidate_cache(location_id)
         return usage_id
 
     def delete_block_location_translator(self, location, old_course_id=None):
@@ -339,6 +335,7 @@ class LocMapperStore(object):
                 else:
                     del map_entry['block_map'][encoded_location_name][location.category]
                 self.location_map.update({'_id': map_entry['_id']}, {'$set': {'block_map': map_entry['block_map']}})
+        self._invalidate_cache(location_id)
 
     def _add_to_block_map(self, location, location_id, block_map):
         '''add the given location to the block_map and persist it'''
@@ -353,8 +350,119 @@ class LocMapperStore(object):
         encoded_location_name = self._encode_for_mongo(location.name)
         block_map.setdefault(encoded_location_name, {})[location.category] = usage_id
         self.location_map.update(location_id, {'$set': {'block_map': block_map}})
+        self._invalidate_cache(location_id)
         return usage_id
 
+    def _get_map_entries(self, location_id, use_cache=True):
+        '''
+        Return the map entries matching location_id (see _interpret_location_course_id), sorted by run, with
+        the one w/o a run first, so that callers prefer it. The entries of all the runs of the org/course are
+        read and cached together.
+        '''
+        key = u'loc_mapper.entries.{0}/{1}'.format(location_id['_id.org'], location_id['_id.course'])
+        entries = self._get_cached(key) if use_cache else None
+        if entries is None:
+            entries = list(self.location_map.find(
+                {'_id.org': location_id['_id.org'], '_id.course': location_id['_id.course']}
+            ).sort('_id.name', pymongo.ASCENDING))
+            self._set_cached(key, entries)
+        if '_id.name' in location_id:
+            entries = [entry for entry in entries if entry['_id'].get('name') == location_id['_id.name']]
+        return entries
+
+    def _get_usage_id(self, entry, location):
+        '''
+        Return the usage_id the map entry gives location, or None if it has none.
+        '''
+        usage_id = entry['block_map'].get(self._encode_for_mongo(location.name))
+        if usage_id is None:
+            return None
+        elif isinstance(usage_id, dict):
+            # name is not unique, look through for the right category
+            return usage_id.get(location.category)
+        else:
+            raise InvalidLocationError()
+
+    def _get_locator_index(self, course_id, use_cache=True):
+        '''
+        Return the index of the maps to the new style course_id: a dict of the course's Location
+        ('course') and of the Locations of its usage_ids ('usage_ids'), as tuples. If more than one map
+        gives a usage_id (or a course), the first one wins.
+        '''
+        key = u'loc_mapper.index.{0}'.format(course_id)
+        index = self._get_cached(key) if use_cache else None
+        if index is None:
+            index = {'course': None, 'usage_ids': {}}
+            for candidate in self.location_map.find({'course_id': course_id}):
+                for old_name, cat_to_usage in candidate['block_map'].iteritems():
+                    for category, usage_id in cat_to_usage.iteritems():
+                        location = (
+                            'i4x', candidate['_id']['org'], candidate['_id']['course'],
+                            category, self._decode_from_mongo(old_name), None
+                        )
+                        if category == 'course' and index['course'] is None:
+                            index['course'] = location
+                        index['usage_ids'].setdefault(usage_id, location)
+            self._set_cached(key, index)
+        return index
+
+    def _invalidate_cache(self, location_id):
+        '''
+        Drop the cached entries of the org/course of location_id, and the cached indexes of the course_ids
+        they map to.
+        '''
+        if not self._is_caching():
+            return
+        query = {'_id.org': location_id['_id.org'], '_id.course': location_id['_id.course']}
+        self._delete_cached(u'loc_mapper.entries.{0}/{1}'.format(query['_id.org'], query['_id.course']))
+        for entry in self.location_map.find(query, {'course_id': True}):
+            self._delete_cached(u'loc_mapper.index.{0}'.format(entry['course_id']))
+
+    def _is_caching(self):
+        '''
+        Whether translations are cached at all.
+        '''
+        return self.cache is not None or self.request_cache is not None
+
+    def _get_cached(self, key):
+        '''
+        Return the value cached for key in the request cache or else the cache, or None.
+        '''
+        if self.request_cache is not None and key in self.request_cache.data.get('loc_mapper', {}):
+            return self.request_cache.data['loc_mapper'][key]
+        if self.cache is None:
+            return None
+        value = self.cache.get(key)
+        if value is not None and self.request_cache is not None:
+            self.request_cache.data.setdefault('loc_mapper', {})[key] = value
+        return value
+
+    def _set_cached(self, key, value):
+        '''
+        Cache value for key in both the cache and the request cache.
+        '''
+        if self.cache is not None:
+            # the size as pickled by python-memcached (with protocol 0)
+            size = len(pickle.dumps(value))
+            if size > MAX_CACHED_VALUE_SIZE:
+                log.warning(
+                    "Not caching %s: it is %d bytes, which is more than the cache's limit of %d",
+                    key, size, MAX_CACHED_VALUE_SIZE
+                )
+            else:
+                self.cache.set(key, value)
+        if self.request_cache is not None:
+            self.request_cache.data.setdefault('loc_mapper', {})[key] = value
+
+    def _delete_cached(self, key):
+        '''
+        Drop the value cached for key from both the cache and the request cache.
+        '''
+        if self.cache is not None:
+            self.cache.delete(key)
+        if self.request_cache is not None:
+            self.request_cache.data.get('loc_mapper', {}).pop(key, None)
+
     def _interpret_location_course_id(self, course_id, location):
         """
         Take the old style course id (org/course/run) and return a dict for querying the mapping table.
@@ -124,6 +124,18 @@ class MixedModuleStore(ModuleStoreWriteBase):
 
         return courses
 
+    def get_course_summaries(self):
+        """
+        Returns a CourseSummary of each of the courses get_courses returns, without loading them.
+        """
+        summaries = []
+        for key, store in self.modulestores.iteritems():
+            for summary in store.get_course_summaries():
+                # as in get_courses, only surface the courses of non default stores which are mapped to them
+                if key == 'default' or key == self.mappings.get(summary.location.course_id, 'default'):
+                    summaries.append(summary)
+        return summaries
+
     def get_course(self, course_id):
         """
         returns the course module associated with the course_id
@@ -14,8 +14,8 @@ structure:
 
 import pymongo
 import sys
+import time
 import logging
-import copy
 
 from bson.son import SON
 from fs.osfs import OSFS
@@ -23,6 +23,7 @@ from itertools import repeat
 from path import path
 
 from importlib import import_module
+from xmodule.course_module import CourseDescriptor, CourseSummary
 from xmodule.errortracker import null_error_tracker, exc_info_to_str
 from xmodule.mako_module import MakoDescriptorSystem
 from xmodule.x_module import XModuleDescriptor
@@ -250,6 +251,23 @@ def metadata_cache_key(location):
     return u"{0.org}/{0.course}".format(location)
 
 
+def parent_index_cache_key(location):
+    """Turn a `Location` into the cache key of the parent index of its course."""
+    return u"{0.org}/{0.course}/parents".format(location)
+
+
+def inheritance_version_cache_key(location):
+    """Turn a `Location` into the cache key of the version of the cached inheritance tree of its course."""
+    return u"{0.org}/{0.course}/version".format(location)
+
+
+def versioned_cache_key(key, version):
+    """Return the cache key of `key` for `version` of its course (None if the versions aren't tracked)."""
+    if version is None:
+        return key
+    return u"{0}/{1}".format(key, version)
+
+
 class MongoModuleStore(ModuleStoreWriteBase):
     """
     A Mongodb backed ModuleStore
@@ -284,6 +302,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
                 db
             )
             self.collection = self.database[collection]
+            self.course_summaries = self.database[collection + '.course_summaries']
 
             if user is not None and password is not None:
                 self.database.authenticate(user, password)
@@ -310,35 +329,41 @@ class MongoModuleStore(ModuleStoreWriteBase):
         self.render_template = render_template
         self.ignore_write_events_on_courses = []
 
-    def compute_metadata_inheritance_tree(self, location):
-        '''
-        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
-        '''
+    # The most items bulk_write_items writes at once
+    BULK_WRITE_BATCH_SIZE = 500
 
-        # get all collections in the course, this query should not return any leaf nodes
-        # note this is a bit ugly as when we add new categories of containers, we have to add it here
-        query = {'_id.org': location.org,
-                 '_id.course': location.course,
-                 '_id.category': {'$in': ['course', 'chapter', 'sequential', 'vertical', 'videosequence',
-                                          'wrapper', 'problemset', 'conditional', 'randomize']}
-                 }
-        # we just want the Location, children, and inheritable metadata
-        record_filter = {'_id': 1, 'definition.children': 1}
+    # The categories of modules that can have children, and so are part of the metadata
+    # inheritance tree. Note this is a bit ugly as when we add new categories of containers,
+    # we have to add it here
+    INHERITANCE_CONTAINER_CATEGORIES = [
+        'course', 'chapter', 'sequential', 'vertical', 'videosequence',
+        'wrapper', 'problemset', 'conditional', 'randomize'
+    ]
 
-        # just get the inheritable metadata since that is all we need for the computation
-        # this minimizes both data pushed over the wire
+    def _inheritance_record_filter(self):
+        """
+        Return the record filter for the fields of a module needed to compute the metadata
+        inheritance tree: the Location, children, and inheritable metadata. This minimizes
+        the data pushed over the wire.
+        """
+        record_filter = {'_id': 1, 'definition.children': 1}
         for field_name in InheritanceMixin.fields:
             record_filter['metadata.{0}'.format(field_name)] = 1
+        return record_filter
 
-        # call out to the DB
-        resultset = self.collection.find(query, record_filter)
+    def _find_inheritance_records(self, query, parents_by_url=None):
+        """
+        Return a dict mapping location url to the inheritance records (see
+        `_inheritance_record_filter`) of the modules matching `query`.
 
+        If `parents_by_url` is given, the url of each matching module (draft or not) is also
+        recorded in it as a parent of each of the module's children.
+        """
         results_by_url = {}
-        root = None
-
-        # now go through the results and order them by the location url
-        for result in resultset:
+        for result in self.collection.find(query, self._inheritance_record_filter()):
             location = Location(result['_id'])
+            if parents_by_url is not None:
+                self._add_to_parent_index(location, result, parents_by_url)
             # We need to collate between draft and non-draft
             # i.e. draft verticals will have draft children but will have non-draft parents currently
             location = location.replace(revision=None)
@@ -348,42 +373,249 @@ class MongoModuleStore(ModuleStoreWriteBase):
                 additional_children = result.get('definition', {}).get('children', [])
                 total_children = existing_children + additional_children
                 results_by_url[location_url].setdefault('definition', {})['children'] = total_children
-            results_by_url[location.url()] = result
-            if location.category == 'course':
-                root = location.url()
+            results_by_url[location_url] = result
+        return results_by_url
 
-        # now traverse the tree and compute down the inherited metadata
-        metadata_to_inherit = {}
+    @staticmethod
+    def _add_to_parent_index(parent_location, record, parents_by_url):
+        """
+        Record `parent_location` in `parents_by_url` as a parent of each of the children in
+        `record` (its document, or its inheritance record).
+        """
+        parent_url = parent_location.url()
+        if parent_location.category == 'course':
+            # so that looking up the parents of the course doesn't need a query
+            parents_by_url.setdefault(parent_url, [])
+        for child in record.get('definition', {}).get('children', []):
+            parents = parents_by_url.setdefault(child, [])
+            if parent_url not in parents:
+                parents.append(parent_url)
+
+    @staticmethod
+    def _compute_inherited_metadata(url, results_by_url, metadata_to_inherit):
+        """
+        Record in `metadata_to_inherit` what each descendant of the module at `url` inherits,
+        given the inheritance records in `results_by_url` (which must hold the metadata `url`
+        passes on to its children).
 
-        def _compute_inherited_metadata(url):
-            """
-            Helper method for computing inherited metadata for a specific location url
-            """
-            # check for presence of metadata key. Note that a given module may not yet be fully formed.
-            # example: update_item -> update_children -> update_metadata sequence on new item create
-            # if we get called here without update_metadata called first then 'metadata' hasn't been set
-            # as we're not fully transactional at the DB layer. Same comment applies to below key name
-            # check
-            my_metadata = results_by_url[url].get('metadata', {})
-
-            # go through all the children and recurse, but only if we have
-            # in the result set. Remember results will not contain leaf nodes
-            for child in results_by_url[url].get('definition', {}).get('children', []):
-                if child in results_by_url:
-                    new_child_metadata = copy.deepcopy(my_metadata)
-                    new_child_metadata.update(results_by_url[child].get('metadata', {}))
-                    results_by_url[child]['metadata'] = new_child_metadata
-                    metadata_to_inherit[child] = new_child_metadata
-                    _compute_inherited_metadata(child)
+        The metadata dicts are shared between a parent and all of its children that don't
+        set any inheritable metadata themselves, and are never modified once recorded: a
+        child that does set some gets a new dict.
+        """
+        # check for presence of metadata key. Note that a given module may not yet be fully formed.
+        # example: update_item -> update_children -> update_metadata sequence on new item create
+        # if we get called here without update_metadata called first then 'metadata' hasn't been set
+        # as we're not fully transactional at the DB layer. Same comment applies to below key name
+        # check
+        my_metadata = results_by_url[url].get('metadata', {})
+
+        # go through all the children and recurse, but only if we have
+        # in the result set. Remember results will not contain leaf nodes
+        for child in results_by_url[url].get('definition', {}).get('children', []):
+            if child in results_by_url:
+                child_metadata = results_by_url[child].get('metadata', {})
+                if child_metadata:
+                    new_child_metadata = dict(my_metadata)
+                    new_child_metadata.update(child_metadata)
                 else:
-                    # this is likely a leaf node, so let's record what metadata we need to inherit
-                    metadata_to_inherit[child] = my_metadata
+                    new_child_metadata = my_metadata
+                results_by_url[child]['metadata'] = new_child_metadata
+                metadata_to_inherit[child] = new_child_metadata
+                MongoModuleStore._compute_inherited_metadata(child, results_by_url, metadata_to_inherit)
+            else:
+                # this is likely a leaf node, so let's record what metadata we need to inherit
+                metadata_to_inherit[child] = my_metadata
+
+    def compute_metadata_inheritance_tree(self, location, parents_by_url=None):
+        '''
+        TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
+
+        If `parents_by_url` is given, it is filled in with the parent index of the course (see
+        `get_cached_parent_index`) from the same query.
+        '''
+
+        # get all collections in the course, this query should not return any leaf nodes
+        query = {'_id.org': location.org,
+                 '_id.course': location.course,
+                 '_id.category': {'$in': self.INHERITANCE_CONTAINER_CATEGORIES}
+                 }
+        results_by_url = self._find_inheritance_records(query, parents_by_url)
 
-        if root is not None:
-            _compute_inherited_metadata(root)
+        # now traverse the tree and compute down the inherited metadata
+        metadata_to_inherit = {}
+        for url in results_by_url:
+            if Location(url).category == 'course':
+                self._compute_inherited_metadata(url, results_by_url, metadata_to_inherit)
+                break
 
         return metadata_to_inherit
 
+    def update_metadata_inheritance_subtree(self, location, tree):
+        """
+        Update `tree`, a metadata inheritance tree for the course of `location`, after a
+        change to the module at `location` (its children or metadata, or its deletion).
+        Only the inheritance records of the modules under `location` are fetched and
+        recomputed; the rest of `tree` is assumed to be current.
+
+        Returns True if `tree` was updated, or False if the whole tree has to be recomputed.
+        """
+        location = Location(location).replace(revision=None)
+        url = location.url()
+        if location.category not in self.INHERITANCE_CONTAINER_CATEGORIES:
+            # The tree doesn't depend on the metadata of leaf modules, and the entry of a
+            # deleted leaf is never looked up
+            return True
+
+        # fetch the containers in the subtree, one level at a time
+        results_by_url = {}
+        urls_to_fetch = [url]
+        while urls_to_fetch:
+            locations_to_fetch = [
+                Location(child_url) for child_url in urls_to_fetch
+                if Location(child_url).category in self.INHERITANCE_CONTAINER_CATEGORIES
+            ]
+            if not locations_to_fetch:
+                break
+            found = self._find_inheritance_records({
+                '_id.org': location.org,
+                '_id.course': location.course,
+                '_id.category': {'$in': list(set(child.category for child in locations_to_fetch))},
+                '_id.name': {'$in': [child.name for child in locations_to_fetch]},
+            })
+            urls_to_fetch = []
+            for child in locations_to_fetch:
+                child_url = child.url()
+                if child_url in found and child_url not in results_by_url:
+                    results_by_url[child_url] = found[child_url]
+                    urls_to_fetch.extend(found[child_url].get('definition', {}).get('children', []))
+
+        if url not in results_by_url:
+            # the module was deleted
+            tree.pop(url, None)
+            return True
+
+        # find the metadata that the module inherits from its parent
+        if location.category == 'course':
+            inherited = {}
+        else:
+            parents = self._find_inheritance_records({'definition.children': url})
+            if not parents:
+                # orphans (e.g. newly created modules) aren't part of the course tree
+                return True
+            if len(parents) > 1:
+                # modules with several parents are resolved by a full recompute
+                return False
+            parent_url, parent = parents.items()[0]
+            if parent_url in tree:
+                inherited = tree[parent_url]
+            elif Location(parent_url).category == 'course':
+                inherited = parent.get('metadata', {})
+            else:
+                # the parent isn't in the course tree, so neither is this subtree
+                return True
+
+        own_metadata = results_by_url[url].get('metadata', {})
+        if own_metadata:
+            metadata = dict(inherited)
+            metadata.update(own_metadata)
+        else:
+            metadata = inherited
+        results_by_url[url]['metadata'] = metadata
+        if location.category != 'course':
+            tree[url] = metadata
+
+        self._compute_inherited_metadata(url, results_by_url, tree)
+        return True
+
+    def update_parent_index(self, location, parents_by_url):
+        """
+        Update `parents_by_url`, a parent index for the course of `location` (see
+        `get_cached_parent_index`), after a change to the children of the module at
+        `location`, or its deletion.
+        """
+        location = Location(location)
+        if location.category not in self.INHERITANCE_CONTAINER_CATEGORIES:
+            # only containers are indexed as parents
+            return
+        # forget both the draft and non-draft versions of the module...
+        urls = set([location.replace(revision=None).url(), location.replace(revision='draft').url()])
+        for parents in parents_by_url.itervalues():
+            parents[:] = [parent_url for parent_url in parents if parent_url not in urls]
+
+        # ...and re-index whichever of them still exist
+        records = self.collection.find(
+            {
+                '_id.tag': location.tag,
+                '_id.org': location.org,
+                '_id.course': location.course,
+                '_id.category': location.category,
+                '_id.name': location.name,
+            },
+            {'_id': 1, 'definition.children': 1}
+        )
+        for record in records:
+            self._add_to_parent_index(Location(record['_id']), record, parents_by_url)
+
+    def _inheritance_cache_version(self, location, increment=False):
+        """
+        Return the version of the cached metadata inheritance tree and parent index of the
+        course of `location` in the caching subsystem, or None if there is no caching subsystem.
+
+        Each write to the course increments the version (see `refresh_cached_metadata_inheritance_tree`),
+        so that no process uses what was cached for an earlier version of the course again.
+        """
+        cache = self.metadata_inheritance_cache_subsystem
+        if cache is None:
+            return None
+        key = inheritance_version_cache_key(location)
+        if not increment:
+            version = cache.get(key)
+            if version is not None:
+                return version
+        # Start from the time rather than from 0, so that if the version is evicted from the
+        # cache, it doesn't go back to a version whose tree is still cached.
+        cache.add(key, int(time.time() * 1000))
+        if not increment:
+            return cache.get(key)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # the version was evicted between the add and the incr
+            cache.add(key, int(time.time() * 1000))
+            return cache.incr(key)
+
+    def _get_from_request_cache(self, key):
+        """
+        Return the metadata inheritance tree (or parent index) for `key` from the request cache,
+        or None if it doesn't have it.
+        """
+        if self.request_cache is not None:
+            return self.request_cache.data.get('metadata_inheritance', {}).get(key)
+        return None
+
+    def _set_in_inheritance_cache(self, key, tree, version=None, request_cache_only=False):
+        """
+        Write out the metadata inheritance tree (or parent index) for `key` to the caching
+        subsystem (e.g. memcached) for `version` of the course, if available, and to the
+        request cache, if available.
+        """
+        if self.metadata_inheritance_cache_subsystem is not None and not request_cache_only:
+            self.metadata_inheritance_cache_subsystem.set(versioned_cache_key(key, version), tree)
+
+        if self.request_cache is not None:
+            # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
+            # defined
+            if 'metadata_inheritance' not in self.request_cache.data:
+                self.request_cache.data['metadata_inheritance'] = {}
+            self.request_cache.data['metadata_inheritance'][key] = tree
+
+    def _drop_from_request_cache(self, key):
+        """
+        Forget the metadata inheritance tree (or parent index) for `key` in the request cache.
+        """
+        if self.request_cache is not None:
+            self.request_cache.data.get('metadata_inheritance', {}).pop(key, None)
+
     def get_cached_metadata_inheritance_tree(self, location, force_refresh=False):
         '''
         TODO (cdodge) This method can be deleted when the 'split module store' work has been completed
@@ -398,38 +630,106 @@ class MongoModuleStore(ModuleStoreWriteBase):
 
             # then look in any caching subsystem (e.g. memcached)
             if self.metadata_inheritance_cache_subsystem is not None:
-                tree = self.metadata_inheritance_cache_subsystem.get(key, {})
+                version = self._inheritance_cache_version(location)
+                tree = self.metadata_inheritance_cache_subsystem.get(versioned_cache_key(key, version), {})
             else:
                 logging.warning('Running MongoModuleStore without a metadata_inheritance_cache_subsystem. This is OK in localdev and testing environment. Not OK in production.')
 
         if not tree:
             # if not in subsystem, or we are on force refresh, then we have to compute
-            tree = self.compute_metadata_inheritance_tree(location)
+            tree = self._compute_and_cache_inheritance(location)[0]
+        else:
+            # NOTE: after a memcache hit, it'll get put into the request_cache
+            self._set_in_inheritance_cache(key, tree, request_cache_only=True)
 
-            # now write out computed tree to caching subsystem (e.g. memcached), if available
-            if self.metadata_inheritance_cache_subsystem is not None:
-                self.metadata_inheritance_cache_subsystem.set(key, tree)
+        return tree
 
-        # now populate a request_cache, if available. NOTE, we are outside of the
-        # scope of the above if: statement so that after a memcache hit, it'll get
-        # put into the request_cache
-        if self.request_cache is not None:
-            # we can't assume the 'metadatat_inheritance' part of the request cache dict has been
-            # defined
-            if 'metadata_inheritance' not in self.request_cache.data:
-                self.request_cache.data['metadata_inheritance'] = {}
-            self.request_cache.data['metadata_inheritance'][key] = tree
+    def _compute_and_cache_inheritance(self, location):
+        """
+        Compute the metadata inheritance tree and the parent index of the course of `location`
+        together, and write them out to the caches. Returns (tree, parent index).
+        """
+        # The version is read before the modules, so what is cached for it is at least as
+        # recent as every write which incremented the version to it
+        version = self._inheritance_cache_version(location)
+        parents_by_url = {}
+        tree = self.compute_metadata_inheritance_tree(location, parents_by_url)
+        self._set_in_inheritance_cache(metadata_cache_key(location), tree, version)
+        self._set_in_inheritance_cache(parent_index_cache_key(location), parents_by_url, version)
+        return tree, parents_by_url
+
+    def get_cached_parent_index(self, location):
+        """
+        Return the parent index of the course of `location`: a dict mapping the url of each
+        child of a container in the course to the urls of the containers (draft or not)
+        which list it as a child. It's cached alongside the metadata inheritance tree.
+        """
+        key = parent_index_cache_key(location)
+        if self.request_cache is not None and key in self.request_cache.data.get('metadata_inheritance', {}):
+            return self.request_cache.data['metadata_inheritance'][key]
+
+        parents_by_url = None
+        if self.metadata_inheritance_cache_subsystem is not None:
+            versioned_key = versioned_cache_key(key, self._inheritance_cache_version(location))
+            parents_by_url = self.metadata_inheritance_cache_subsystem.get(versioned_key, {}) or None
+        if parents_by_url is None:
+            parents_by_url = self._compute_and_cache_inheritance(location)[1]
+        else:
+            self._set_in_inheritance_cache(key, parents_by_url, request_cache_only=True)
+        return parents_by_url
 
-        return tree
+    def _get_previous_version(self, key, version):
+        """
+        Return the tree (or parent index) for `key` cached for the version of the course before
+        `version`, to update for `version`, or None if it isn't cached.
+        """
+        if version is None:
+            # without a caching subsystem, it's only cached for this request
+            return self._get_from_request_cache(key)
+        return self.metadata_inheritance_cache_subsystem.get(versioned_cache_key(key, version - 1), {}) or None
 
-    def refresh_cached_metadata_inheritance_tree(self, location):
+    def refresh_cached_metadata_inheritance_tree(self, location, incremental=False):
         """
         Refresh the cached metadata inheritance tree for the org/course combination
         for location
+
+        This is called after every write to the course.  It increments the version of the
+        course's cached tree, so that every process stops using the tree of the previous version.
+
+        If `incremental` is True, the tree of the new version is the tree of the previous
+        version, with only the part under `location` recomputed (see
+        `update_metadata_inheritance_subtree`). If the tree of the previous version isn't
+        cached (e.g. it's being computed, or another write is in progress), nothing is cached
+        for the new version, and the tree is recomputed when it's next needed. A tree is
+        never updated in place in the cache, so concurrent writes can't lose each other's changes.
+        The cached parent index is likewise versioned, and updated for `location` alone.
         """
         pseudo_course_id = '/'.join([location.org, location.course])
-        if pseudo_course_id not in self.ignore_write_events_on_courses:
-            self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
+        if pseudo_course_id in self.ignore_write_events_on_courses:
+            return
+
+        version = self._inheritance_cache_version(location, increment=True)
+        if incremental:
+            key = metadata_cache_key(location)
+            tree = self._get_previous_version(key, version)
+            if tree is None:
+                self._drop_from_request_cache(key)
+            elif self.update_metadata_inheritance_subtree(location, tree):
+                self._set_in_inheritance_cache(key, tree, version)
+            else:
+                self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
+                return
+
+            parents_key = parent_index_cache_key(location)
+            parents_by_url = self._get_previous_version(parents_key, version)
+            if parents_by_url is None:
+                self._drop_from_request_cache(parents_key)
+            else:
+                self.update_parent_index(location, parents_by_url)
+                self._set_in_inheritance_cache(parents_key, parents_by_url, version)
+            return
+
+        self.get_cached_metadata_inheritance_tree(location, force_refresh=True)
 
     def _clean_item_data(self, item):
         """
@@ -537,6 +837,63 @@ class MongoModuleStore(ModuleStoreWriteBase):
             )
         ]
 
+    def get_course_summaries(self):
+        '''
+        Returns a CourseSummary of each course, read from the course summaries collection
+        which writes to the courses keep up to date. Summaries are made for the courses
+        which have none yet (e.g. the ones created before summaries were kept), and the
+        ones of courses which no longer exist are removed.
+        '''
+        course_locations = {}
+        for item in self.collection.find(location_to_query(Location("i4x", category="course")), {'_id': True}):
+            location = Location(item['_id'])
+            if not (location.org == 'edx' and location.course == 'templates'):
+                course_locations[location.course_id] = location
+
+        documents = dict((document['_id'], document) for document in self.course_summaries.find())
+        for course_id in set(documents) - set(course_locations):
+            self.course_summaries.remove({'_id': course_id})
+            del documents[course_id]
+        for course_id in set(course_locations) - set(documents):
+            document = self.refresh_course_summary(course_locations[course_id])
+            if document is not None:
+                documents[course_id] = document
+
+        return [
+            CourseSummary(document['location'], document['fields'], locator=document.get('locator'))
+            for document in documents.itervalues()
+        ]
+
+    def refresh_course_summary(self, location):
+        '''
+        Update the summary of the course at `location` from the course, returning the
+        summary document, or None if the course doesn't exist (or failed to load) and so
+        has no summary. Does nothing for other locations.
+        '''
+        location = Location(location)
+        if location.category != 'course' or location.revision is not None:
+            return None
+
+        try:
+            course = self.get_item(location)
+        except ItemNotFoundError:
+            course = None
+        if not isinstance(course, CourseDescriptor):
+            self.course_summaries.remove({'_id': location.course_id})
+            return None
+
+        # don't overwrite the course's locator, which is set separately
+        document = {'location': location.url(), 'fields': CourseSummary.from_course(course).fields}
+        self.course_summaries.update({'_id': location.course_id}, {'$set': document}, upsert=True)
+        return self.course_summaries.find_one({'_id': location.course_id})
+
+    def set_course_summary_locator(self, course_id, locator):
+        '''
+        Record the url of the BlockUsageLocator of the course in its summary, so listing the
+        course doesn't need to translate its location.
+        '''
+        self.course_summaries.update({'_id': course_id}, {'$set': {'locator': locator}})
+
     def _find_one(self, location):
         '''Look for a given location in the collection.  If revision is not
         specified, returns the latest.  If the item is not present, raise
@@ -665,7 +1022,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
                 }
             })
         # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(xmodule.location)
+        self.refresh_cached_metadata_inheritance_tree(xmodule.location, incremental=True)
+        self.refresh_course_summary(xmodule.location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(xmodule.location), xmodule.location)
 
     def create_and_save_xmodule(self, location, definition_data=None, metadata=None, system=None):
@@ -758,6 +1116,56 @@ class MongoModuleStore(ModuleStoreWriteBase):
         if result['n'] == 0:
             raise ItemNotFoundError(location)
 
+    def bulk_write_items(self, items):
+        """
+        Write many items at once, like a sequence of update_item, update_children and
+        update_metadata calls would.
+
+        items: a list of (location, update) pairs, where update maps any of 'definition.data',
+            'definition.children' and 'metadata' to their new values
+
+        The items which don't exist yet are inserted in batches of BULK_WRITE_BATCH_SIZE, and
+        the existing ones updated with a single update each. Unlike update_metadata, this
+        doesn't keep the course's tabs in sync with static_tabs, and neither refreshes the
+        metadata inheritance tree nor fires any signals: callers should do so once done.
+        It does refresh the summaries of the courses it writes.
+        """
+        for start in xrange(0, len(items), self.BULK_WRITE_BATCH_SIZE):
+            batch = [
+                (Location(location), update)
+                for location, update in items[start:start + self.BULK_WRITE_BATCH_SIZE]
+            ]
+            existing_urls = set(
+                Location(item['_id']).url()
+                for item in self.collection.find(
+                    {'_id': {'$in': [location.dict() for location, _ in batch]}},
+                    {'_id': True}
+                )
+            )
+
+            new_items = []
+            for location, update in batch:
+                if location.url() in existing_urls:
+                    self._update_single_item(location, update)
+                    continue
+                item = {'_id': location.dict()}
+                for key, value in update.iteritems():
+                    # turn the dotted keys of the update into nested documents
+                    parent = item
+                    parts = key.split('.')
+                    for part in parts[:-1]:
+                        parent = parent.setdefault(part, {})
+                    parent[parts[-1]] = value
+                new_items.append(item)
+
+            if new_items:
+                # Must include this to avoid the django debug toolbar (which defines the deprecated "safe=False")
+                # from overriding our default value set in the init method.
+                self.collection.insert(new_items, safe=self.collection.safe)
+
+            for location, _ in batch:
+                self.refresh_course_summary(location)
+
     def update_item(self, location, data, allow_not_found=False):
         """
         Set the data in the item specified by the location to
@@ -771,6 +1179,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
         except ItemNotFoundError:
             if not allow_not_found:
                 raise
+        self.refresh_course_summary(location)
 
     def update_children(self, location, children):
         """
@@ -783,7 +1192,7 @@ class MongoModuleStore(ModuleStoreWriteBase):
 
         self._update_single_item(location, {'definition.children': children})
         # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        self.refresh_cached_metadata_inheritance_tree(Location(location), incremental=True)
         # fire signal that we've written to DB
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
@@ -813,7 +1222,8 @@ class MongoModuleStore(ModuleStoreWriteBase):
 
         self._update_single_item(location, {'metadata': metadata})
         # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(loc)
+        self.refresh_cached_metadata_inheritance_tree(loc, incremental=True)
+        self.refresh_course_summary(loc)
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def delete_item(self, location, delete_all_versions=False):
@@ -839,17 +1249,29 @@ class MongoModuleStore(ModuleStoreWriteBase):
         # from overriding our default value set in the init method.
         self.collection.remove({'_id': Location(location).dict()}, safe=self.collection.safe)
         # recompute (and update) the metadata inheritance tree which is cached
-        self.refresh_cached_metadata_inheritance_tree(Location(location))
+        self.refresh_cached_metadata_inheritance_tree(Location(location), incremental=True)
+        self.refresh_course_summary(location)
         self.fire_updated_modulestore_signal(get_course_id_no_run(Location(location)), Location(location))
 
     def get_parent_locations(self, location, course_id):
         '''Find all locations that are the parents of this location in this
         course.  Needed for path_to_location().
+
+        The parents are looked up in the cached parent index of the course (see
+        `get_cached_parent_index`), falling back to a query for the modules which
+        have no parents in it (e.g. orphans and the children of non-container modules).
         '''
         location = Location.ensure_fully_specified(location)
+        pseudo_course_id = '/'.join([location.org, location.course])
+        if pseudo_course_id not in self.ignore_write_events_on_courses:
+            parents_by_url = self.get_cached_parent_index(location)
+            parents = parents_by_url.get(location.url())
+            if parents or (parents is not None and location.category == 'course'):
+                return [Location(parent_url) for parent_url in parents]
+
         items = self.collection.find({'definition.children': location.url()},
                                      {'_id': True})
-        return [i['_id'] for i in items]
+        return [Location(i['_id']) for i in items]
 
     def get_modulestore_type(self, course_id):
         """
@@ -1,3 +1,5 @@
+import copy
+
 from xmodule.modulestore.locator import DefinitionLocator
 
 
@@ -8,18 +10,60 @@ class DefinitionLazyLoader(object):
     object doesn't force access during init but waits until client wants the
     definition. Only works if the modulestore is a split mongo store.
     """
-    def __init__(self, modulestore, definition_id):
+    def __init__(self, modulestore, definition_id, prefetch_group=None):
         """
         Simple placeholder for yet-to-be-fetched data
         :param modulestore: the pymongo db connection with the definitions
         :param definition_locator: the id of the record in the above to fetch
+        :param prefetch_group: a DefinitionPrefetchGroup to fetch the definition with, if any
         """
         self.modulestore = modulestore
         self.definition_locator = DefinitionLocator(definition_id)
+        self.prefetch_group = prefetch_group
+        if prefetch_group is not None:
+            prefetch_group.add(self.definition_locator.definition_id)
 
     def fetch(self):
         """
         Fetch the definition. Note, the caller should replace this lazy
         loader pointer with the result so as not to fetch more than once
         """
+        if self.prefetch_group is not None:
+            return self.prefetch_group.fetch(self.definition_locator.definition_id)
         return self.modulestore.db_connection.get_definition(self.definition_locator.definition_id)
+
+
+class DefinitionPrefetchGroup(object):
+    """
+    The definitions of a group of lazily loaded blocks, which are all fetched, in one query, when
+    the first of them is accessed.
+    """
+    def __init__(self, modulestore):
+        """
+        :param modulestore: the split mongo store to fetch the definitions from
+        """
+        self.modulestore = modulestore
+        self.definition_ids = []
+        self.definitions = None
+
+    def add(self, definition_id):
+        """
+        Add the definition with this id to the group
+        """
+        self.definition_ids.append(definition_id)
+
+    def fetch(self, definition_id):
+        """
+        Fetch the definition with this id, fetching all the group's definitions if this is the first
+        access. Returns a copy, so that changes to one block's fields don't change another's.
+        """
+        if self.definitions is None:
+            self.definitions = {
+                definition['_id']: definition
+                for definition in self.modulestore.db_connection.get_definitions(self.definition_ids)
+            }
+        definition = self.definitions.get(definition_id)
+        if definition is None:
+            # not one of the group's, or doesn't exist
+            return self.modulestore.db_connection.get_definition(definition_id)
+        return copy.deepcopy(definition)
@@ -0,0 +1,181 @@
+"""
+A bounded cache of the split modulestore's structures and definitions, shared by the threads of a process.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from bson import BSON
+
+
+class DocumentCache(object):
+    """
+    A least recently used cache of documents keyed by their version guids (their '_id's), optionally
+    backed by a django cache shared between processes.
+
+    The documents are kept BSON encoded. That gives the size of each entry, which is how the cache
+    accounts for and bounds its memory, and makes every get return a new copy which the caller is free
+    to change (the modulestore computes inheritance and versions new structures in place).
+
+    Documents of the `versioned_kinds` may be changed in place in the db, so their keys include an
+    edit version kept in the shared cache, which `delete` increments: no process then finds the copy
+    it cached before the change. Without a shared cache, they aren't cached at all.
+    """
+    def __init__(self, max_size, shared_cache=None, key_prefix='', tz_aware=True, versioned_kinds=()):
+        """
+        :param max_size: the most bytes of encoded documents to keep in memory. 0 keeps none.
+        :param shared_cache: a django cache to keep the documents in for other processes, or None
+        :param key_prefix: distinguishes the documents of this store's collections in the shared cache
+        :param tz_aware: whether to decode datetimes as tz aware, as the mongo connection does
+        :param versioned_kinds: the kinds of documents which are changed in place
+        """
+        self.max_size = max_size
+        self.shared_cache = shared_cache
+        self.key_prefix = key_prefix
+        self.tz_aware = tz_aware
+        self.versioned_kinds = versioned_kinds
+        # memory accounting: the total size of the encoded documents in memory, and the use of the cache
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """
+        Whether this caches anything at all.
+        """
+        return self.max_size > 0 or self.shared_cache is not None
+
+    def version(self, kind, key):
+        """
+        Return the edit version of the document of `kind` whose id is `key`, which callers read before
+        fetching the document from the db and pass to `get` and `set`.
+
+        This is None for the kinds which aren't versioned, and for the versioned kinds if there is no
+        shared cache (or it lost the version), in which case `get` and `set` don't cache the document.
+        """
+        if kind not in self.versioned_kinds or self.shared_cache is None:
+            return None
+        version_key = self._version_key(kind, key)
+        version = self.shared_cache.get(version_key)
+        if version is None:
+            # Start from the time rather than from 0, so that if the version is evicted from the
+            # cache, it doesn't go back to a version whose document is still cached.
+            self.shared_cache.add(version_key, int(time.time() * 1000))
+            version = self.shared_cache.get(version_key)
+        return version
+
+    def get(self, kind, key, version=None):
+        """
+        Return a copy of the cached document of `kind` ('structure' or 'definition') whose id is `key`,
+        or None if it isn't cached.
+
+        :param version: the edit version of the document, for the versioned kinds (see `version`)
+        """
+        data = None
+        if self._cacheable(kind, version):
+            cache_key = self._cache_key(kind, key, version)
+            with self._lock:
+                data = self._documents.pop(cache_key, None)
+                if data is not None:
+                    # reinsert it as the most recently used
+                    self._documents[cache_key] = data
+            if data is None and self.shared_cache is not None:
+                data = self.shared_cache.get(cache_key)
+                if data is not None:
+                    self._store(cache_key, data)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if data is None:
+            return None
+        return BSON(data).decode(tz_aware=self.tz_aware)
+
+    def set(self, kind, document, version=None):
+        """
+        Cache the `document` of `kind`. Later changes to `document` do not change the cached copy.
+
+        :param version: the edit version of the document read before fetching it, for the versioned kinds
+        """
+        if not self.enabled or not self._cacheable(kind, version):
+            return
+        cache_key = self._cache_key(kind, document['_id'], version)
+        data = BSON.encode(document)
+        self._store(cache_key, data)
+        if self.shared_cache is not None:
+            self.shared_cache.set(cache_key, data)
+
+    def delete(self, kind, key):
+        """
+        Remove the document of `kind` whose id is `key` from this process and the shared cache.
+
+        For the versioned kinds, this increments the edit version instead, so that the copies which
+        other processes keep of the document aren't used anymore.
+        """
+        version = self.version(kind, key)
+        cache_key = self._cache_key(kind, key, version)
+        with self._lock:
+            data = self._documents.pop(cache_key, None)
+            if data is not None:
+                self.size -= len(data)
+        if self.shared_cache is None:
+            return
+        if kind not in self.versioned_kinds:
+            self.shared_cache.delete(cache_key)
+            return
+        version_key = self._version_key(kind, key)
+        try:
+            self.shared_cache.incr(version_key)
+        except ValueError:
+            # the version was evicted since it was read
+            self.shared_cache.add(version_key, int(time.time() * 1000))
+
+    def clear(self):
+        """
+        Forget all the documents cached in this process.
+        """
+        with self._lock:
+            self._documents.clear()
+            self.size = 0
+
+    def _store(self, cache_key, data):
+        """
+        Keep the encoded `data` in memory, evicting the least recently used documents to make room.
+        """
+        if len(data) > self.max_size:
+            return
+        with self._lock:
+            old_data = self._documents.pop(cache_key, None)
+            if old_data is not None:
+                self.size -= len(old_data)
+            self._documents[cache_key] = data
+            self.size += len(data)
+            while self.size > self.max_size:
+                _evicted_key, evicted_data = self._documents.popitem(last=False)
+                self.size -= len(evicted_data)
+
+    def _cacheable(self, kind, version):
+        """
+        Whether documents of `kind` can be cached with the edit `version`.
+        """
+        return version is not None or kind not in self.versioned_kinds
+
+    def _cache_key(self, kind, key, version=None):
+        """
+        The key for the document of `kind` whose id is `key`, at the edit `version` if it's versioned.
+        """
+        cache_key = u'split.{}.{}.{}'.format(self.key_prefix, kind, key)
+        if version is not None:
+            cache_key = u'{}.{}'.format(cache_key, version)
+        return cache_key
+
+    def _version_key(self, kind, key):
+        """
+        The key for the edit version of the document of `kind` whose id is `key`.
+        """
+        return u'{}.version'.format(self._cache_key(kind, key))
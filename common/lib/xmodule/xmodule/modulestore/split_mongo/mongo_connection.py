@@ -3,15 +3,22 @@ Segregation of pymongo functions from the data modeling mechanisms for split mod
 """
 import pymongo
 
+from .document_cache import DocumentCache
+
+
 class MongoConnection(object):
     """
     Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
     """
     def __init__(
-        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None, **kwargs
+        self, db, collection, host, port=27017, tz_aware=True, user=None, password=None,
+        cache_size=0, shared_cache=None, **kwargs
     ):
         """
         Create & open the connection, authenticate, and provide pointers to the collections
+
+        :param cache_size: the most bytes of structures and definitions to cache in this process
+        :param shared_cache: a django cache in which to share the structures and definitions between processes
         """
         self.database = pymongo.database.Database(
             pymongo.MongoClient(
@@ -38,11 +45,25 @@ class MongoConnection(object):
         self.structures.write_concern = {'w': 1}
         self.definitions.write_concern = {'w': 1}
 
+        # definitions are immutable per version guid; so, they can be cached for the whole process.
+        # structures are too, except that update_structure changes them in place (see continue_version
+        # and internal_clean_children); so, they are cached by edit version, which it increments.
+        self.cache = DocumentCache(
+            cache_size, shared_cache, key_prefix='{}.{}'.format(db, collection), tz_aware=tz_aware,
+            versioned_kinds=('structure',)
+        )
+
     def get_structure(self, key):
         """
         Get the structure from the persistence mechanism whose id is the given key
         """
-        return self.structures.find_one({'_id': key})
+        return self._get_document('structure', self.structures, key)
+
+    def get_structures(self, keys):
+        """
+        Get the structures whose ids are the given keys, in no particular order
+        """
+        return self._get_documents('structure', self.structures, keys)
 
     def find_matching_structures(self, query):
         """
@@ -56,12 +77,14 @@ class MongoConnection(object):
         Create the structure in the db
         """
         self.structures.insert(structure)
+        self.cache.set('structure', structure, self.cache.version('structure', structure['_id']))
 
     def update_structure(self, structure):
         """
         Update the db record for structure
         """
         self.structures.update({'_id': structure['_id']}, structure)
+        self.cache.delete('structure', structure['_id'])
 
     def get_course_index(self, key):
         """
@@ -98,7 +121,13 @@ class MongoConnection(object):
         """
         Get the definition from the persistence mechanism whose id is the given key
         """
-        return self.definitions.find_one({'_id': key})
+        return self._get_document('definition', self.definitions, key)
+
+    def get_definitions(self, keys):
+        """
+        Get the definitions whose ids are the given keys, in no particular order
+        """
+        return self._get_documents('definition', self.definitions, keys)
 
     def find_matching_definitions(self, query):
         """
@@ -112,5 +141,38 @@ class MongoConnection(object):
         Create the definition in the db
         """
         self.definitions.insert(definition)
+        self.cache.set('definition', definition)
+
+    def _get_document(self, kind, collection, key):
+        """
+        Get the document of `kind` whose id is `key` from the cache, or else from the collection
+        """
+        version = self.cache.version(kind, key)
+        document = self.cache.get(kind, key, version)
+        if document is None:
+            document = collection.find_one({'_id': key})
+            if document is not None:
+                self.cache.set(kind, document, version)
+        return document
+
+    def _get_documents(self, kind, collection, keys):
+        """
+        Get the documents of `kind` whose ids are `keys` from the cache, fetching any which aren't
+        cached in one query
+        """
+        documents = []
+        missing = {}
+        for key in keys:
+            version = self.cache.version(kind, key)
+            document = self.cache.get(kind, key, version)
+            if document is None:
+                missing[key] = version
+            else:
+                documents.append(document)
+        if missing:
+            for document in collection.find({'_id': {'$in': missing.keys()}}):
+                self.cache.set(kind, document, missing.get(document['_id']))
+                documents.append(document)
+        return documents
 
 
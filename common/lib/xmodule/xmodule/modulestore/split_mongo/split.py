@@ -62,7 +62,7 @@ from xmodule.modulestore.exceptions import InsufficientSpecificationError, Versi
 from xmodule.modulestore import inheritance, ModuleStoreWriteBase, Location, SPLIT_MONGO_MODULESTORE_TYPE
 
 from ..exceptions import ItemNotFoundError
-from .definition_lazy_loader import DefinitionLazyLoader
+from .definition_lazy_loader import DefinitionLazyLoader, DefinitionPrefetchGroup
 from .caching_descriptor_system import CachingDescriptorSystem
 from xblock.fields import Scope
 from xblock.runtime import Mixologist
@@ -96,24 +96,47 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
     A Mongodb backed ModuleStore supporting versions, inheritance,
     and sharing.
     """
+    # the most bytes of structures and definitions to cache for all the threads of the process
+    DEFAULT_STRUCTURE_CACHE_SIZE = 64 * 1024 * 1024
+    # the most course versions for which each thread keeps a CachingDescriptorSystem
+    DEFAULT_DESCRIPTOR_CACHE_SIZE = 8
+    # the most lazy definitions to fetch in one query
+    DEFINITION_PREFETCH_BATCH_SIZE = 100
+
     def __init__(self, doc_store_config, fs_root, render_template,
                  default_class=None,
                  error_tracker=null_error_tracker,
                  loc_mapper=None,
+                 structure_cache_size=DEFAULT_STRUCTURE_CACHE_SIZE,
+                 descriptor_cache_size=DEFAULT_DESCRIPTOR_CACHE_SIZE,
+                 prefetch_definitions=True,
                  **kwargs):
         """
         :param doc_store_config: must have a host, db, and collection entries. Other common entries: port, tz_aware.
+        :param structure_cache_size: the most bytes of structures and definitions to cache in this process.
+        They're also shared with other processes through the metadata_inheritance_cache_subsystem, if given.
+        :param descriptor_cache_size: the most course versions for which each thread caches descriptors.
+        :param prefetch_definitions: whether to fetch the lazy definitions of blocks loaded together in
+        batches (see cache_items) rather than one at a time. This is on by default; False turns it off,
+        fetching each lazy definition when it's first used.
         """
 
         super(SplitMongoModuleStore, self).__init__(**kwargs)
         self.loc_mapper = loc_mapper
 
-        self.db_connection = MongoConnection(**doc_store_config)
+        self.db_connection = MongoConnection(
+            cache_size=structure_cache_size,
+            shared_cache=self.metadata_inheritance_cache_subsystem,
+            **doc_store_config
+        )
         self.db = self.db_connection.database
 
-        # Code review question: How should I expire entries?
-        # _add_cache could use a lru mechanism to control the cache size?
+        # CachingDescriptorSystems hold the descriptors loaded from a course version and which course and branch
+        # the thread last used the version from; so, they're kept per thread, with the least recently used
+        # evicted. The structures and definitions they're built from come from the process wide cache.
+        self.descriptor_cache_size = descriptor_cache_size
         self.thread_cache = threading.local()
+        self.prefetch_definitions = prefetch_definitions
 
         if default_class is not None:
             module_path, _, class_name = default_class.rpartition('.')
@@ -137,7 +160,11 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param system: a CachingDescriptorSystem
         :param base_usage_ids: list of usage_ids to fetch
         :param depth: how deep below these to prefetch
-        :param lazy: whether to fetch definitions or use placeholders
+        :param lazy: whether to fetch definitions or use placeholders. If prefetch_definitions is set,
+        the placeholders of the blocks at each depth below the base ones are grouped (in groups of at
+        most DEFINITION_PREFETCH_BATCH_SIZE); so, accessing the content of one block fetches the
+        definitions of all the blocks in its group in one query. E.g., rendering a sequential
+        fetched w/ depth=2 reads the definitions of all its verticals' children in one query.
         '''
         new_module_data = {}
         for usage_id in base_usage_ids:
@@ -148,14 +175,23 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 new_module_data
             )
 
-        if lazy:
+        if lazy and self.prefetch_definitions:
+            for usage_ids in self._usage_ids_by_depth(new_module_data, base_usage_ids):
+                for start in xrange(0, len(usage_ids), self.DEFINITION_PREFETCH_BATCH_SIZE):
+                    prefetch_group = DefinitionPrefetchGroup(self)
+                    for usage_id in usage_ids[start:start + self.DEFINITION_PREFETCH_BATCH_SIZE]:
+                        block = new_module_data[usage_id]
+                        if not isinstance(block['definition'], DefinitionLazyLoader):
+                            block['definition'] = DefinitionLazyLoader(self, block['definition'], prefetch_group)
+        elif lazy:
             for block in new_module_data.itervalues():
-                block['definition'] = DefinitionLazyLoader(self, block['definition'])
+                if not isinstance(block['definition'], DefinitionLazyLoader):
+                    block['definition'] = DefinitionLazyLoader(self, block['definition'])
         else:
             # Load all descendants by id
-            descendent_definitions = self.db_connection.find_matching_definitions({
-                '_id': {'$in': [block['definition']
-                                for block in new_module_data.itervalues()]}})
+            descendent_definitions = self.db_connection.get_definitions(
+                [block['definition'] for block in new_module_data.itervalues()]
+            )
             # turn into a map
             definitions = {definition['_id']: definition
                            for definition in descendent_definitions}
@@ -196,19 +232,28 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_version_guid:
         """
         if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        system = self.thread_cache.course_cache
-        return system.get(course_version_guid)
+            self.thread_cache.course_cache = collections.OrderedDict()
+        course_cache = self.thread_cache.course_cache
+        system = course_cache.pop(course_version_guid, None)
+        if system is not None:
+            # reinsert it as the most recently used
+            course_cache[course_version_guid] = system
+        return system
 
     def _add_cache(self, course_version_guid, system):
         """
-        Save this cache for subsequent access
+        Save this cache for subsequent access, evicting the least recently used ones
+        over the descriptor_cache_size
         :param course_version_guid:
         :param system:
         """
         if not hasattr(self.thread_cache, 'course_cache'):
-            self.thread_cache.course_cache = {}
-        self.thread_cache.course_cache[course_version_guid] = system
+            self.thread_cache.course_cache = collections.OrderedDict()
+        course_cache = self.thread_cache.course_cache
+        course_cache.pop(course_version_guid, None)
+        course_cache[course_version_guid] = system
+        while len(course_cache) > self.descriptor_cache_size:
+            course_cache.popitem(last=False)
         return system
 
     def _clear_cache(self, course_version_guid=None):
@@ -217,9 +262,12 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
         :param course_version_guid: if provided, clear only this entry
         """
         if course_version_guid:
-            del self.thread_cache.course_cache[course_version_guid]
+            if hasattr(self.thread_cache, 'course_cache'):
+                self.thread_cache.course_cache.pop(course_version_guid, None)
+            self.db_connection.cache.delete('structure', course_version_guid)
         else:
-            self.thread_cache.course_cache = {}
+            self.thread_cache.course_cache = collections.OrderedDict()
+            self.db_connection.cache.clear()
 
     def _lookup_course(self, course_locator):
         '''
@@ -294,7 +342,7 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             version_guids.append(version_guid)
             id_version_map[version_guid] = structure['_id']
 
-        course_entries = self.db_connection.find_matching_structures({'_id': {'$in': version_guids}})
+        course_entries = self.db_connection.get_structures(version_guids)
 
         # get the block for the course element (s/b the root)
         result = []
@@ -349,7 +397,8 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
             descendants of the queried modules for more efficient results later
             in the request. The depth is counted in the number of
             calls to get_children() to cache. None indicates to cache all
-            descendants.
+            descendants. The content (definitions) of the cached blocks at each
+            depth is fetched in one query when the first of them is accessed.
         raises InsufficientSpecificationError or ItemNotFoundError
         """
         # intended for temporary support of some pointers being old-style
@@ -1307,6 +1356,26 @@ class SplitMongoModuleStore(ModuleStoreWriteBase):
                 # migration where the old mongo published had pointers to privates
                 pass
 
+    def _usage_ids_by_depth(self, module_data, base_usage_ids):
+        """
+        Return the lists of the usage_ids in module_data at each depth below (and including)
+        the base_usage_ids, shallowest first
+        """
+        result = []
+        seen = set()
+        usage_ids = [usage_id for usage_id in base_usage_ids if usage_id in module_data]
+        while usage_ids:
+            seen.update(usage_ids)
+            result.append(usage_ids)
+            children = []
+            for usage_id in usage_ids:
+                for child in module_data[usage_id]['fields'].get('children', []):
+                    if child in module_data and child not in seen:
+                        seen.add(child)
+                        children.append(child)
+            usage_ids = children
+        return result
+
     def descendants(self, block_map, usage_id, depth, descendent_map):
         """
         adds block and its descendants out to depth to descendent_map
@@ -5,6 +5,7 @@ Created on Aug 5, 2013
 '''
 import unittest
 import uuid
+from mock import Mock, patch
 from xmodule.modulestore import Location
 from xmodule.modulestore.locator import BlockUsageLocator
 from xmodule.modulestore.exceptions import ItemNotFoundError, DuplicateItemError
@@ -532,6 +533,98 @@ class TestLocationMapper(unittest.TestCase):
         self.assertEqual(locator.usage_id, 'problem3')
 
 
+class DictCache(object):
+    """
+    A cache keeping its values in a dict, like the django caches do in a process
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def set(self, key, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class TestCachedLocationMapper(TestLocationMapper):
+    """
+    Run the location mapper tests with translations cached, and test the caching
+    """
+    def setUp(self):
+        self.collection = 'modulestore{0}'.format(uuid.uuid4().hex[:5])
+        self.cache = DictCache()
+        TestLocationMapper.loc_store = self._loc_store()
+
+    def _loc_store(self):
+        """
+        Make a location mapper using the shared cache, and a request cache of its own
+        """
+        return LocMapperStore(
+            host='localhost', db='test_xmodule', collection=self.collection,
+            cache=self.cache, request_cache=Mock(data={})
+        )
+
+    def test_translations_are_cached(self):
+        course_location = Location('i4x', 'foo_org', 'bar_course', 'course', 'baz_run')
+        problem_location = course_location.replace(category='problem', name='abc123')
+        loc_mapper().create_map_entry(course_location, block_map={'abc123': {'problem': 'problem2'}})
+        locator = loc_mapper().translate_location(None, problem_location, add_entry_if_missing=False)
+        loc_mapper().translate_locator_to_location(locator)
+
+        with patch.object(loc_mapper(), 'location_map') as mock_location_map:
+            self.assertEqual(
+                loc_mapper().translate_location(None, problem_location, add_entry_if_missing=False),
+                locator
+            )
+            self.assertEqual(loc_mapper().translate_locator_to_location(locator), problem_location)
+        self.assertFalse(mock_location_map.find.called)
+
+    def test_writes_invalidate(self):
+        course_location = Location('i4x', 'foo_org', 'bar_course', 'course', 'baz_run')
+        problem_location = course_location.replace(category='problem', name='abc123')
+        loc_mapper().create_map_entry(course_location, block_map={'abc123': {'problem': 'problem2'}})
+        locator = loc_mapper().translate_location(None, problem_location, add_entry_if_missing=False)
+        self.assertEqual(locator.usage_id, 'problem2')
+
+        # another process renames the block, before the next request
+        self._loc_store().update_block_location_translator(problem_location, 'problem3')
+        loc_mapper().request_cache.data = {}
+
+        locator = loc_mapper().translate_location(None, problem_location, add_entry_if_missing=False)
+        self.assertEqual(locator.usage_id, 'problem3')
+        self.assertEqual(loc_mapper().translate_locator_to_location(locator), problem_location)
+        self.assertIsNone(loc_mapper().translate_locator_to_location(
+            BlockUsageLocator(course_id=locator.course_id, branch=locator.branch, usage_id='problem2')
+        ))
+
+    def test_misses_check_the_map(self):
+        course_location = Location('i4x', 'foo_org', 'bar_course', 'course', 'baz_run')
+        loc_mapper().create_map_entry(course_location)
+        loc_mapper().translate_location(None, course_location)
+
+        # another process adds a block, which isn't in the request cache
+        problem_location = course_location.replace(category='problem', name='abc123')
+        usage_id = self._loc_store().add_block_location_translator(problem_location)
+        locator = loc_mapper().translate_location(None, problem_location, add_entry_if_missing=False)
+        self.assertEqual(locator.usage_id, usage_id)
+
+    @patch('xmodule.modulestore.loc_mapper_store.MAX_CACHED_VALUE_SIZE', 100)
+    @patch('xmodule.modulestore.loc_mapper_store.log')
+    def test_too_big_to_cache(self, mock_log):
+        course_location = Location('i4x', 'foo_org', 'bar_course', 'course', 'baz_run')
+        problem_location = course_location.replace(category='problem', name='abc123')
+        loc_mapper().create_map_entry(course_location, block_map={'abc123': {'problem': 'problem2'}})
+        locator = loc_mapper().translate_location(None, problem_location, add_entry_if_missing=False)
+
+        self.assertEqual(locator.usage_id, 'problem2')
+        self.assertEqual(self.cache.data, {})
+        self.assertTrue(mock_log.warning.called)
+
+
 #==================================
 # functions to mock existing services
 def loc_mapper():
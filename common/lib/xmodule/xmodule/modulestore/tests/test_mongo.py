@@ -1,3 +1,5 @@
+import copy
+import cPickle as pickle
 from pprint import pprint
 # pylint: disable=E0611
 from nose.tools import assert_equals, assert_raises, \
@@ -6,6 +8,7 @@ from itertools import ifilter
 # pylint: enable=E0611
 import pymongo
 import logging
+from mock import Mock, patch
 from uuid import uuid4
 
 from xblock.fields import Scope
@@ -23,6 +26,7 @@ from xmodule.modulestore.tests.test_modulestore import check_path_to_location
 from IPython.testing.nose_assert_methods import assert_in
 from xmodule.exceptions import NotFoundError
 from xmodule.modulestore.exceptions import InsufficientSpecificationError
+from xmodule.modulestore.inheritance import own_metadata
 
 log = logging.getLogger(__name__)
 
@@ -35,6 +39,35 @@ DEFAULT_CLASS = 'xmodule.raw_module.RawDescriptor'
 RENDER_TEMPLATE = lambda t_n, d, ctx = None, nsp = 'main': ''
 
 
+class PickledDictCache(object):
+    """
+    A cache keeping its values pickled in a dict, so that like memcached, each get returns a new copy
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key, default=None):
+        if key not in self.data:
+            return default
+        return pickle.loads(self.data[key])
+
+    def set(self, key, value):
+        self.data[key] = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def add(self, key, value):
+        if key in self.data:
+            return False
+        self.set(key, value)
+        return True
+
+    def incr(self, key):
+        if key not in self.data:
+            raise ValueError("Key '{0}' not found".format(key))
+        value = self.get(key) + 1
+        self.set(key, value)
+        return value
+
+
 class TestMongoModuleStore(object):
     '''Tests!'''
     @classmethod
@@ -180,6 +213,175 @@ class TestMongoModuleStore(object):
             self.store._find_one(Location("i4x://edX/toy/video/Welcome")),
             None)
 
+    def _set_chapter_showanswer(self, value):
+        '''
+        Set the showanswer metadata of the Overview chapter of the toy course directly in the
+        db, and return a function restoring its metadata.
+        '''
+        chapter_id = Location("i4x://edX/toy/chapter/Overview").dict()
+        old_metadata = self.store.collection.find_one({'_id': chapter_id})['metadata']
+        self.store.collection.update({'_id': chapter_id}, {'$set': {'metadata.showanswer': value}})
+        return lambda: self.store.collection.update({'_id': chapter_id}, {'$set': {'metadata': old_metadata}})
+
+    def test_metadata_inheritance_subtree(self):
+        '''Recomputing part of the inheritance tree after a change gives the same result as recomputing all of it'''
+        course_location = Location("i4x://edX/toy/course/2012_Fall")
+        chapter_location = Location("i4x://edX/toy/chapter/Overview")
+        old_tree = self.store.compute_metadata_inheritance_tree(course_location)
+
+        restore = self._set_chapter_showanswer('never')
+        try:
+            full_tree = self.store.compute_metadata_inheritance_tree(course_location)
+            assert_not_equals(full_tree, old_tree)
+            for location in [
+                course_location,
+                chapter_location,
+            ]:
+                tree = copy.deepcopy(old_tree)
+                assert self.store.update_metadata_inheritance_subtree(location, tree)
+                assert_equals(tree, full_tree)
+
+            # the change isn't under these, so they leave the tree as it was
+            for location in [
+                Location("i4x://edX/toy/videosequence/Toy_Videos"),
+                Location("i4x://edX/toy/video/Welcome"),
+            ]:
+                tree = copy.deepcopy(full_tree)
+                assert self.store.update_metadata_inheritance_subtree(location, tree)
+                assert_equals(tree, full_tree)
+        finally:
+            restore()
+
+    @staticmethod
+    def _caching_store(cache, request_cache):
+        '''
+        Make a store using `cache` as its metadata inheritance cache subsystem, like the stores
+        of other processes do
+        '''
+        doc_store_config = {'host': HOST, 'db': DB, 'collection': COLLECTION}
+        return MongoModuleStore(
+            doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS,
+            metadata_inheritance_cache_subsystem=cache, request_cache=request_cache
+        )
+
+    def test_refresh_metadata_inheritance_versions(self):
+        '''
+        Writes cache a new version of the inheritance tree, rather than changing a cached tree,
+        so a stale copy of the tree can't overwrite a newer one
+        '''
+        course_location = Location("i4x://edX/toy/course/2012_Fall")
+        chapter_location = Location("i4x://edX/toy/chapter/Overview")
+        cache = PickledDictCache()
+        make_store = lambda request_cache: self._caching_store(cache, request_cache)
+
+        first_store = make_store(Mock(data={}))
+        old_tree = first_store.get_cached_metadata_inheritance_tree(course_location)
+        restores = []
+        try:
+            # another process writes, while the first one still has the old tree in its request cache
+            restores.append(self._set_chapter_showanswer('never'))
+            make_store(Mock(data={})).refresh_cached_metadata_inheritance_tree(chapter_location, incremental=True)
+            # then the first process writes too
+            restores.append(self._set_chapter_showanswer('always'))
+            first_store.refresh_cached_metadata_inheritance_tree(chapter_location, incremental=True)
+
+            full_tree = self.store.compute_metadata_inheritance_tree(course_location)
+            assert_not_equals(full_tree, old_tree)
+            assert_equals(make_store(Mock(data={})).get_cached_metadata_inheritance_tree(course_location), full_tree)
+            assert_equals(first_store.get_cached_metadata_inheritance_tree(course_location), full_tree)
+
+            # a write when the previous version isn't cached leaves the tree to be recomputed
+            cache.data.clear()
+            restores.append(self._set_chapter_showanswer('never'))
+            first_store.refresh_cached_metadata_inheritance_tree(chapter_location, incremental=True)
+            assert_equals(
+                first_store.get_cached_metadata_inheritance_tree(course_location),
+                self.store.compute_metadata_inheritance_tree(course_location)
+            )
+        finally:
+            for restore in reversed(restores):
+                restore()
+
+    def test_metadata_inheritance_shared(self):
+        '''Children that don't set inheritable metadata share their parent's inherited metadata'''
+        tree = self.store.compute_metadata_inheritance_tree(Location("i4x://edX/toy/course/2012_Fall"))
+        chapter = tree['i4x://edX/toy/chapter/Overview']
+        assert tree['i4x://edX/toy/videosequence/Toy_Videos'] is chapter
+        assert tree['i4x://edX/toy/html/toyhtml'] is chapter
+
+    def test_parent_index(self):
+        '''The parent index agrees with querying for the modules which list a child'''
+        course_location = Location("i4x://edX/toy/course/2012_Fall")
+        parents_by_url = {}
+        self.store.compute_metadata_inheritance_tree(course_location, parents_by_url)
+        assert_equals(parents_by_url[course_location.url()], [])
+
+        for url, parents in parents_by_url.iteritems():
+            queried = self.store.collection.find({'definition.children': url}, {'_id': True})
+            assert_equals(sorted(parents), sorted(Location(item['_id']).url() for item in queried))
+
+        for location in [
+            Location("i4x://edX/toy/chapter/Overview"),
+            Location("i4x://edX/toy/videosequence/Toy_Videos"),
+        ]:
+            index = dict((url, list(parents)) for url, parents in parents_by_url.iteritems())
+            self.store.update_parent_index(location, index)
+            assert_equals(index, parents_by_url)
+
+        assert_equals(
+            self.store.get_parent_locations(Location("i4x://edX/toy/video/Welcome"), 'edX/toy/2012_Fall'),
+            [Location("i4x://edX/toy/videosequence/Toy_Videos")]
+        )
+
+    def test_refresh_parent_index_versions(self):
+        '''
+        Writes cache a new version of the parent index, rather than changing a cached index,
+        and modules without parents in the index are looked up in the db
+        '''
+        course_location = Location("i4x://edX/toy/course/2012_Fall")
+        chapter_location = Location("i4x://edX/toy/chapter/Overview")
+        new_child_url = "i4x://edX/toy/html/new_child"
+        cache = PickledDictCache()
+        make_store = lambda: self._caching_store(cache, Mock(data={}))
+
+        first_store = make_store()
+        old_index = first_store.get_cached_parent_index(course_location)
+        old_children = self.store.collection.find_one({'_id': chapter_location.dict()})['definition']['children']
+        try:
+            # another process adds a child, while the first one still has the old index in its request cache
+            self.store.collection.update(
+                {'_id': chapter_location.dict()},
+                {'$set': {'definition.children': old_children + [new_child_url]}}
+            )
+            make_store().refresh_cached_metadata_inheritance_tree(chapter_location, incremental=True)
+            index = make_store().get_cached_parent_index(course_location)
+            assert_equals(index[new_child_url], [chapter_location.url()])
+
+            # then the first process removes it
+            self.store.collection.update(
+                {'_id': chapter_location.dict()},
+                {'$set': {'definition.children': old_children}}
+            )
+            first_store.refresh_cached_metadata_inheritance_tree(chapter_location, incremental=True)
+            index = make_store().get_cached_parent_index(course_location)
+            assert_equals(index.get(new_child_url, []), [])
+            assert_equals(dict((url, parents) for url, parents in index.iteritems() if parents), dict(
+                (url, parents) for url, parents in old_index.iteritems() if parents
+            ))
+        finally:
+            self.store.collection.update(
+                {'_id': chapter_location.dict()},
+                {'$set': {'definition.children': old_children}}
+            )
+
+        # a module with no parents in the index is looked up in the db
+        store = make_store()
+        store.get_cached_parent_index(course_location)['i4x://edX/toy/video/Welcome'] = []
+        assert_equals(
+            store.get_parent_locations(Location("i4x://edX/toy/video/Welcome"), 'edX/toy/2012_Fall'),
+            [Location("i4x://edX/toy/videosequence/Toy_Videos")]
+        )
+
     def test_path_to_location(self):
         '''Make sure that path_to_location works'''
         check_path_to_location(self.store)
@@ -199,6 +401,23 @@ class TestMongoModuleStore(object):
                 '{0} is a template course'.format(course)
             )
 
+    def test_get_course_summaries(self):
+        courses = dict((course.id, course) for course in self.store.get_courses())
+        summaries = dict((summary.id, summary) for summary in self.store.get_course_summaries())
+        assert_equals(sorted(summaries.keys()), sorted(courses.keys()))
+        for course_id, summary in summaries.iteritems():
+            course = courses[course_id]
+            assert_equals(summary.location, course.location)
+            assert_equals(summary.display_name_with_default, course.display_name_with_default)
+            assert_equals(summary.display_number_with_default, course.display_number_with_default)
+            assert_equals(summary.start, course.start)
+            assert_equals(summary.start_date_text, course.start_date_text)
+
+        # the summaries are read without loading the courses
+        with patch.object(self.store, '_load_items') as mock_load_items:
+            self.store.get_course_summaries()
+        assert_false(mock_load_items.called)
+
     def test_static_tab_names(self):
 
         def get_tab_name(index):
@@ -273,6 +492,48 @@ class TestMongoModuleStore(object):
         )
 
 
+class TestCourseSummaries(object):
+    '''Test that writes to courses keep their summaries up to date'''
+    def setUp(self):
+        self.collection = 'modulestore_%s' % uuid4().hex[:5]
+        self.store = MongoModuleStore(
+            {'host': HOST, 'db': DB, 'collection': self.collection},
+            FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS
+        )
+        import_from_xml(self.store, DATA_DIR, ['toy'])
+        self.location = Location('i4x', 'edX', 'toy', 'course', '2012_Fall')
+
+    def tearDown(self):
+        self.store.collection.drop()
+        self.store.course_summaries.drop()
+
+    def _summary(self):
+        '''Return the summary of the toy course, if any'''
+        summaries = [summary for summary in self.store.get_course_summaries() if summary.location == self.location]
+        return summaries[0] if summaries else None
+
+    def test_update_metadata(self):
+        course = self.store.get_item(self.location)
+        course.display_name = 'Summarized'
+        self.store.update_metadata(self.location, own_metadata(course))
+        assert_equals(self._summary().display_name, 'Summarized')
+
+    def test_locator_is_kept(self):
+        self.store.set_course_summary_locator('edX/toy/2012_Fall', 'edx://edX.toy.2012_Fall/branch/draft/block/2012_Fall')
+        self.store.update_metadata(self.location, own_metadata(self.store.get_item(self.location)))
+        assert_equals(self._summary().locator, 'edx://edX.toy.2012_Fall/branch/draft/block/2012_Fall')
+
+    def test_delete_item(self):
+        self.store.delete_item(self.location)
+        assert_equals(self._summary(), None)
+        assert_equals(self.store.course_summaries.count(), 0)
+
+    def test_missing_summaries_are_made(self):
+        self.store.course_summaries.remove()
+        assert_equals(self._summary().display_name, self.store.get_item(self.location).display_name)
+        assert_equals(self.store.course_summaries.count(), 1)
+
+
 class TestMongoKeyValueStore(object):
     """
     Tests for MongoKeyValueStore.
@@ -0,0 +1,131 @@
+"""
+Tests of the process wide cache of split modulestore structures and definitions
+"""
+import datetime
+import unittest
+
+from bson import BSON
+from bson.objectid import ObjectId
+from pytz import UTC
+
+from xmodule.modulestore.split_mongo.document_cache import DocumentCache
+
+
+class DictCache(dict):
+    """
+    The parts of the django cache api the DocumentCache uses
+    """
+    def set(self, key, value):
+        self[key] = value
+
+    def delete(self, key):
+        self.pop(key, None)
+
+    def add(self, key, value):
+        self.setdefault(key, value)
+
+    def incr(self, key):
+        if key not in self:
+            raise ValueError("Key '{}' not found".format(key))
+        self[key] += 1
+        return self[key]
+
+
+class TestDocumentCache(unittest.TestCase):
+    """
+    Test caching, copying, and evicting documents
+    """
+    def structure(self, size=10):
+        """
+        Make a structure with a block of about `size` bytes.
+        """
+        return {
+            '_id': ObjectId(),
+            'edited_on': datetime.datetime(2013, 11, 1, tzinfo=UTC),
+            'blocks': {'head': {'fields': {'data': 'x' * size}}},
+        }
+
+    def test_get_returns_copies(self):
+        cache = DocumentCache(1024)
+        structure = self.structure()
+        cache.set('structure', structure)
+        structure['blocks']['head']['fields']['data'] = 'changed'
+
+        cached = cache.get('structure', structure['_id'])
+        self.assertEqual(cached['blocks']['head']['fields']['data'], 'x' * 10)
+        self.assertEqual(cached['edited_on'], datetime.datetime(2013, 11, 1, tzinfo=UTC))
+        cached['blocks'] = {}
+        self.assertIn('head', cache.get('structure', structure['_id'])['blocks'])
+        self.assertIsNone(cache.get('definition', structure['_id']))
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_eviction(self):
+        structures = [self.structure(100) for _ in range(3)]
+        # room for two of them
+        cache = DocumentCache(2 * len(BSON.encode(structures[0])) + 10)
+        for structure in structures[:2]:
+            cache.set('structure', structure)
+        # use the first, so the second is the least recently used
+        cache.get('structure', structures[0]['_id'])
+        cache.set('structure', structures[2])
+
+        self.assertIsNotNone(cache.get('structure', structures[0]['_id']))
+        self.assertIsNone(cache.get('structure', structures[1]['_id']))
+        self.assertIsNotNone(cache.get('structure', structures[2]['_id']))
+        self.assertLessEqual(cache.size, cache.max_size)
+
+    def test_too_big(self):
+        cache = DocumentCache(50)
+        structure = self.structure(100)
+        cache.set('structure', structure)
+        self.assertIsNone(cache.get('structure', structure['_id']))
+        self.assertEqual(cache.size, 0)
+
+    def test_shared_cache(self):
+        shared_cache = DictCache()
+        structure = self.structure()
+        DocumentCache(1024, shared_cache, key_prefix='db.modulestore').set('structure', structure)
+
+        # another process's cache finds it
+        other = DocumentCache(1024, shared_cache, key_prefix='db.modulestore')
+        self.assertEqual(other.get('structure', structure['_id'])['_id'], structure['_id'])
+        # but not another store's
+        self.assertIsNone(DocumentCache(1024, shared_cache, key_prefix='db.other').get('structure', structure['_id']))
+
+        other.delete('structure', structure['_id'])
+        self.assertEqual(shared_cache, {})
+        self.assertIsNone(other.get('structure', structure['_id']))
+
+    def test_versioned_kinds(self):
+        shared_cache = DictCache()
+        caches = [
+            DocumentCache(1024, shared_cache, key_prefix='db.modulestore', versioned_kinds=('structure',))
+            for _ in range(2)
+        ]
+        structure = self.structure()
+        version = caches[0].version('structure', structure['_id'])
+        caches[0].set('structure', structure, version)
+        # both processes keep it in memory
+        for cache in caches:
+            self.assertIsNotNone(cache.get('structure', structure['_id'], version))
+
+        # one process changes it in place: the other doesn't use its copy anymore
+        caches[0].delete('structure', structure['_id'])
+        new_version = caches[1].version('structure', structure['_id'])
+        self.assertNotEqual(new_version, version)
+        self.assertIsNone(caches[1].get('structure', structure['_id'], new_version))
+
+        # without a shared cache, versioned kinds aren't cached
+        cache = DocumentCache(1024, versioned_kinds=('structure',))
+        version = cache.version('structure', structure['_id'])
+        self.assertIsNone(version)
+        cache.set('structure', structure, version)
+        self.assertIsNone(cache.get('structure', structure['_id'], version))
+        self.assertEqual(cache.size, 0)
+
+    def test_disabled(self):
+        cache = DocumentCache(0)
+        self.assertFalse(cache.enabled)
+        structure = self.structure()
+        cache.set('structure', structure)
+        self.assertIsNone(cache.get('structure', structure['_id']))
@@ -8,6 +8,7 @@ import subprocess
 import unittest
 import uuid
 from importlib import import_module
+from mock import patch
 
 from xblock.fields import Scope
 from xmodule.course_module import CourseDescriptor
@@ -372,6 +373,26 @@ class SplitModuleItemTests(SplitModuleTest):
             CourseDescriptor
         )
 
+    def test_get_item_prefetches_definitions(self):
+        # pylint: disable=W0212
+        modulestore()._clear_cache()
+        locator = BlockUsageLocator(course_id='GreekHero', usage_id='head12345', branch='draft')
+        course = modulestore().get_item(locator, depth=1)
+        # the chapters' definitions are grouped
+        loaders = [course.runtime.module_data[child]['definition'] for child in course.children]
+        self.assertEqual(len(set(loader.prefetch_group for loader in loaders)), 1)
+
+        db_connection = modulestore().db_connection
+        with patch.object(db_connection, 'get_definitions', wraps=db_connection.get_definitions) as get_definitions:
+            with patch.object(db_connection, 'get_definition') as get_definition:
+                definitions = [loader.fetch() for loader in loaders]
+        self.assertEqual(get_definitions.call_count, 1)
+        self.assertFalse(get_definition.called)
+        self.assertEqual(
+            [definition['_id'] for definition in definitions],
+            [loader.definition_locator.definition_id for loader in loaders]
+        )
+
     def test_get_non_root(self):
         # not a course obj
         locator = BlockUsageLocator(course_id='GreekHero', usage_id='chapter1', branch='draft')
@@ -1,6 +1,9 @@
 import os.path
+import shutil
+from tempfile import mkdtemp
 
-from nose.tools import assert_raises, assert_equals  # pylint: disable=E0611
+from mock import patch
+from nose.tools import assert_raises, assert_equals, assert_true, assert_false  # pylint: disable=E0611
 
 from xmodule.course_module import CourseDescriptor
 from xmodule.modulestore.xml import XMLModuleStore
@@ -42,3 +45,57 @@ class TestXMLModuleStore(object):
         location = CourseDescriptor.id_to_location("edX/toy/2012_Fall")
         errors = modulestore.get_item_errors(location)
         assert errors == []
+
+
+class TestXMLModuleStoreSnapshots(object):
+    """
+    Test loading xml courses from snapshots and in parallel
+    """
+    def setUp(self):
+        self.snapshot_dir = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir)
+
+    def assert_same_courses(self, store, other_store):
+        """
+        Assert that the stores have the same modules, with the same field values
+        """
+        assert_equals(sorted(store.courses), sorted(other_store.courses))
+        assert_equals(sorted(store.modules), sorted(other_store.modules))
+        for course_id, modules in store.modules.iteritems():
+            other_modules = other_store.modules[course_id]
+            assert_equals(sorted(modules), sorted(other_modules))
+            for location, module in modules.iteritems():
+                other_module = other_modules[location]
+                assert_equals(type(module), type(other_module))
+                assert_equals(getattr(module, 'data_dir', None), getattr(other_module, 'data_dir', None))
+                for field in module.fields.itervalues():
+                    assert_equals(field.read_json(module), field.read_json(other_module))
+
+    def test_snapshots(self):
+        store = XMLModuleStore(DATA_DIR, course_dirs=['toy', 'simple'], snapshot_dir=self.snapshot_dir)
+        assert_equals(store.write_snapshots(), ['simple', 'toy'])
+
+        with patch.object(XMLModuleStore, 'load_course') as load_course:
+            snapshot_store = XMLModuleStore(DATA_DIR, course_dirs=['toy', 'simple'], snapshot_dir=self.snapshot_dir)
+        assert_false(load_course.called)
+        self.assert_same_courses(store, snapshot_store)
+        check_path_to_location(snapshot_store)
+
+    def test_stale_snapshots(self):
+        store = XMLModuleStore(DATA_DIR, course_dirs=['toy'], snapshot_dir=self.snapshot_dir)
+        store.write_snapshots()
+
+        # the course dir changed since
+        with patch('xmodule.modulestore.xml.course_dir_fingerprint', return_value='changed'):
+            with patch.object(XMLModuleStore, 'load_snapshot') as load_snapshot:
+                reparsed_store = XMLModuleStore(DATA_DIR, course_dirs=['toy'], snapshot_dir=self.snapshot_dir)
+        assert_false(load_snapshot.called)
+        assert_true('toy' in reparsed_store.courses)
+
+    def test_parallel_load(self):
+        store = XMLModuleStore(DATA_DIR, course_dirs=['toy', 'simple'])
+        parallel_store = XMLModuleStore(DATA_DIR, course_dirs=['toy', 'simple'], processes=2)
+        self.assert_same_courses(store, parallel_store)
+        check_path_to_location(parallel_store)
@@ -0,0 +1,208 @@
+"""
+Tests and benchmark of the bulk write mode and the static content import of xml_importer
+"""
+import logging
+import shutil
+import time
+from tempfile import mkdtemp
+from uuid import uuid4
+
+import pymongo
+from mock import patch
+# pylint: disable=E0611
+from nose.tools import assert_equals, assert_less
+# pylint: enable=E0611
+
+from path import path
+
+from xmodule.tests import DATA_DIR
+from xmodule.modulestore import Location
+from xmodule.contentstore.content import StaticContent
+from xmodule.modulestore.mongo import MongoModuleStore
+from xmodule.modulestore.xml_importer import import_from_xml, import_static_content
+from xmodule.contentstore.mongo import MongoContentStore
+
+log = logging.getLogger(__name__)
+
+HOST = 'localhost'
+PORT = 27017
+DB = 'test_xml_importer_%s' % uuid4().hex[:5]
+FS_ROOT = DATA_DIR
+DEFAULT_CLASS = 'xmodule.raw_module.RawDescriptor'
+RENDER_TEMPLATE = lambda t_n, d, ctx = None, nsp = 'main': ''
+
+# the course which write_large_course generates, with 1031 modules
+LARGE_COURSE = 'large_synthetic'
+
+# the xml of each of its units
+LARGE_COURSE_UNIT = '''\
+      <vertical url_name="vertical_{name}" display_name="Unit {chapter}.{sequential}.{unit}">
+        <html url_name="html_{name}_a" display_name="Reading {name}">Reading for unit {name}.</html>
+        <problem url_name="problem_{name}" display_name="Problem {name}" weight="1">\
+<p>What is {chapter} + {sequential}?</p><stringresponse answer="{answer}"><textline size="10"/></stringresponse>\
+</problem>
+        <html url_name="html_{name}_b" display_name="Summary {name}">Summary of unit {name}.</html>
+      </vertical>'''
+
+
+def write_large_course(data_dir, chapters=10, sequentials=6, units=4):
+    '''
+    Write a generated course into `data_dir`/LARGE_COURSE: `chapters` chapters of `sequentials` sequentials
+    (the last of which is a graded homework) of `units` units, each holding two html modules and a problem,
+    all defined inline in course.xml.
+    '''
+    lines = ['<course org="edX" course="{0}" url_name="2014_Spring" display_name="Large Synthetic Course">'.format(
+        LARGE_COURSE
+    )]
+    for chapter in range(1, chapters + 1):
+        lines.append('  <chapter url_name="chapter_{0}" display_name="Chapter {0}">'.format(chapter))
+        for sequential in range(1, sequentials + 1):
+            homework = ' format="Homework" graded="true"' if sequential == sequentials else ''
+            lines.append('    <sequential url_name="sequential_{0}_{1}" display_name="Sequence {0}.{1}"{2}>'.format(
+                chapter, sequential, homework
+            ))
+            for unit in range(1, units + 1):
+                name = '{0}_{1}_{2}'.format(chapter, sequential, unit)
+                lines.append(LARGE_COURSE_UNIT.format(
+                    name=name, chapter=chapter, sequential=sequential, unit=unit, answer=chapter + sequential
+                ))
+            lines.append('    </sequential>')
+        lines.append('  </chapter>')
+    lines.append('</course>')
+
+    course_dir = path(data_dir) / LARGE_COURSE
+    course_dir.makedirs_p()
+    (course_dir / 'course.xml').write_text('\n'.join(lines) + '\n')
+
+
+class TestBulkImport(object):
+    '''Compare importing courses one module at a time with importing them in bulk'''
+    @classmethod
+    def setupClass(cls):
+        cls.connection = pymongo.MongoClient(host=HOST, port=PORT, tz_aware=True)
+        cls.connection.drop_database(DB)
+        # the large course is generated, rather than kept in the shared test data, which
+        # every test of the xml modulestore loads
+        cls.large_course_dir = mkdtemp()
+        write_large_course(cls.large_course_dir)
+
+    @classmethod
+    def teardownClass(cls):
+        cls.connection.drop_database(DB)
+        shutil.rmtree(cls.large_course_dir)
+
+    @staticmethod
+    def _store(collection):
+        '''Return a MongoModuleStore using `collection`'''
+        doc_store_config = {
+            'host': HOST,
+            'db': DB,
+            'collection': collection,
+        }
+        return MongoModuleStore(doc_store_config, FS_ROOT, RENDER_TEMPLATE, default_class=DEFAULT_CLASS)
+
+    def _import(self, course_dirs, bulk_write, data_dir=DATA_DIR):
+        '''
+        Import `course_dirs` of `data_dir` into a new store, returning the store, the number of writes
+        to its collection, and how long the import took
+        '''
+        store = self._store('modulestore_%s' % uuid4().hex[:5])
+        collection = store.collection
+        with patch.object(collection, 'update', wraps=collection.update) as mock_update:
+            with patch.object(collection, 'insert', wraps=collection.insert) as mock_insert:
+                start = time.time()
+                import_from_xml(store, data_dir, course_dirs, bulk_write=bulk_write)
+                duration = time.time() - start
+        return store, mock_update.call_count + mock_insert.call_count, duration
+
+    @staticmethod
+    def _documents(store):
+        '''Return all the documents in the store, keyed by location url'''
+        return dict(
+            (Location(document['_id']).url(), document)
+            for document in store.collection.find()
+        )
+
+    def test_same_documents(self):
+        '''Bulk imports write the same documents, even over existing ones'''
+        course_dirs = ['toy', 'simple']
+        store, _, _ = self._import(course_dirs, bulk_write=False)
+        bulk_store, _, _ = self._import(course_dirs, bulk_write=True)
+        assert_equals(self._documents(store), self._documents(bulk_store))
+
+        # reimporting updates the existing documents
+        import_from_xml(bulk_store, DATA_DIR, course_dirs, bulk_write=True)
+        assert_equals(self._documents(store), self._documents(bulk_store))
+
+    def test_benchmark_large_course(self):
+        '''Benchmark importing a large course, checking bulk imports need much fewer writes'''
+        store, writes, duration = self._import([LARGE_COURSE], False, self.large_course_dir)
+        bulk_store, bulk_writes, bulk_duration = self._import([LARGE_COURSE], True, self.large_course_dir)
+
+        documents = self._documents(store)
+        assert_equals(len(documents), 1031)
+        assert_equals(documents, self._documents(bulk_store))
+
+        log.info(
+            'Imported %s (%d modules) in %.2fs with %d writes, or in bulk in %.2fs with %d writes',
+            LARGE_COURSE, len(documents), duration, writes, bulk_duration, bulk_writes
+        )
+        # one write per batch of modules, plus the ones for the course module
+        assert_less(bulk_writes, writes / 100)
+
+
+class TestStaticContentImport(object):
+    '''Test importing static files with a pool of workers'''
+    def setUp(self):
+        self.connection = pymongo.MongoClient(host=HOST, port=PORT, tz_aware=True)
+        self.db = 'test_static_import_%s' % uuid4().hex[:5]
+        self.content_store = MongoContentStore(HOST, self.db)
+        self.course_location = Location('i4x', 'edX', 'toy', 'course', '2012_Fall')
+
+    def tearDown(self):
+        self.connection.drop_database(self.db)
+
+    def _import(self, workers):
+        '''Import the static files of the toy course, returning the remapping'''
+        return import_static_content(
+            [], self.course_location, DATA_DIR / 'toy', self.content_store,
+            self.course_location, workers=workers
+        )
+
+    def _assets(self):
+        '''Return the attributes of the toy course's assets, keyed by asset name'''
+        return dict(
+            (asset['_id']['name'], asset)
+            for asset in self.content_store.get_all_content_for_course(self.course_location)
+        )
+
+    def test_import(self):
+        remap_dict = self._import(workers=4)
+        assert_equals(remap_dict['sample_static.txt'], 'sample_static.txt')
+        assert_equals(sorted(remap_dict.values()), sorted(self._assets().keys()))
+
+        content = self.content_store.find(
+            StaticContent.compute_location('edX', 'toy', 'sample_static.txt')
+        )
+        with open(DATA_DIR / 'toy/static/sample_static.txt', 'rb') as static_file:
+            assert_equals(content.data, static_file.read())
+
+    def test_reimport_skips_unchanged(self):
+        self._import(workers=1)
+        assets = self._assets()
+
+        with patch.object(self.content_store, 'save', wraps=self.content_store.save) as mock_save:
+            self._import(workers=4)
+        assert_equals(mock_save.call_count, 0)
+        assert_equals(self._assets(), assets)
+
+    def test_large_files_are_streamed(self):
+        with patch('xmodule.modulestore.xml_importer.STATIC_IMPORT_STREAM_THRESHOLD', 0):
+            with patch('xmodule.modulestore.xml_importer.STATIC_IMPORT_CHUNK_SIZE', 3):
+                self._import(workers=2)
+
+        content = self.content_store.find(
+            StaticContent.compute_location('edX', 'toy', 'sample_static.txt')
+        )
+        with open(DATA_DIR / 'toy/static/sample_static.txt', 'rb') as static_file:
+            assert_equals(content.data, static_file.read())
@@ -1,6 +1,7 @@
 import hashlib
 import json
 import logging
+import multiprocessing
 import os
 import re
 import sys
@@ -23,11 +24,12 @@ from xmodule.html_module import HtmlDescriptor
 from xblock.core import XBlock
 from xblock.fields import ScopeIds
 from xblock.field_data import DictFieldData
+from xblock.runtime import DbModel
 
 from . import ModuleStoreReadBase, Location, XML_MODULESTORE_TYPE
 
 from .exceptions import ItemNotFoundError
-from .inheritance import compute_inherited_metadata
+from .inheritance import compute_inherited_metadata, InheritanceKeyValueStore
 
 edx_xml_parser = etree.XMLParser(dtd_validation=False, load_dtd=False,
                                  remove_comments=True, remove_blank_text=True)
@@ -36,6 +38,9 @@ etree.set_default_parser(edx_xml_parser)
 
 log = logging.getLogger(__name__)
 
+# The version of the course snapshot format. Snapshots of other versions are ignored.
+SNAPSHOT_VERSION = 1
+
 
 # VS[compat]
 # TODO (cpennington): Remove this once all fall 2012 courses have been imported
@@ -292,11 +297,60 @@ class ParentTracker(object):
         return list(self._parents[child])
 
 
+def course_dir_fingerprint(course_path):
+    """
+    Return a fingerprint of the files under course_path (their names, sizes and
+    modification times), which changes whenever any of them does.
+    """
+    fingerprint = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(course_path):
+        # visit the directories in a stable order, and skip version control data
+        dirnames[:] = sorted(dirname for dirname in dirnames if dirname != '.git')
+        for filename in sorted(filenames):
+            filepath = os.path.join(dirpath, filename)
+            stat = os.stat(filepath)
+            fingerprint.update(repr((os.path.relpath(filepath, course_path), stat.st_size, stat.st_mtime)))
+    return fingerprint.hexdigest()
+
+
+def load_class(class_path):
+    """
+    Return the class named by the dot-separated class_path.
+    """
+    module_path, _, class_name = class_path.rpartition('.')
+    return getattr(import_module(module_path), class_name)
+
+
+def _snapshot_course_dir(args):
+    """
+    Load the course in a course dir in a new XMLModuleStore, and return its snapshot,
+    or None if that fails. Run by the processes of XMLModuleStore's parallel loading.
+
+    args: (data_dir, course_dir, dict of options for the XMLModuleStore)
+    """
+    data_dir, course_dir, options = args
+    try:
+        fingerprint = course_dir_fingerprint(path(data_dir) / course_dir)
+        store = XMLModuleStore(data_dir, course_dirs=[course_dir], **options)
+        store.course_fingerprints[course_dir] = fingerprint
+        return store.course_snapshot(course_dir)
+    except Exception:  # pylint: disable=broad-except
+        log.exception("Failed to load course '%s' in a worker process", course_dir)
+        return None
+
+
 class XMLModuleStore(ModuleStoreReadBase):
     """
     An XML backed ModuleStore
+
+    Parsing the xml of large courses is slow; so, the store can load its
+    courses in a pool of processes, and from snapshots: json files, written
+    by write_snapshots (see the snapshot_xml_courses command), which record
+    the field values of each module. A course's snapshot is used only if
+    its course dir is unchanged since the snapshot was taken.
     """
-    def __init__(self, data_dir, default_class=None, course_dirs=None, load_error_modules=True, **kwargs):
+    def __init__(self, data_dir, default_class=None, course_dirs=None, load_error_modules=True,
+                 snapshot_dir=None, processes=1, **kwargs):
         """
         Initialize an XMLModuleStore from data_dir
 
@@ -307,6 +361,12 @@ class XMLModuleStore(ModuleStoreReadBase):
 
         course_dirs: If specified, the list of course_dirs to load. Otherwise,
             load all course dirs
+
+        snapshot_dir: If specified, the directory of the course snapshots to
+            load courses from, when they're up to date.
+
+        processes: The number of processes to parse the xml of courses in. If
+            1, they're parsed in this process.
         """
         super(XMLModuleStore, self).__init__(**kwargs)
 
@@ -314,8 +374,17 @@ class XMLModuleStore(ModuleStoreReadBase):
         self.modules = defaultdict(dict)  # course_id -> dict(location -> XBlock)
         self.courses = {}  # course_dir -> XBlock for the course
         self.errored_courses = {}  # course_dir -> errorlog, for dirs that failed to load
+        self.snapshot_dir = path(snapshot_dir) if snapshot_dir else None
+        # course_dir -> fingerprint of its files when the course was loaded
+        self.course_fingerprints = {}
 
         self.load_error_modules = load_error_modules
+        # the options for the stores of the processes which load courses in parallel
+        self.load_options = {
+            'default_class': default_class,
+            'load_error_modules': load_error_modules,
+            'xblock_mixins': self.xblock_mixins,
+        }
 
         if default_class is None:
             self.default_class = None
@@ -334,8 +403,42 @@ class XMLModuleStore(ModuleStoreReadBase):
         if course_dirs is None:
             course_dirs = sorted([d for d in os.listdir(self.data_dir) if
                                   os.path.exists(self.data_dir / d / "course.xml")])
+
+        course_dirs_to_parse = []
         for course_dir in course_dirs:
-            self.try_load_course(course_dir)
+            if self.snapshot_dir is not None:
+                self.course_fingerprints[course_dir] = course_dir_fingerprint(self.data_dir / course_dir)
+                if self.try_load_snapshot(course_dir):
+                    continue
+            course_dirs_to_parse.append(course_dir)
+
+        if processes > 1 and len(course_dirs_to_parse) > 1:
+            self.load_courses_in_parallel(course_dirs_to_parse, processes)
+        else:
+            for course_dir in course_dirs_to_parse:
+                self.try_load_course(course_dir)
+
+    def load_courses_in_parallel(self, course_dirs, processes):
+        """
+        Parse the courses in course_dirs in a pool of processes, and load them
+        from the snapshots the processes return. Courses which can't be loaded
+        that way are loaded in this process.
+        """
+        pool = multiprocessing.Pool(min(processes, len(course_dirs)))
+        try:
+            snapshots = pool.map(
+                _snapshot_course_dir,
+                [(self.data_dir, course_dir, self.load_options) for course_dir in course_dirs]
+            )
+        finally:
+            pool.close()
+            pool.join()
+
+        for course_dir, snapshot in zip(course_dirs, snapshots):
+            if snapshot is not None and self.load_snapshot(snapshot):
+                self.course_fingerprints[course_dir] = snapshot['fingerprint']
+            else:
+                self.try_load_course(course_dir)
 
     def try_load_course(self, course_dir):
         '''
@@ -363,6 +466,164 @@ class XMLModuleStore(ModuleStoreReadBase):
             # Didn't load course.  Instead, save the errors elsewhere.
             self.errored_courses[course_dir] = errorlog
 
+    def _snapshot_path(self, course_dir, snapshot_dir=None):
+        """
+        The path of the snapshot of course_dir in snapshot_dir (by default, the store's).
+        """
+        return path(snapshot_dir or self.snapshot_dir) / u'{0}.json'.format(course_dir)
+
+    def try_load_snapshot(self, course_dir):
+        """
+        Load the course in course_dir from its snapshot, if there is one and
+        the course dir hasn't changed since it was taken.
+
+        Returns whether the course was loaded.
+        """
+        try:
+            with open(self._snapshot_path(course_dir)) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (IOError, ValueError):
+            return False
+
+        if (snapshot.get('version') != SNAPSHOT_VERSION or
+                snapshot.get('fingerprint') != self.course_fingerprints[course_dir]):
+            log.info("The snapshot of course '%s' is out of date", course_dir)
+            return False
+        return self.load_snapshot(snapshot)
+
+    def load_snapshot(self, snapshot):
+        """
+        Load a course from its snapshot (see course_snapshot).
+
+        Returns whether the course was loaded.
+        """
+        course_dir = snapshot['course_dir']
+        errorlog = make_error_tracker()
+        errorlog.errors.extend(tuple(error) for error in snapshot['errors'])
+        course_id = snapshot['course_id']
+        if course_id is None:
+            self.errored_courses[course_dir] = errorlog
+            return True
+
+        try:
+            system = ImportSystem(
+                xmlstore=self,
+                course_id=course_id,
+                course_dir=course_dir,
+                error_tracker=errorlog.tracker,
+                parent_tracker=self.parent_trackers[course_id],
+                load_error_modules=self.load_error_modules,
+                policy={},
+                mixins=self.xblock_mixins,
+            )
+            modules = self.modules[course_id]
+            for module_snapshot in snapshot['modules']:
+                location = Location(module_snapshot['location'])
+                module = system.construct_xblock_from_class(
+                    load_class(module_snapshot['class']),
+                    ScopeIds(module_snapshot['user_id'], module_snapshot['block_type'], location, location),
+                    DbModel(InheritanceKeyValueStore(initial_values=module_snapshot['fields'])),
+                )
+                module.data_dir = module_snapshot['data_dir']
+                modules[location] = module
+
+            for location, module in modules.iteritems():
+                if module.has_children:
+                    for child in module.children:
+                        if Location(child) in modules:
+                            self.parent_trackers[course_id].add_parent(child, location)
+
+            course_descriptor = modules[Location(snapshot['course_location'])]
+            compute_inherited_metadata(course_descriptor)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Failed to load course '%s' from its snapshot", course_dir)
+            self.modules.pop(course_id, None)
+            self.parent_trackers.pop(course_id, None)
+            return False
+
+        self.courses[course_dir] = course_descriptor
+        self._location_errors[course_descriptor.location] = errorlog
+        self.parent_trackers[course_id].make_known(course_descriptor.location)
+        return True
+
+    def course_snapshot(self, course_dir):
+        """
+        Return a json-able snapshot of the course loaded from course_dir (or of
+        its errors, if it failed to load), from which load_snapshot recreates
+        the course without parsing its xml.
+        """
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'course_dir': course_dir,
+            'fingerprint': (
+                self.course_fingerprints.get(course_dir) or course_dir_fingerprint(self.data_dir / course_dir)
+            ),
+        }
+        if course_dir in self.errored_courses:
+            snapshot.update({
+                'course_id': None,
+                'errors': self.errored_courses[course_dir].errors,
+            })
+            return snapshot
+
+        course_descriptor = self.courses[course_dir]
+        snapshot.update({
+            'course_id': course_descriptor.id,
+            'course_location': course_descriptor.location.url(),
+            'errors': self._location_errors[course_descriptor.location].errors,
+            'modules': [
+                self._module_snapshot(module) for module in self.modules[course_descriptor.id].itervalues()
+            ],
+        })
+        return snapshot
+
+    def _module_snapshot(self, module):
+        """
+        Return a json-able dict of what's needed to recreate module: its class,
+        scope ids, and the json values of its explicitly set fields.
+        """
+        xblock_class = getattr(module, 'unmixed_class', module.__class__)
+        return {
+            'location': module.location.url(),
+            'class': '{0}.{1}'.format(xblock_class.__module__, xblock_class.__name__),
+            'user_id': module.scope_ids.user_id,
+            'block_type': module.scope_ids.block_type,
+            'data_dir': getattr(module, 'data_dir', None),
+            'fields': dict(
+                (name, field.read_json(module))
+                for name, field in module.fields.iteritems()
+                if field.is_set_on(module)
+            ),
+        }
+
+    def write_snapshots(self, snapshot_dir=None):
+        """
+        Write the snapshots of all the store's course dirs to snapshot_dir (by
+        default, the store's snapshot_dir).
+
+        Returns the list of the course dirs whose snapshots were written.
+        """
+        snapshot_dir = path(snapshot_dir or self.snapshot_dir)
+        if not snapshot_dir.isdir():
+            os.makedirs(snapshot_dir)
+
+        written = []
+        for course_dir in sorted(set(self.courses) | set(self.errored_courses)):
+            snapshot_path = self._snapshot_path(course_dir, snapshot_dir)
+            # write to a temporary file, and then move it, so that stores never read partial snapshots
+            temp_path = snapshot_path + '.tmp'
+            try:
+                with open(temp_path, 'w') as snapshot_file:
+                    json.dump(self.course_snapshot(course_dir), snapshot_file)
+                os.rename(temp_path, snapshot_path)
+            except (TypeError, ValueError, IOError, OSError):
+                log.exception("Failed to write the snapshot of course '%s'", course_dir)
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                continue
+            written.append(course_dir)
+        return written
+
     def __unicode__(self):
         '''
         String representation - for debugging
@@ -1,6 +1,10 @@
+import hashlib
 import logging
 import os
 import mimetypes
+import Queue
+import sys
+import threading
 from path import path
 import json
 
@@ -16,9 +20,131 @@ from .store_utilities import rewrite_nonportable_content_links
 log = logging.getLogger(__name__)
 
 
+# the number of threads reading, thumbnailing and saving static files during imports
+STATIC_IMPORT_WORKERS = 4
+# the most static files waiting for a worker, which bounds the memory the import uses
+STATIC_IMPORT_QUEUE_SIZE = 32
+# files bigger than this (in bytes) are streamed to the contentstore rather than read into memory
+STATIC_IMPORT_STREAM_THRESHOLD = 1024 * 1024
+STATIC_IMPORT_CHUNK_SIZE = 256 * 1024
+
+
+def _read_chunks(content_path):
+    """
+    Yield the contents of the file at `content_path`, in chunks of STATIC_IMPORT_CHUNK_SIZE
+    """
+    with open(content_path, 'rb') as f:
+        while True:
+            chunk = f.read(STATIC_IMPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _file_md5(content_path):
+    """
+    Return the hex md5 digest of the file at `content_path`, without reading it all into memory
+    """
+    md5 = hashlib.md5()
+    for chunk in _read_chunks(content_path):
+        md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _existing_static_content(static_content_store, target_location_namespace):
+    """
+    Return the attributes of the static content the course already has, keyed by asset name,
+    so that unchanged files can be skipped when a course is re-imported
+    """
+    try:
+        assets = static_content_store.get_all_content_for_course(target_location_namespace)
+    except NotImplementedError:
+        return {}
+    return dict((asset['_id']['name'], asset) for asset in assets)
+
+
+def _import_static_file(static_content_store, content_path, content_loc, fullname_with_subpath,
+                        displayname, mime_type, locked, existing):
+    """
+    Save the file at `content_path` (and its thumbnail) in the static content store as `content_loc`,
+    unless `existing`, the attributes of the content already saved there, show it is unchanged.
+    """
+    try:
+        size = os.path.getsize(content_path)
+        if size > STATIC_IMPORT_STREAM_THRESHOLD:
+            data = None
+            md5 = _file_md5(content_path)
+        else:
+            with open(content_path, 'rb') as f:
+                data = f.read()
+            md5 = hashlib.md5(data).hexdigest()
+    except (IOError, OSError):
+        if os.path.basename(content_path).startswith('._'):
+            # OS X "companion files". See http://www.diigo.com/annotated/0c936fda5da4aa1159c189cea227e174
+            return
+        # Not a 'hidden file', then re-raise exception
+        raise
+
+    if existing is not None and (
+        existing.get('md5') == md5 and
+        existing.get('displayname') == displayname and
+        existing.get('contentType') == mime_type and
+        existing.get('import_path') == fullname_with_subpath and
+        existing.get('locked', False) == locked
+    ):
+        log.debug('static content %s is unchanged', content_path)
+        return
+
+    content = StaticContent(
+        content_loc, displayname, mime_type,
+        data if data is not None else _read_chunks(content_path),
+        import_path=fullname_with_subpath, locked=locked
+    )
+
+    # first let's save a thumbnail so we can get back a thumbnail location. The thumbnail is
+    # made from the file on disk, so that streamed content doesn't have to be read twice
+    (thumbnail_content, thumbnail_location) = static_content_store.generate_thumbnail(
+        content, tempfile_path=content_path
+    )
+
+    if thumbnail_content is not None:
+        content.thumbnail_location = thumbnail_location
+
+    #then commit the content
+    try:
+        static_content_store.save(content)
+    except Exception as err:
+        log.exception('Error importing {0}, error={1}'.format(fullname_with_subpath, err))
+
+
+def _static_import_worker(static_content_store, tasks, errors):
+    """
+    Import the static files queued in `tasks` until a None task is received, appending
+    the information of any exception raised to `errors`
+    """
+    while True:
+        task = tasks.get()
+        try:
+            if task is None:
+                return
+            if not errors:
+                _import_static_file(static_content_store, *task)
+        except Exception:  # pylint: disable=broad-except
+            errors.append(sys.exc_info())
+        finally:
+            tasks.task_done()
+
+
 def import_static_content(modules, course_loc, course_data_path, static_content_store, target_location_namespace,
-                          subpath='static', verbose=False):
+                          subpath='static', verbose=False, workers=STATIC_IMPORT_WORKERS):
+    """
+    Import the files in the `subpath` directory of the course into the static content store,
+    returning a dict mapping their paths relative to that directory to their asset names.
 
+    The files are read, thumbnailed and saved by a pool of `workers` threads, fed through a
+    queue bounded to STATIC_IMPORT_QUEUE_SIZE files. Files whose contents and attributes match
+    the ones already in the store (e.g. when a course is re-imported) are not saved again.
+    """
     remap_dict = {}
 
     # now import all static assets
@@ -33,52 +159,53 @@ def import_static_content(modules, course_loc, course_data_path, static_content_
 
     verbose = True
 
-    for dirname, _, filenames in os.walk(static_dir):
-        for filename in filenames:
-
-            content_path = os.path.join(dirname, filename)
-            if verbose:
-                log.debug('importing static content %s...', content_path)
-
-            try:
-                with open(content_path, 'rb') as f:
-                    data = f.read()
-            except IOError:
-                if filename.startswith('._'):
-                    # OS X "companion files". See http://www.diigo.com/annotated/0c936fda5da4aa1159c189cea227e174
-                    continue
-                # Not a 'hidden file', then re-raise exception
-                raise
-
-            fullname_with_subpath = content_path.replace(static_dir, '')  # strip away leading path from the name
-            if fullname_with_subpath.startswith('/'):
-                fullname_with_subpath = fullname_with_subpath[1:]
-            content_loc = StaticContent.compute_location(target_location_namespace.org, target_location_namespace.course, fullname_with_subpath)
-
-
-            policy_ele = policy.get(content_loc.name, {})
-            displayname = policy_ele.get('displayname', filename)
-            locked = policy_ele.get('locked', False)
-            mime_type = policy_ele.get('contentType', mimetypes.guess_type(filename)[0])
-            content = StaticContent(
-                content_loc, displayname, mime_type, data,
-                import_path=fullname_with_subpath, locked=locked
-            )
-
-            # first let's save a thumbnail so we can get back a thumbnail location
-            (thumbnail_content, thumbnail_location) = static_content_store.generate_thumbnail(content)
+    existing_content = _existing_static_content(static_content_store, target_location_namespace)
 
-            if thumbnail_content is not None:
-                content.thumbnail_location = thumbnail_location
+    tasks = Queue.Queue(STATIC_IMPORT_QUEUE_SIZE)
+    errors = []
+    threads = []
+    for __ in range(max(workers, 1)):
+        thread = threading.Thread(target=_static_import_worker, args=(static_content_store, tasks, errors))
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
 
-            #then commit the content
-            try:
-                static_content_store.save(content)
-            except Exception as err:
-                log.exception('Error importing {0}, error={1}'.format(fullname_with_subpath, err))
+    try:
+        for dirname, _, filenames in os.walk(static_dir):
+            for filename in filenames:
+                if errors:
+                    break
 
-            #store the remapping information which will be needed to subsitute in the module data
-            remap_dict[fullname_with_subpath] = content_loc.name
+                content_path = os.path.join(dirname, filename)
+                if verbose:
+                    log.debug('importing static content %s...', content_path)
+
+                fullname_with_subpath = content_path.replace(static_dir, '')  # strip away leading path from the name
+                if fullname_with_subpath.startswith('/'):
+                    fullname_with_subpath = fullname_with_subpath[1:]
+                content_loc = StaticContent.compute_location(target_location_namespace.org, target_location_namespace.course, fullname_with_subpath)
+
+                policy_ele = policy.get(content_loc.name, {})
+                displayname = policy_ele.get('displayname', filename)
+                locked = policy_ele.get('locked', False)
+                mime_type = policy_ele.get('contentType', mimetypes.guess_type(filename)[0])
+
+                tasks.put((
+                    content_path, content_loc, fullname_with_subpath, displayname, mime_type, locked,
+                    existing_content.get(content_loc.name)
+                ))
+
+                #store the remapping information which will be needed to subsitute in the module data
+                remap_dict[fullname_with_subpath] = content_loc.name
+    finally:
+        for __ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        exc_type, exc_value, exc_traceback = errors[0]
+        raise exc_type, exc_value, exc_traceback
 
     return remap_dict
 
@@ -87,7 +214,7 @@ def import_from_xml(store, data_dir, course_dirs=None,
                     default_class='xmodule.raw_module.RawDescriptor',
                     load_error_modules=True, static_content_store=None, target_location_namespace=None,
                     verbose=False, draft_store=None,
-                    do_import_static=True):
+                    do_import_static=True, bulk_write=False):
     """
     Import the specified xml data_dir into the "store" modulestore,
     using org and course as the location org and course.
@@ -104,6 +231,10 @@ def import_from_xml(store, data_dir, course_dirs=None,
                       have substantial unchanging static content, which is to inefficient to import every time the course is loaded.
                       Static content for some courses may also be served directly by nginx, instead of going through django.
 
+    bulk_write: if True, and the store supports it (has a `bulk_write_items` method), then the modules of each course
+                (other than the course module and static tabs) are written to the store together once they've all been
+                processed, instead of one at a time.
+
     """
 
     xml_module_store = XMLModuleStore(
@@ -198,6 +329,7 @@ def import_from_xml(store, data_dir, course_dirs=None,
                                       _namespace_rename, subpath=simport, verbose=verbose)
 
             # finally loop through all the modules
+            bulk_items = [] if bulk_write and hasattr(store, 'bulk_write_items') else None
             for module in xml_module_store.modules[course_id].itervalues():
                 if module.scope_ids.block_type == 'course':
                     # we've already saved the course module up at the top of the loop
@@ -213,7 +345,10 @@ def import_from_xml(store, data_dir, course_dirs=None,
 
                 import_module(module, store, course_data_path, static_content_store, course_location,
                               target_location_namespace if target_location_namespace else course_location,
-                              do_import_static=do_import_static)
+                              do_import_static=do_import_static, bulk_items=bulk_items)
+
+            if bulk_items:
+                store.bulk_write_items(bulk_items)
 
             # now import any 'draft' items
             if draft_store is not None:
@@ -241,7 +376,14 @@ def import_from_xml(store, data_dir, course_dirs=None,
 
 def import_module(module, store, course_data_path, static_content_store,
                   source_course_location, dest_course_location, allow_not_found=False,
-                  do_import_static=True):
+                  do_import_static=True, bulk_items=None):
+    """
+    Write `module` to `store`.
+
+    If `bulk_items` is a list, then the (location, update) pair to pass to the store's
+    `bulk_write_items` is appended to it instead, unless the module is a static tab (as
+    those need to be kept in sync with the course's tabs).
+    """
 
     logging.debug('processing import of module {0}...'.format(module.location.url()))
 
@@ -267,13 +409,20 @@ def import_module(module, store, course_data_path, static_content_store,
         module_data = rewrite_nonportable_content_links(
             source_course_location.course_id, dest_course_location.course_id, module_data)
 
-    if allow_not_found:
+    bulk_write = bulk_items is not None and module.location.category != 'static_tab'
+
+    if bulk_write:
+        update = {'definition.data': module_data}
+    elif allow_not_found:
         store.update_item(module.location, module_data, allow_not_found=allow_not_found)
     else:
         store.update_item(module.location, module_data)
 
     if hasattr(module, 'children') and module.children != []:
-        store.update_children(module.location, module.children)
+        if bulk_write:
+            update['definition.children'] = module.children
+        else:
+            store.update_children(module.location, module.children)
 
     # NOTE: It's important to use own_metadata here to avoid writing
     # inherited metadata everywhere.
@@ -286,7 +435,11 @@ def import_module(module, store, course_data_path, static_content_store,
         del module.xml_attributes['index_in_children_list']
     module.save()
 
-    store.update_metadata(module.location, dict(own_metadata(module)))
+    if bulk_write:
+        update['metadata'] = dict(own_metadata(module))
+        bulk_items.append((module.location, update))
+    else:
+        store.update_metadata(module.location, dict(own_metadata(module)))
 
 
 def import_course_draft(xml_module_store, store, draft_store, course_data_path, static_content_store, source_location_namespace, target_location_namespace):
@@ -1,5 +1,4 @@
 from xmodule.modulestore.django import modulestore
-from xmodule.course_module import CourseDescriptor
 from django.conf import settings
 
 
@@ -12,12 +11,9 @@ def pick_subdomain(domain, options, default='default'):
 
 def get_visible_courses(domain=None):
     """
-    Return the set of CourseDescriptors that should be visible in this branded instance
+    Return the CourseSummaries of the courses that should be visible in this branded instance
     """
-    _courses = modulestore().get_courses()
-
-    courses = [c for c in _courses
-               if isinstance(c, CourseDescriptor)]
+    courses = modulestore().get_course_summaries()
     courses = sorted(courses, key=lambda course: course.number)
 
     if domain and settings.FEATURES.get('SUBDOMAIN_COURSE_LISTINGS'):
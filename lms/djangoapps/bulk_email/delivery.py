@@ -0,0 +1,133 @@
+"""
+Connections and rate limiting for sending bulk email.
+"""
+import logging
+import socket
+import threading
+from smtplib import SMTPException
+from time import time, sleep
+
+from django.core.cache import cache as django_cache
+
+log = logging.getLogger(__name__)
+
+
+class SendRateLimiter(object):
+    """
+    Limits the rate at which email is sent by all the processes sharing a django cache.
+
+    This is a token bucket holding `rate` tokens, which is refilled every second.  The
+    tokens taken in each second are counted in the cache with an atomic incr(), so all
+    the celery workers using the same cache respect one global rate.
+    """
+    def __init__(self, rate, cache=None, key='bulk_email.sends'):
+        """
+        :param rate: the most messages to send per second.  0 (or None) does not limit sending.
+        :param cache: the django cache to count the sends in.  Defaults to the default cache.
+        :param key: the prefix of the keys of the counts in the cache
+        """
+        self.rate = rate
+        self.cache = cache if cache is not None else django_cache
+        self.key = key
+
+    def acquire(self):
+        """
+        Waits until a message may be sent, and takes a token for it.
+
+        Returns the number of seconds waited.
+        """
+        waited = 0
+        if not self.rate:
+            return waited
+        while True:
+            now = time()
+            second = int(now)
+            key = '{}.{}'.format(self.key, second)
+            # add() doesn't change an existing count; the counts expire once their second is over
+            self.cache.add(key, 0, 2)
+            try:
+                count = self.cache.incr(key)
+            except ValueError:
+                # the count expired between the add and the incr
+                continue
+            if count <= self.rate:
+                return waited
+            delay = second + 1 - now
+            sleep(delay)
+            waited += delay
+
+
+class ConnectionPool(object):
+    """
+    Keeps up to `size` open connections to the email backend, to be reused by the tasks of a process.
+
+    Opening a connection to an SMTP server (connecting, TLS, authenticating) takes several round
+    trips, which is a large part of the time to send a task's worth of messages.  A size of 0 opens
+    a new connection for each task, and closes it afterwards.
+    """
+    def __init__(self, size, open_connection):
+        """
+        :param size: the most idle connections to keep open
+        :param open_connection: a function returning a new open connection to the email backend
+        """
+        self.size = size
+        self.open_connection = open_connection
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns an open connection, which is either reused or new.
+        """
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                return self.open_connection()
+            if self._is_usable(connection):
+                return connection
+            self._close(connection)
+
+    def release(self, connection, reuse=True):
+        """
+        Returns `connection` to the pool, or closes it if it isn't to be reused or the pool is full.
+        """
+        if reuse:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(connection)
+                    return
+        self._close(connection)
+
+    def close(self):
+        """
+        Closes all the idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+    @staticmethod
+    def _is_usable(connection):
+        """
+        Checks that the server hasn't closed the idle `connection`.
+        """
+        smtp_connection = getattr(connection, 'connection', None)
+        if smtp_connection is None:
+            # backends without a connection to check (e.g. locmem)
+            return True
+        try:
+            return smtp_connection.noop()[0] == 250
+        except (SMTPException, socket.error):
+            return False
+
+    @staticmethod
+    def _close(connection):
+        """
+        Closes `connection`, ignoring errors: the server may have closed it already.
+        """
+        try:
+            connection.close()
+        except Exception:  # pylint: disable=W0703
+            log.warning("Failed to close email connection", exc_info=True)
@@ -12,6 +12,9 @@ file and check it in at the same time as your model changes. To do that,
 
 """
 import logging
+import re
+from string import Formatter
+
 from django.db import models, transaction
 from django.contrib.auth.models import User
 from html_to_text import html_to_text
@@ -136,6 +139,70 @@ class Optout(models.Model):
 # the location where the email message body is to be inserted.
 COURSE_EMAIL_MESSAGE_BODY_TAG = '{{message_body}}'
 
+# The context values that differ between the recipients of an email.
+COURSE_EMAIL_RECIPIENT_FIELDS = ('name', 'email')
+
+
+class CompiledEmailTemplate(object):
+    """
+    An email template rendered once for all the recipients of an email.
+
+    The template is split into static segments, which hold the text rendered from
+    the values that are the same for all recipients (and the message body), and the
+    fields which depend on the recipient.  Rendering the email for a recipient then
+    only formats the recipient's fields and joins the segments.
+
+    The result is the same as that of CourseEmailTemplate._render() with the same context.
+    """
+    _formatter = Formatter()
+
+    def __init__(self, format_string, message_body, context, recipient_fields=COURSE_EMAIL_RECIPIENT_FIELDS):
+        """
+        Compiles `format_string`, inserting `message_body` and the values of `context`, except
+        for the fields in `recipient_fields`, which are left for render().
+
+        Raises a KeyError if a field of the template other than those in `recipient_fields`
+        is missing from `context`.
+        """
+        # Like _render(), insert the message body after the substitutions have been performed.
+        message_body_tag = COURSE_EMAIL_MESSAGE_BODY_TAG.format()
+        self.segments = []
+        static_text = []
+        for literal_text, field_name, format_spec, conversion in self._formatter.parse(format_string):
+            static_text.append(literal_text)
+            if field_name is None:
+                continue
+            if re.match(r'[^.[]*', field_name).group() in recipient_fields:
+                self.segments.append(u''.join(static_text))
+                self.segments.append((field_name, format_spec, conversion))
+                static_text = []
+            else:
+                static_text.append(self._format_field(field_name, format_spec, conversion, context))
+        self.segments.append(u''.join(static_text))
+
+        for index, segment in enumerate(self.segments):
+            if isinstance(segment, basestring) and message_body_tag in segment:
+                self.segments[index] = segment.replace(message_body_tag, message_body, 1)
+                break
+
+    @classmethod
+    def _format_field(cls, field_name, format_spec, conversion, context):
+        """
+        Format the value of `field_name` in `context`, as format() does.
+        """
+        value, _ = cls._formatter.get_field(field_name, (), context)
+        value = cls._formatter.convert_field(value, conversion)
+        return cls._formatter.format_field(value, cls._formatter.vformat(format_spec, (), context))
+
+    def render(self, recipient_context):
+        """
+        Returns the email for the recipient whose values are in `recipient_context`, as a unicode string.
+        """
+        return u''.join(
+            segment if isinstance(segment, basestring) else self._format_field(*segment, context=recipient_context)
+            for segment in self.segments
+        )
+
 
 class CourseEmailTemplate(models.Model):
     """
@@ -213,6 +280,26 @@ class CourseEmailTemplate(models.Model):
         """
         return CourseEmailTemplate._render(self.html_template, htmltext, context)
 
+    def compile_plaintext(self, plaintext, context):
+        """
+        Create the plain text message for all the recipients of an email.
+
+        Returns a CompiledEmailTemplate of the stored plain template, with the plain text
+        body (`plaintext`) and the values of the provided `context` dict which are the same
+        for all recipients.
+        """
+        return CompiledEmailTemplate(self.plain_template, plaintext, context)
+
+    def compile_htmltext(self, htmltext, context):
+        """
+        Create the HTML message for all the recipients of an email.
+
+        Returns a CompiledEmailTemplate of the stored HTML template, with the HTML
+        body (`htmltext`) and the values of the provided `context` dict which are the same
+        for all recipients.
+        """
+        return CompiledEmailTemplate(self.html_template, htmltext, context)
+
 
 class CourseAuthorization(models.Model):
     """
@@ -5,6 +5,7 @@ to a course.
 import re
 import random
 import json
+import threading
 from time import sleep
 
 from dogapi import dog_stats_api
@@ -32,6 +33,7 @@ from django.contrib.auth.models import User
 from django.core.mail import EmailMultiAlternatives, get_connection
 from django.core.urlresolvers import reverse
 
+from bulk_email.delivery import ConnectionPool, SendRateLimiter
 from bulk_email.models import (
     CourseEmail, Optout, CourseEmailTemplate,
     SEND_TO_MYSELF, SEND_TO_ALL, TO_OPTIONS,
@@ -90,6 +92,35 @@ BULK_EMAIL_FAILURE_ERRORS = (
 )
 
 
+def _open_connection():
+    """
+    Returns a new open connection to the email backend.
+    """
+    connection = get_connection()
+    connection.open()
+    return connection
+
+
+# The connections to the email backend, kept open between the tasks run by a process.
+# It is created by the first task to send email (see _get_connection_pool).
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def _get_connection_pool():
+    """
+    Returns this process's pool of connections to the email backend.
+
+    It is created on first use rather than on import, so that its size is read from the
+    settings in effect when email is sent.
+    """
+    global _connection_pool  # pylint: disable=W0603
+    with _connection_pool_lock:
+        if _connection_pool is None:
+            _connection_pool = ConnectionPool(settings.BULK_EMAIL_CONNECTION_POOL_SIZE, _open_connection)
+        return _connection_pool
+
+
 def _get_recipient_queryset(user_id, to_option, course_id, course_location):
     """
     Returns a query set of email recipients corresponding to the requested to_option category.
@@ -430,13 +461,19 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
     from_addr = _get_source_address(course_email.course_id, course_title)
 
     course_email_template = CourseEmailTemplate.get_template()
+    connection = None
+    reuse_connection = False
     try:
-        connection = get_connection()
-        connection.open()
+        # Render the parts of the messages which are the same for all recipients just once.
+        plaintext_template = course_email_template.compile_plaintext(course_email.text_message, global_email_context)
+        html_template = course_email_template.compile_htmltext(course_email.html_message, global_email_context)
+
+        # The limit on the rate of sending email, shared by all the workers using the same cache.
+        send_rate_limiter = SendRateLimiter(settings.BULK_EMAIL_MAX_SENDS_PER_SECOND)
+        connection = _get_connection_pool().get()
 
         # Define context values to use in all course emails:
         email_context = {'name': '', 'email': ''}
-        email_context.update(global_email_context)
 
         while to_list:
             # Update context with user-specific values from the user at the end of the list.
@@ -450,8 +487,8 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             email_context['name'] = current_recipient['profile__name']
 
             # Construct message content using templates and context:
-            plaintext_msg = course_email_template.render_plaintext(course_email.text_message, email_context)
-            html_msg = course_email_template.render_htmltext(course_email.html_message, email_context)
+            plaintext_msg = plaintext_template.render(email_context)
+            html_msg = html_template.render(email_context)
 
             # Create email:
             email_msg = EmailMultiAlternatives(
@@ -463,12 +500,14 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
             )
             email_msg.attach_alternative(html_msg, 'text/html')
 
-            # Throttle if we have gotten the rate limiter.  This is not very high-tech,
-            # but if a task has been retried for rate-limiting reasons, then we sleep
-            # for a period of time between all emails within this task.  Choice of
-            # the value depends on the number of workers that might be sending email in
-            # parallel, and what the SES throttle rate is.
-            if subtask_status.retried_nomax > 0:
+            # Throttle to the global sending rate, if one is set.  Otherwise, throttle if
+            # we have gotten the rate limiter.  This is not very high-tech, but if a task has
+            # been retried for rate-limiting reasons, then we sleep for a period of time
+            # between all emails within this task.  Choice of the value depends on the number
+            # of workers that might be sending email in parallel, and what the SES throttle rate is.
+            if send_rate_limiter.rate:
+                send_rate_limiter.acquire()
+            elif subtask_status.retried_nomax > 0:
                 sleep(settings.BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
 
             try:
@@ -557,11 +596,14 @@ def _send_course_email(entry_id, email_id, to_list, global_email_context, subtas
         # All went well.  Update counters with progress to date,
         # and set the state to SUCCESS:
         subtask_status.increment(state=SUCCESS)
+        # The connection is only known to be good when all went well.
+        reuse_connection = True
         # Successful completion is marked by an exception value of None.
         return subtask_status, None
     finally:
         # Clean up at the end.
-        connection.close()
+        if connection is not None:
+            _get_connection_pool().release(connection, reuse=reuse_connection)
 
 
 def _get_current_task():
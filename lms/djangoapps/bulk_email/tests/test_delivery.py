@@ -0,0 +1,228 @@
+"""
+Tests of the connection pool and rate limiter used to send bulk email
+"""
+import asyncore
+import smtpd
+import sys
+import threading
+import time
+import unittest
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.core.management import call_command
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.smtp import EmailBackend
+from django.test import TestCase
+from mock import Mock, patch
+
+from bulk_email.delivery import ConnectionPool, SendRateLimiter
+from bulk_email.models import CourseEmailTemplate
+
+
+class DummySMTPServer(smtpd.SMTPServer):
+    """
+    An SMTP server on a local port, which counts the messages it receives and drops them.
+    """
+    def __init__(self):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.port = self.socket.getsockname()[1]
+        self.received = 0
+        self.thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.01})
+        self.thread.daemon = True
+        self.thread.start()
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.received += 1
+
+    def stop(self):
+        """Stop listening, and wait for the open connections to finish."""
+        self.close()
+        self.thread.join(5)
+
+
+class TestSendRateLimiter(TestCase):
+    """
+    Test limiting the global rate of sending.
+    """
+    def setUp(self):
+        self.cache = get_cache('django.core.cache.backends.locmem.LocMemCache', LOCATION='test_delivery')
+        self.cache.clear()
+
+    @patch('bulk_email.delivery.sleep')
+    @patch('bulk_email.delivery.time')
+    def test_rate(self, mock_time, mock_sleep):
+        mock_time.return_value = 1000.25
+        limiter = SendRateLimiter(2, self.cache)
+        self.assertEqual(limiter.acquire(), 0)
+        # another worker shares the bucket
+        self.assertEqual(SendRateLimiter(2, self.cache).acquire(), 0)
+
+        # the bucket is empty until the next second
+        mock_sleep.side_effect = lambda delay: mock_time.configure_mock(return_value=mock_time.return_value + delay)
+        self.assertEqual(limiter.acquire(), 0.75)
+        mock_sleep.assert_called_once_with(0.75)
+
+    def test_no_limit(self):
+        limiter = SendRateLimiter(0, self.cache)
+        for _ in range(10):
+            self.assertEqual(limiter.acquire(), 0)
+
+
+class TestConnectionPool(TestCase):
+    """
+    Test reusing connections to the email backend.
+    """
+    def test_reuse(self):
+        open_connection = Mock(side_effect=lambda: Mock(connection=None))
+        pool = ConnectionPool(1, open_connection)
+        connection = pool.get()
+        pool.release(connection)
+        self.assertIs(pool.get(), connection)
+        # the pool is empty until the connection is released
+        other_connection = pool.get()
+        self.assertIsNot(other_connection, connection)
+
+        pool.release(connection)
+        # the pool is full
+        pool.release(other_connection)
+        other_connection.close.assert_called_once_with()
+        self.assertFalse(connection.close.called)
+
+        pool.close()
+        connection.close.assert_called_once_with()
+
+    def test_no_reuse(self):
+        pool = ConnectionPool(1, Mock)
+        connection = pool.get()
+        pool.release(connection, reuse=False)
+        connection.close.assert_called_once_with()
+        self.assertIsNot(pool.get(), connection)
+
+    def test_closed_by_server(self):
+        pool = ConnectionPool(1, Mock)
+        connection = pool.get()
+        connection.connection.noop.return_value = (421, 'Timeout')
+        pool.release(connection)
+        self.assertIsNot(pool.get(), connection)
+        connection.close.assert_called_once_with()
+
+    def test_size_zero(self):
+        pool = ConnectionPool(0, Mock)
+        connection = pool.get()
+        pool.release(connection)
+        connection.close.assert_called_once_with()
+
+
+class TestSendWithCompiledTemplates(TestCase):
+    """
+    Test sending the messages of several tasks with compiled templates over a pooled connection
+    to a local SMTP server.
+    """
+    TASKS = 2
+    EMAILS_PER_TASK = 3
+
+    def setUp(self):
+        # load initial content (since we don't run migrations as part of tests):
+        call_command("loaddata", "course_email_template.json")
+        self.server = DummySMTPServer()
+        self.addCleanup(self.server.stop)
+        self.template = CourseEmailTemplate.get_template()
+        self.context = {
+            'course_title': "Bogus course title",
+            'course_url': "/location/of/course/url",
+            'course_image_url': "/location/of/course/image/url",
+            'account_settings_url': "/location/of/account/settings/url",
+            'platform_name': 'edX',
+        }
+        self.recipients = [
+            {'name': u'Student {}'.format(index), 'email': 'student{}@example.com'.format(index)}
+            for index in range(self.EMAILS_PER_TASK)
+        ]
+        self.connections_opened = 0
+
+    def _open_connection(self):
+        """Open a connection to the dummy server."""
+        self.connections_opened += 1
+        connection = EmailBackend(host='127.0.0.1', port=self.server.port, username='', password='', use_tls=False)
+        connection.open()
+        return connection
+
+    def _messages(self, compile_templates):
+        """
+        Return a function returning the plain text and html messages for a recipient, rendered
+        from compiled templates, or from the whole templates for each message.
+        """
+        if not compile_templates:
+            def render(recipient):
+                """Render the whole templates."""
+                context = dict(self.context, **recipient)
+                return (
+                    self.template.render_plaintext('Plain text', context),
+                    self.template.render_htmltext('<p>HTML</p>', context),
+                )
+            return render
+
+        plaintext_template = self.template.compile_plaintext('Plain text', self.context)
+        html_template = self.template.compile_htmltext('<p>HTML</p>', self.context)
+        return lambda recipient: (plaintext_template.render(recipient), html_template.render(recipient))
+
+    def _send_task(self, pool, compile_templates=True):
+        """Send a task's email over a connection of `pool`."""
+        messages = self._messages(compile_templates)
+        connection = pool.get()
+        for recipient in self.recipients:
+            plaintext_msg, html_msg = messages(recipient)
+            email_msg = EmailMultiAlternatives('Subject', plaintext_msg, 'from@example.com', [recipient['email']],
+                                               connection=connection)
+            email_msg.attach_alternative(html_msg, 'text/html')
+            connection.send_messages([email_msg])
+        pool.release(connection)
+
+    def test_compiled_messages(self):
+        compiled = self._messages(compile_templates=True)
+        rendered = self._messages(compile_templates=False)
+        for recipient in self.recipients:
+            self.assertEqual(compiled(recipient), rendered(recipient))
+
+    def test_send(self):
+        pool = ConnectionPool(1, self._open_connection)
+        for _ in range(self.TASKS):
+            self._send_task(pool)
+        pool.close()
+
+        self.assertEqual(self.server.received, self.TASKS * self.EMAILS_PER_TASK)
+        # the tasks shared one connection
+        self.assertEqual(self.connections_opened, 1)
+
+
+@unittest.skipUnless(settings.FEATURES.get('RUN_BENCHMARKS'), "Benchmarks only run with RUN_BENCHMARKS set")
+class TestSendThroughput(TestSendWithCompiledTemplates):
+    """
+    Benchmark of sending a bulk email to a local SMTP server: the messages sent per second with
+    the whole templates rendered for each message or compiled once per task, and over a new
+    connection for each task or a pooled one.
+    """
+    TASKS = 5
+    EMAILS_PER_TASK = 100
+
+    def _messages_per_second(self, pool_size, compile_templates):
+        """Send the email of each task, and return the number of messages sent per second."""
+        pool = ConnectionPool(pool_size, self._open_connection)
+        start = time.time()
+        for _ in range(self.TASKS):
+            self._send_task(pool, compile_templates)
+        duration = time.time() - start
+        pool.close()
+        return self.TASKS * self.EMAILS_PER_TASK / duration
+
+    def test_send_throughput(self):
+        sys.stderr.write('\nSent {0} emails in {1} tasks:\n'.format(self.TASKS * self.EMAILS_PER_TASK, self.TASKS))
+        for pool_size, connection_name in [(0, 'a connection per task'), (1, 'a pooled connection')]:
+            for compile_templates, template_name in [(False, 'rendered per message'), (True, 'compiled')]:
+                rate = self._messages_per_second(pool_size, compile_templates)
+                sys.stderr.write('  {0:.0f} messages/s with templates {1}, over {2}\n'.format(
+                    rate, template_name, connection_name
+                ))
+
+        self.assertEqual(self.server.received, 4 * self.TASKS * self.EMAILS_PER_TASK)
@@ -103,6 +103,29 @@ class CourseEmailTemplateTest(TestCase):
         context = self._get_sample_plain_context()
         template.render_plaintext("My new plain text.", context)
 
+    def test_compile_without_context(self):
+        template = CourseEmailTemplate.get_template()
+        base_context = self._get_sample_html_context()
+        del base_context['email']
+        for keyname in base_context:
+            context = dict(base_context)
+            del context[keyname]
+            with self.assertRaises(KeyError):
+                template.compile_htmltext("My new html text.", context)
+
+    def test_compile(self):
+        template = CourseEmailTemplate.get_template()
+        context = self._get_sample_html_context()
+        recipient_context = {'name': u'Stud\xe9nt {name}', 'email': context.pop('email')}
+        plaintext_template = template.compile_plaintext(u"My {new} plain text.", context)
+        html_template = template.compile_htmltext(u"My {new} html text.", context)
+
+        context.update(recipient_context)
+        self.assertEquals(plaintext_template.render(recipient_context),
+                          template.render_plaintext(u"My {new} plain text.", context))
+        self.assertEquals(html_template.render(recipient_context),
+                          template.render_htmltext(u"My {new} html text.", context))
+
 
 class CourseAuthorizationTest(TestCase):
     """Test the CourseAuthorization model."""
@@ -31,8 +31,8 @@ from django.core.management import call_command
 from bulk_email.models import CourseEmail, Optout, SEND_TO_ALL
 
 from instructor_task.tasks import send_bulk_course_email
-from instructor_task.subtasks import update_subtask_status, SubtaskStatus
-from instructor_task.models import InstructorTask
+from instructor_task.subtasks import update_subtask_status, get_subtask_status
+from instructor_task.models import InstructorTask, InstructorSubtask
 from instructor_task.tests.test_base import InstructorTaskCourseTestCase
 from instructor_task.tests.factories import InstructorTaskFactory
 
@@ -60,10 +60,7 @@ def my_update_subtask_status(entry_id, current_task_id, new_subtask_status):
     This should not be an issue in production, where status is updated before
     a task is retried, and is then updated afterwards if the retry fails.
     """
-    entry = InstructorTask.objects.get(pk=entry_id)
-    subtask_dict = json.loads(entry.subtasks)
-    subtask_status_info = subtask_dict['status']
-    current_subtask_status = SubtaskStatus.from_dict(subtask_status_info[current_task_id])
+    current_subtask_status = get_subtask_status(entry_id, current_task_id)
     current_retry_count = current_subtask_status.get_retry_count()
     new_retry_count = new_subtask_status.get_retry_count()
     if current_retry_count <= new_retry_count:
@@ -147,20 +144,17 @@ class TestBulkEmailInstructorTask(InstructorTaskCourseTestCase):
         self.assertEquals(subtask_info.get('succeeded'), 1 if succeeded > 0 else 0)
         self.assertEquals(subtask_info.get('failed'), 0 if succeeded > 0 else 1)
         # verify individual subtask status:
-        subtask_status_info = subtask_info.get('status')
-        task_id_list = subtask_status_info.keys()
-        self.assertEquals(len(task_id_list), 1)
-        task_id = task_id_list[0]
-        subtask_status = subtask_status_info.get(task_id)
+        subtasks = InstructorSubtask.objects.filter(instructor_task=entry)
+        self.assertEquals(len(subtasks), 1)
+        subtask_status = subtasks[0]
         print("Testing subtask status: {}".format(subtask_status))
-        self.assertEquals(subtask_status.get('task_id'), task_id)
-        self.assertEquals(subtask_status.get('attempted'), succeeded + failed)
-        self.assertEquals(subtask_status.get('succeeded'), succeeded)
-        self.assertEquals(subtask_status.get('skipped'), skipped)
-        self.assertEquals(subtask_status.get('failed'), failed)
-        self.assertEquals(subtask_status.get('retried_nomax'), retried_nomax)
-        self.assertEquals(subtask_status.get('retried_withmax'), retried_withmax)
-        self.assertEquals(subtask_status.get('state'), SUCCESS if succeeded > 0 else FAILURE)
+        self.assertEquals(subtask_status.attempted, succeeded + failed)
+        self.assertEquals(subtask_status.succeeded, succeeded)
+        self.assertEquals(subtask_status.skipped, skipped)
+        self.assertEquals(subtask_status.failed, failed)
+        self.assertEquals(subtask_status.retried_nomax, retried_nomax)
+        self.assertEquals(subtask_status.retried_withmax, retried_withmax)
+        self.assertEquals(subtask_status.state, SUCCESS if succeeded > 0 else FAILURE)
 
     def _test_run_with_task(self, task_class, action_name, total, succeeded, failed=0, skipped=0, retried_nomax=0, retried_withmax=0):
         """Run a task and check the number of emails processed."""
@@ -8,7 +8,7 @@ from functools import partial
 from django.conf import settings
 from django.contrib.auth.models import Group
 
-from xmodule.course_module import CourseDescriptor
+from xmodule.course_module import CourseDescriptor, CourseSummary
 from xmodule.error_module import ErrorDescriptor
 from xmodule.modulestore import Location
 from xmodule.x_module import XModule, XModuleDescriptor
@@ -63,7 +63,7 @@ def has_access(user, obj, action, course_context=None):
     """
     # delegate the work to type-specific functions.
     # (start with more specific types, then get more general)
-    if isinstance(obj, CourseDescriptor):
+    if isinstance(obj, (CourseDescriptor, CourseSummary)):
         return _has_access_course_desc(user, obj, action)
 
     if isinstance(obj, ErrorDescriptor):
@@ -91,7 +91,7 @@ def has_access(user, obj, action, course_context=None):
 # ================ Implementation helpers ================================
 def _has_access_course_desc(user, course, action):
     """
-    Check if user has access to a course descriptor.
+    Check if user has access to a course descriptor (or its CourseSummary).
 
     Valid actions:
 
@@ -292,7 +292,7 @@ def get_courses_by_university(user, domain=None):
 
 def get_courses(user, domain=None):
     '''
-    Returns a list of courses available, sorted by course.number
+    Returns a list of the CourseSummaries of the courses available, sorted by course.number
     '''
     courses = branding.get_visible_courses(domain)
     courses = [c for c in courses if has_access(user, c, 'see_exists')]
@@ -1,15 +1,20 @@
 # Compute grades using real division, with no integer truncation
 from __future__ import division
 from collections import defaultdict
+from itertools import islice
+import hashlib
+import json
 import random
 import logging
 
 from contextlib import contextmanager
+from datetime import timedelta
 from collections import defaultdict
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.test.client import RequestFactory
+from django.utils import timezone
 
 from dogapi import dog_stats_api
 
@@ -19,11 +24,56 @@ from xblock.fields import Scope
 from xmodule import graders
 from xmodule.capa_module import CapaModule
 from xmodule.graders import Score
-from .models import StudentModule
+from .models import StudentModule, PersistentCourseGrade
 from .module_render import get_module, get_module_for_descriptor
 
 log = logging.getLogger("edx.courseware")
 
+# Number of students whose StudentModule scores are loaded together when
+# grading a whole course with iterate_grades_for.
+GRADING_CHUNK_SIZE = 200
+
+
+class StudentModuleScores(object):
+    """
+    In-memory table of the StudentModule grade and max_grade columns for a
+    group of students in one course.
+
+    Grading a student normally runs one query per section (to find out if it
+    was attempted at all) and one query per problem. When grading many
+    students at once, we load the score columns for the whole group in a
+    single query instead and answer those lookups from this table.
+    """
+    def __init__(self, course_id, students):
+        self.course_id = course_id
+        self._scores = defaultdict(dict)
+
+        student_ids = [student.id for student in students]
+        if not student_ids:
+            return
+
+        rows = StudentModule.objects.filter(
+            course_id=course_id,
+            student__in=student_ids,
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+
+        for student_id, module_state_key, grade, max_grade in rows.iterator():
+            self._scores[student_id][module_state_key] = (grade, max_grade)
+
+    def has_any(self, student, locations):
+        """
+        Return True if `student` has a StudentModule for any of `locations`.
+        """
+        student_scores = self._scores.get(student.id, {})
+        return any(location.url() in student_scores for location in locations)
+
+    def get(self, student, location):
+        """
+        Return the (grade, max_grade) tuple stored for `student` at `location`,
+        or None if the student has no StudentModule for it.
+        """
+        return self._scores.get(student.id, {}).get(location.url())
+
 
 def yield_module_descendents(module):
     stack = module.get_display_items()
@@ -128,16 +178,16 @@ def answer_distributions(request, course):
 
 
 @transaction.commit_manually
-def grade(student, request, course, keep_raw_scores=False):
+def grade(student, request, course, keep_raw_scores=False, scores_cache=None):
     """
     Wraps "_grade" with the manual_transaction context manager just in case
     there are unanticipated errors.
     """
     with manual_transaction():
-        return _grade(student, request, course, keep_raw_scores)
+        return _grade(student, request, course, keep_raw_scores, scores_cache)
 
 
-def _grade(student, request, course, keep_raw_scores):
+def _grade(student, request, course, keep_raw_scores, scores_cache=None):
     """
     Unwrapped version of "grade"
 
@@ -156,6 +206,9 @@ def _grade(student, request, course, keep_raw_scores):
     - keep_raw_scores : if True, then value for key 'raw_scores' contains scores
       for every graded module
 
+    If `scores_cache` (a StudentModuleScores that includes this student) is
+    given, StudentModule scores are read from it rather than from the database.
+
     More information on the format is in the docstring for CourseGrader.
     """
     grading_context = course.grading_context
@@ -178,7 +231,12 @@ def _grade(student, request, course, keep_raw_scores):
             )
 
             # If we haven't seen a single problem in the section, we don't have to grade it at all! We can assume 0%
-            if not should_grade_section:
+            if not should_grade_section and scores_cache is not None:
+                should_grade_section = scores_cache.has_any(
+                    student,
+                    [descriptor.location for descriptor in section['xmoduledescriptors']]
+                )
+            elif not should_grade_section:
                 with manual_transaction():
                     should_grade_section = StudentModule.objects.filter(
                         student=student,
@@ -200,7 +258,9 @@ def _grade(student, request, course, keep_raw_scores):
 
                 for module_descriptor in yield_dynamic_descriptor_descendents(section_descriptor, create_module):
 
-                    (correct, total) = get_score(course.id, student, module_descriptor, create_module)
+                    (correct, total) = get_score(
+                        course.id, student, module_descriptor, create_module, scores_cache
+                    )
                     if correct is None and total is None:
                         continue
 
@@ -247,6 +307,186 @@ def _grade(student, request, course, keep_raw_scores):
     return grade_summary
 
 
+def grading_structure_version(course):
+    """
+    Return a string that identifies everything in `course` that grades depend
+    on: the grading policy, and the graded sections with their problems, their
+    content (which problem scores are computed from), weights and start dates.
+    Persisted grades computed for another version are stale.
+    """
+    structure = [course.raw_grader, course.grade_cutoffs]
+    for section_format, sections in sorted(course.grading_context['graded_sections'].iteritems()):
+        for section in sections:
+            section_descriptor = section['section_descriptor']
+            structure.append([
+                section_format,
+                section_descriptor.location.url(),
+                section_descriptor.start,
+                [
+                    (
+                        descriptor.location.url(),
+                        descriptor.weight,
+                        descriptor.graded,
+                        descriptor.start,
+                        descriptor.get_explicitly_set_fields_by_scope(Scope.content),
+                    )
+                    for descriptor in section['xmoduledescriptors']
+                ],
+            ])
+    return hashlib.md5(json.dumps(structure, sort_keys=True, default=unicode)).hexdigest()
+
+
+def _grades_valid_since(course):
+    """
+    Return the time before which persisted grades of `course` are out of date,
+    although its version didn't change: which problems a student can be graded
+    on changes as the start dates of the graded sections and problems (or the
+    earlier ones of beta testers) pass, and as course access is granted or
+    revoked, so persisted grades are kept for PERSISTED_GRADES_MAX_AGE at most.
+    """
+    now = timezone.now()
+    valid_since = now - timedelta(seconds=settings.PERSISTED_GRADES_MAX_AGE)
+    descriptors = [course]
+    for sections in course.grading_context['graded_sections'].itervalues():
+        for section in sections:
+            descriptors.append(section['section_descriptor'])
+            descriptors.extend(section['xmoduledescriptors'])
+
+    for descriptor in descriptors:
+        if descriptor.start is None:
+            continue
+        starts = [descriptor.start]
+        if descriptor.days_early_for_beta is not None:
+            starts.append(descriptor.start - timedelta(descriptor.days_early_for_beta))
+        valid_since = max([valid_since] + [start for start in starts if start <= now])
+    return valid_since
+
+
+def _can_persist_grades(course):
+    """
+    Grades can only be persisted for courses whose scores all change through
+    the XModule `publish` callback. Problems that always recalculate their
+    grades (e.g. foldit, combinedopenended) are updated outside of the LMS.
+    """
+    return not any(
+        descriptor.always_recalculate_grades
+        for descriptor in course.grading_context['all_descriptors']
+    )
+
+
+def _load_gradeset(serialized):
+    """
+    Deserialize a gradeset stored by `persist_grades`, restoring the
+    totaled_scores to `Score`s.
+    """
+    gradeset = json.loads(serialized)
+    gradeset['totaled_scores'] = {
+        section_format: [Score(*score) for score in scores]
+        for section_format, scores in gradeset['totaled_scores'].iteritems()
+    }
+    return gradeset
+
+
+def get_persisted_grades(course, students, version=None):
+    """
+    Read the persisted grades of `students` with a single query.
+
+    Returns a dict mapping student id to the persisted, up to date gradeset of
+    each of `students` that has one, and a dict mapping the id of each of the
+    others to the generation of their persisted grade, to pass to
+    `persist_grades` once their grade is computed. A stale persisted grade is
+    created for the students without one, so that invalidating it while the
+    grade is computed is noticed too. Persisted grades of another `version`,
+    or stored before `_grades_valid_since` the course, are out of date.
+    """
+    if version is None:
+        version = grading_structure_version(course)
+    valid_since = _grades_valid_since(course)
+
+    student_ids = [student.id for student in students]
+    gradesets = {}
+    generations = {}
+    persisted = PersistentCourseGrade.objects.filter(
+        course_id=course.id,
+        user__in=student_ids,
+    ).values_list('user_id', 'course_version', 'is_stale', 'gradeset', 'generation', 'updated')
+    for user_id, course_version, is_stale, gradeset, generation, updated in persisted:
+        if course_version == version and not is_stale and updated > valid_since:
+            gradesets[user_id] = _load_gradeset(gradeset)
+        else:
+            generations[user_id] = generation
+
+    missing = [
+        student_id for student_id in student_ids
+        if student_id not in gradesets and student_id not in generations
+    ]
+    if missing:
+        savepoint = transaction.savepoint()
+        try:
+            PersistentCourseGrade.objects.bulk_create([
+                PersistentCourseGrade(user_id=student_id, course_id=course.id, course_version='', is_stale=True)
+                for student_id in missing
+            ])
+        except IntegrityError:
+            # Another process persisted some of them at the same time: their grades
+            # are left for the next read to persist.
+            transaction.savepoint_rollback(savepoint)
+        else:
+            transaction.savepoint_commit(savepoint)
+            generations.update((student_id, 0) for student_id in missing)
+
+    return gradesets, generations
+
+
+def persist_grades(student, course, gradeset, generation, version=None):
+    """
+    Store the gradeset (as returned by `grade` without raw scores) of
+    `student` in `course`, unless their persisted grade was invalidated since
+    `generation` (as returned by `get_persisted_grades`) was read: one of the
+    scores it was computed from may have changed since, so it's left stale.
+
+    Returns whether the gradeset was stored.
+    """
+    if generation is None:
+        return False
+    if version is None:
+        version = grading_structure_version(course)
+
+    return PersistentCourseGrade.objects.filter(
+        user=student, course_id=course.id, generation=generation
+    ).update(
+        course_version=version,
+        gradeset=json.dumps(gradeset),
+        is_stale=False,
+        updated=timezone.now(),
+    ) > 0
+
+
+@transaction.commit_manually
+def cached_grade(student, request, course, scores_cache=None):
+    """
+    Return the same gradeset as `grade`, from the student's persisted grade
+    summary if it is up to date. Otherwise the grade is computed and persisted.
+
+    Persisted grades are marked stale whenever one of the student's scores is
+    published, so this only recomputes a grade after it may have changed.
+    """
+    if not _can_persist_grades(course):
+        return grade(student, request, course, scores_cache=scores_cache)
+
+    version = grading_structure_version(course)
+    with manual_transaction():
+        gradesets, generations = get_persisted_grades(course, [student], version)
+
+    gradeset = gradesets.get(student.id)
+    if gradeset is None:
+        gradeset = grade(student, request, course, scores_cache=scores_cache)
+        with manual_transaction():
+            persist_grades(student, course, gradeset, generations.get(student.id), version)
+
+    return gradeset
+
+
 def grade_for_percentage(grade_cutoffs, percentage):
     """
     Returns a letter grade as defined in grading_policy (e.g. 'A' 'B' 'C' for 6.002x) or None.
@@ -366,7 +606,7 @@ def _progress_summary(student, request, course):
 
     return chapters
 
-def get_score(course_id, user, problem_descriptor, module_creator):
+def get_score(course_id, user, problem_descriptor, module_creator, scores_cache=None):
     """
     Return the score for a user on a problem, as a tuple (correct, total).
     e.g. (5,7) if you got 5 out of 7 points.
@@ -378,7 +618,8 @@ def get_score(course_id, user, problem_descriptor, module_creator):
     problem_descriptor: an XModuleDescriptor
     module_creator: a function that takes a descriptor, and returns the corresponding XModule for this user.
            Can return None if user doesn't have access, or if something else went wrong.
-    cache: A FieldDataCache
+    scores_cache: an optional StudentModuleScores to read the stored grade from,
+           instead of querying StudentModule
     """
     if not user.is_authenticated():
         return (None, None)
@@ -399,18 +640,22 @@ def get_score(course_id, user, problem_descriptor, module_creator):
         # These are not problems, and do not have a score
         return (None, None)
 
-    try:
-        student_module = StudentModule.objects.get(
-            student=user,
-            course_id=course_id,
-            module_state_key=problem_descriptor.location
-        )
-    except StudentModule.DoesNotExist:
-        student_module = None
+    if scores_cache is not None:
+        stored_score = scores_cache.get(user, problem_descriptor.location)
+    else:
+        try:
+            student_module = StudentModule.objects.get(
+                student=user,
+                course_id=course_id,
+                module_state_key=problem_descriptor.location
+            )
+            stored_score = (student_module.grade, student_module.max_grade)
+        except StudentModule.DoesNotExist:
+            stored_score = None
 
-    if student_module is not None and student_module.max_grade is not None:
-        correct = student_module.grade if student_module.grade is not None else 0
-        total = student_module.max_grade
+    if stored_score is not None and stored_score[1] is not None:
+        correct = stored_score[0] if stored_score[0] is not None else 0
+        total = stored_score[1]
     else:
         # If the problem was not in the cache, or hasn't been graded yet,
         # we need to instantiate the problem.
@@ -431,7 +676,7 @@ def get_score(course_id, user, problem_descriptor, module_creator):
     weight = problem_descriptor.weight
     if weight is not None:
         if total == 0:
-            log.exception("Cannot reweight a problem with zero total points. Problem: " + str(student_module))
+            log.exception("Cannot reweight a problem with zero total points. Problem: " + str(problem_descriptor.location))
             return (correct, total)
         correct = correct * weight / total
         total = weight
@@ -452,11 +697,47 @@ def manual_transaction():
         transaction.commit()
 
 
-def iterate_grades_for(course_id, students):
+def _chunks(iterable, chunk_size):
+    """Yield successive lists of at most `chunk_size` items from `iterable`."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def section_breakdown_labels(course):
+    """
+    Return the labels of the entries of the section_breakdown of the grades of
+    `course` (see `grade`). They only depend on the grading policy and the graded
+    sections of the course, so are the same for all students.
+    """
+    totaled_scores = {}
+    for section_format, sections in course.grading_context['graded_sections'].iteritems():
+        totaled_scores[section_format] = [
+            Score(0.0, 1.0, True, section['section_descriptor'].display_name_with_default)
+            for section in sections
+        ]
+    grade_summary = course.grader.grade(totaled_scores)
+    return [section['label'] for section in grade_summary['section_breakdown']]
+
+
+def iterate_grades_for(course_id, students, chunk_size=GRADING_CHUNK_SIZE, use_persisted=False):
     """Given a course_id and an iterable of students (User), yield a tuple of:
 
     (student, gradeset, err_msg) for every student enrolled in the course.
 
+    Students are graded in groups of `chunk_size`, loading the StudentModule
+    scores for the whole group with a single query. XModules are then only
+    instantiated for problems that always recalculate their grades, or that
+    have no stored max_grade. Pass a `chunk_size` of None to grade each
+    student independently.
+
+    If `use_persisted` is True, up to date persisted grades are returned as
+    they are, and newly computed grades are persisted (see `cached_grade`).
+    Persisted grades don't include raw_scores.
+
     If an error occured, gradeset will be an empty dict and err_msg will be an
     exception message. If there was no error, err_msg is an empty string.
 
@@ -477,25 +758,49 @@ def iterate_grades_for(course_id, students):
     # grading that student.
     request = RequestFactory().get('/')
 
-    for student in students:
-        with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=['action:{}'.format(course_id)]):
-            try:
-                request.user = student
-                # Grading calls problem rendering, which calls masquerading,
-                # which checks session vars -- thus the empty session dict below.
-                # It's not pretty, but untangling that is currently beyond the
-                # scope of this feature.
-                request.session = {}
-                gradeset = grade(student, request, course)
-                yield student, gradeset, ""
-            except Exception as exc:  # pylint: disable=broad-except
-                # Keep marching on even if this student couldn't be graded for
-                # some reason, but log it for future reference.
-                log.exception(
-                    'Cannot grade student %s (%s) in course %s because of exception: %s',
-                    student.username,
-                    student.id,
-                    course_id,
-                    exc.message
-                )
-                yield student, {}, exc.message
+    use_persisted = use_persisted and _can_persist_grades(course)
+    version = grading_structure_version(course) if use_persisted else None
+
+    if chunk_size:
+        student_groups = _chunks(students, chunk_size)
+    else:
+        student_groups = ([student] for student in students)
+
+    for student_group in student_groups:
+        if use_persisted:
+            persisted, generations = get_persisted_grades(course, student_group, version)
+        else:
+            persisted, generations = {}, {}
+        if chunk_size:
+            scores_cache = StudentModuleScores(
+                course_id, [student for student in student_group if student.id not in persisted]
+            )
+        else:
+            scores_cache = None
+
+        for student in student_group:
+            with dog_stats_api.timer('lms.grades.iterate_grades_for', tags=['action:{}'.format(course_id)]):
+                try:
+                    request.user = student
+                    # Grading calls problem rendering, which calls masquerading,
+                    # which checks session vars -- thus the empty session dict below.
+                    # It's not pretty, but untangling that is currently beyond the
+                    # scope of this feature.
+                    request.session = {}
+                    gradeset = persisted.get(student.id)
+                    if gradeset is None:
+                        gradeset = grade(student, request, course, scores_cache=scores_cache)
+                        if use_persisted:
+                            persist_grades(student, course, gradeset, generations.get(student.id), version)
+                    yield student, gradeset, ""
+                except Exception as exc:  # pylint: disable=broad-except
+                    # Keep marching on even if this student couldn't be graded for
+                    # some reason, but log it for future reference.
+                    log.exception(
+                        'Cannot grade student %s (%s) in course %s because of exception: %s',
+                        student.username,
+                        student.id,
+                        course_id,
+                        exc.message
+                    )
+                    yield student, {}, exc.message
@@ -18,6 +18,8 @@ import traceback
 from django.core.management.base import NoArgsCommand
 from django.db import connection
 
+from courseware.models import StudentModuleHistory
+
 
 class Command(NoArgsCommand):
     """The actual clean_history command to clean history rows."""
@@ -187,6 +189,21 @@ class StudentModuleHistoryCleaner(object):
         history = cursor.fetchall()
         return history
 
+    def get_snapshot_ids(self, student_module_id):
+        """
+        Get the ids of the history rows of a student module that delta encoded
+        rows are diffs against, and so can't be deleted.
+
+        """
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT state FROM courseware_studentmodulehistory
+            WHERE student_module_id = %s AND state LIKE %s
+            """,
+            [student_module_id, StudentModuleHistory.DELTA_PREFIX + '%']
+        )
+        return set(StudentModuleHistory.delta_snapshot_id(state) for state, in cursor.fetchall())
+
     def delete_history(self, ids_to_delete):
         """
         Delete history rows.
@@ -227,6 +244,9 @@ class StudentModuleHistoryCleaner(object):
 
             next_created = created
 
+        snapshot_ids = self.get_snapshot_ids(student_module_id)
+        ids_to_delete = [history_id for history_id in ids_to_delete if history_id not in snapshot_ids]
+
         verb = "Would have deleted" if self.dry_run else "Deleting"
         self.say("{verb} {to_delete} rows of {total} for student_module_id {id}".format(
             verb=verb,
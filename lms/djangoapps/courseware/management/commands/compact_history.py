@@ -0,0 +1,152 @@
+"""A command to compact the StudentModuleHistory table.
+
+Rewrites the full states of history rows as compressed diffs against periodic
+full snapshots, the way they are stored with the ENABLE_STUDENT_HISTORY_DELTAS
+feature. Readers reconstruct the full states with
+StudentModuleHistory.with_full_states.
+
+"""
+
+import json
+import logging
+import optparse
+import time
+
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from django.db.models import Max
+
+from courseware.models import StudentModule, StudentModuleHistory, diff_states
+
+
+class Command(NoArgsCommand):
+    """The actual compact_history command to compact history rows."""
+
+    help = "Rewrites StudentModuleHistory rows as diffs against periodic snapshots."
+
+    option_list = NoArgsCommand.option_list + (
+        optparse.make_option(
+            '--batch',
+            type='int',
+            default=100,
+            help="Batch size, range of student_module_ids to compact in a transaction.",
+        ),
+        optparse.make_option(
+            '--start',
+            type='int',
+            default=0,
+            help="The student_module_id to start from, to resume an earlier run.",
+        ),
+        optparse.make_option(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help="Don't change the database, just show what would be done.",
+        ),
+        optparse.make_option(
+            '--sleep',
+            type='float',
+            default=0,
+            help="Seconds to sleep between batches.",
+        ),
+    )
+
+    def handle_noargs(self, **options):
+        # We don't want to see the SQL output from the db layer.
+        logging.getLogger("django.db.backends").setLevel(logging.INFO)
+
+        smhc = StudentModuleHistoryCompactor(dry_run=options["dry_run"])
+        smhc.main(start=options["start"], batch_size=options["batch"], sleep=options["sleep"])
+
+
+class StudentModuleHistoryCompactor(object):
+    """Logic to compact rows of the StudentModuleHistory table."""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows_rewritten = 0
+        self.bytes_saved = 0
+
+    def main(self, start=0, batch_size=100, sleep=0):
+        """Invoked from the management command to do all the work."""
+        last_student_module_id = StudentModuleHistory.objects.aggregate(
+            Max('student_module')
+        )['student_module__max']
+        if last_student_module_id is None:
+            self.say("No history to compact")
+            return
+
+        for batch_start in xrange(start, last_student_module_id + 1, batch_size):
+            student_module_ids = StudentModuleHistory.objects.filter(
+                student_module__gte=batch_start, student_module__lt=batch_start + batch_size
+            ).values_list('student_module', flat=True).distinct()
+
+            with transaction.commit_on_success():
+                for student_module_id in sorted(set(student_module_ids)):
+                    self.compact_one_student_module(student_module_id)
+
+            self.say("Compacted student_module_ids up to {last}: {verb} {rows} rows, saving {size} bytes".format(
+                last=batch_start + batch_size - 1,
+                verb="would have rewritten" if self.dry_run else "rewrote",
+                rows=self.rows_rewritten,
+                size=self.bytes_saved,
+            ))
+            if sleep:
+                time.sleep(sleep)
+
+    def say(self, message):
+        """
+        Display a message to the user.
+
+        The message will have a trailing newline added to it.
+
+        """
+        print message
+
+    def compact_one_student_module(self, student_module_id):
+        """Compact one StudentModule's-worth of history.
+
+        The full rows which existing diffs apply to are kept as snapshots, as are
+        the ones which can't be diffed (e.g. without a state), and one row in
+        every StudentModuleHistory.SNAPSHOT_INTERVAL.
+
+        `student_module_id`: the id of the StudentModule to process.
+
+        """
+        # lock the student module, so that no history is written for it meanwhile
+        list(StudentModule.objects.select_for_update().filter(id=student_module_id).values_list('id'))
+
+        entries = list(StudentModuleHistory.objects.filter(student_module=student_module_id).order_by('id'))
+        stored_states = dict((entry.id, entry.state) for entry in entries)
+        referenced_ids = set(
+            StudentModuleHistory.delta_snapshot_id(state)
+            for state in stored_states.itervalues() if StudentModuleHistory.is_delta(state)
+        )
+
+        snapshot_id = snapshot = None
+        diffs_since_snapshot = 0
+        for entry in StudentModuleHistory.with_full_states(entries):
+            stored_state = stored_states[entry.id]
+            if StudentModuleHistory.is_delta(stored_state):
+                diffs_since_snapshot += 1
+                continue
+
+            try:
+                state = json.loads(stored_state) if stored_state is not None else None
+            except ValueError:
+                state = None
+            if not isinstance(state, dict):
+                continue
+
+            if (snapshot is None or entry.id in referenced_ids or
+                    diffs_since_snapshot >= StudentModuleHistory.SNAPSHOT_INTERVAL - 1):
+                snapshot_id, snapshot = entry.id, state
+                diffs_since_snapshot = 0
+                continue
+
+            compact_state = StudentModuleHistory.encode_delta(snapshot_id, diff_states(snapshot, state))
+            diffs_since_snapshot += 1
+            self.rows_rewritten += 1
+            self.bytes_saved += len(stored_state) - len(compact_state)
+            if not self.dry_run:
+                StudentModuleHistory.objects.filter(id=entry.id).update(state=compact_state)
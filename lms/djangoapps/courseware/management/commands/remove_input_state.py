@@ -11,7 +11,7 @@ from optparse import make_option
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from courseware.models import StudentModule, StudentModuleHistory
+from courseware.models import StudentModule, StudentModuleHistory, diff_states
 
 LOG = logging.getLogger(__name__)
 
@@ -72,9 +72,8 @@ class Command(BaseCommand):
                 continue
             self.remove_studentmodule_input_state(module, save_changes)
 
-            hist_modules = StudentModuleHistory.objects.filter(student_module_id=student_module_id)
-            for hist_module in hist_modules:
-                self.remove_studentmodulehistory_input_state(hist_module, save_changes)
+            hist_modules = StudentModuleHistory.objects.filter(student_module_id=student_module_id).order_by('id')
+            self.remove_studentmodulehistory_input_state(module, hist_modules, save_changes)
 
             if self.num_visited % 1000 == 0:
                 LOG.info(" Progress: updated {0} of {1} student modules".format(self.num_changed, self.num_visited))
@@ -107,31 +106,57 @@ class Command(BaseCommand):
             # don't make the change, but increment the count indicating the change would be made
             self.num_changed += 1
 
-    @transaction.autocommit
-    def remove_studentmodulehistory_input_state(self, module, save_changes):
-        ''' Fix the grade assigned to a StudentModule'''
-        module_state = module.state
-        if module_state is None:
-            # not likely, since we filter on it.  But in general...
-            LOG.info("No state found for {type} module {id} for student {student} in course {course_id}"
-                     .format(type=module.module_type, id=module.module_state_key,
-                             student=module.student.username, course_id=module.course_id))
-            return
-
-        state_dict = json.loads(module_state)
-        self.num_hist_visited += 1
-
-        if 'input_state' not in state_dict:
-            pass
-        elif save_changes:
-            # make the change and persist
-            del state_dict['input_state']
-            module.state = json.dumps(state_dict)
-            module.save()
-            self.num_hist_changed += 1
-        else:
-            # don't make the change, but increment the count indicating the change would be made
-            self.num_hist_changed += 1
+    @transaction.commit_on_success
+    def remove_studentmodulehistory_input_state(self, module, hist_modules, save_changes):
+        '''
+        Fix the history of a StudentModule.
+
+        Diffs (see StudentModuleHistory.encode_state) are taken against the states of their snapshots,
+        so removing input_state from a snapshot changes what its diffs apply to: the whole history
+        of the module is rebuilt, and each diff is taken again against its fixed snapshot.
+        '''
+        hist_modules = list(hist_modules)
+        encoded_states = dict((hist_module.id, hist_module.state) for hist_module in hist_modules)
+        fixed_states = {}
+        for hist_module in StudentModuleHistory.with_full_states(hist_modules):
+            if hist_module.state is None:
+                # not likely, since we filter on it.  But in general...
+                LOG.info("No state found for {type} module {id} for student {student} in course {course_id}"
+                         .format(type=module.module_type, id=module.module_state_key,
+                                 student=module.student.username, course_id=module.course_id))
+                continue
+            state_dict = json.loads(hist_module.state)
+            if isinstance(state_dict, dict):
+                changed = 'input_state' in state_dict
+                state_dict.pop('input_state', None)
+                fixed_states[hist_module.id] = (changed, state_dict)
+
+        for hist_module in hist_modules:
+            if hist_module.id not in fixed_states:
+                continue
+            self.num_hist_visited += 1
+            changed, state_dict = fixed_states[hist_module.id]
+            encoded_state = encoded_states[hist_module.id]
+            if StudentModuleHistory.is_delta(encoded_state):
+                snapshot_id = StudentModuleHistory.delta_snapshot_id(encoded_state)
+                if snapshot_id not in fixed_states:
+                    continue
+                snapshot_changed, snapshot_dict = fixed_states[snapshot_id]
+                changed = changed or snapshot_changed
+                new_state = StudentModuleHistory.encode_delta(snapshot_id, diff_states(snapshot_dict, state_dict))
+            else:
+                new_state = json.dumps(state_dict)
+
+            if not changed:
+                pass
+            elif save_changes:
+                # make the change and persist
+                hist_module.state = new_state
+                hist_module.save()
+                self.num_hist_changed += 1
+            else:
+                # don't make the change, but increment the count indicating the change would be made
+                self.num_hist_changed += 1
 
     def handle(self, *args, **options):
         '''Handle management command request'''
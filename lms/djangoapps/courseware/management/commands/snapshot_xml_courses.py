@@ -0,0 +1,49 @@
+"""
+Write snapshots of the xml courses, which XMLModuleStores configured with
+a snapshot_dir load instead of parsing the xml of the courses which haven't
+changed since.
+"""
+from optparse import make_option
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.xml import XMLModuleStore
+
+
+class Command(BaseCommand):
+    """
+    Write snapshots of the courses of the xml modulestores.
+    """
+    help = dedent(__doc__).strip()
+    option_list = BaseCommand.option_list + (
+        make_option('--modulestore',
+                    action='store',
+                    default='default',
+                    help='Name of the modulestore whose xml courses to snapshot'),
+        make_option('--snapshot_dir',
+                    action='store',
+                    default=None,
+                    help="Directory to write the snapshots to. Defaults to the stores' snapshot_dir"),
+    )
+
+    def handle(self, *args, **options):
+        try:
+            name = options['modulestore']
+            store = modulestore(name)
+        except KeyError:
+            raise CommandError("Unknown modulestore {}".format(name))
+
+        # a mixed modulestore may have xml stores among its stores
+        stores = getattr(store, 'modulestores', {'': store}).values()
+        xml_stores = [substore for substore in stores if isinstance(substore, XMLModuleStore)]
+        if not xml_stores:
+            raise CommandError("Modulestore {} has no xml courses".format(name))
+
+        for xml_store in xml_stores:
+            snapshot_dir = options['snapshot_dir'] or xml_store.snapshot_dir
+            if snapshot_dir is None:
+                raise CommandError("No --snapshot_dir given, and the store has no snapshot_dir")
+            for course_dir in xml_store.write_snapshots(snapshot_dir):
+                self.stdout.write("Wrote the snapshot of {}\n".format(course_dir))
@@ -337,6 +337,26 @@ class HistoryCleanerWitDbTest(HistoryCleanerTest):
             (50, "2013-07-13 16:30:02.500", 11),    # keep
         ])
 
+    def test_snapshots_of_diffs_are_kept(self):
+        # Rows which delta encoded history rows apply to are never deleted.
+        smhc = SmhcSayStubbed()
+        self.write_history([
+            ( 4, "2013-07-13 16:30:00.000", 11),    # keep
+            ( 8, "2013-07-13 16:30:01.100", 11),    # keep, snapshot
+            (15, "2013-07-13 16:30:01.200", 11),
+            (16, "2013-07-13 16:30:01.300", 11),    # keep
+        ])
+        cursor = connection.cursor()
+        cursor.execute("UPDATE courseware_studentmodulehistory SET state = 'delta:8:eJyrrgUAAXUA+Q==' WHERE id = 16")
+
+        smhc.clean_one_student_module(11)
+        self.assert_said(smhc, "Deleting 1 rows of 4 for student_module_id 11")
+        self.assert_history([
+            ( 4, "2013-07-13 16:30:00.000", 11),    # keep
+            ( 8, "2013-07-13 16:30:01.100", 11),    # keep, snapshot
+            (16, "2013-07-13 16:30:01.300", 11),    # keep
+        ])
+
     def test_get_last_student_module(self):
         # Can we find the last student_module_id properly?
         smhc = SmhcSayStubbed()
@@ -0,0 +1,93 @@
+"""Test the compact_history management command."""
+
+import json
+
+from django.conf import settings
+from django.test import TestCase
+from mock import patch
+
+from courseware.management.commands.compact_history import StudentModuleHistoryCompactor
+from courseware.models import StudentModuleHistory
+from courseware.tests.factories import StudentModuleFactory
+
+
+class SmhcSayStubbed(StudentModuleHistoryCompactor):
+    """StudentModuleHistoryCompactor, but with .say() stubbed for testing."""
+    def __init__(self, **kwargs):
+        super(SmhcSayStubbed, self).__init__(**kwargs)
+        self.said_lines = []
+
+    def say(self, msg):
+        self.said_lines.append(msg)
+
+
+class HistoryCompactorTest(TestCase):
+    """Tests of StudentModuleHistoryCompactor."""
+
+    def setUp(self):
+        self.student_module = StudentModuleFactory(state=json.dumps({'attempts': 0, 'seed': 1}))
+
+    def submit(self, count):
+        """Save `count` more states of the student module."""
+        for _ in range(count):
+            state = json.loads(self.student_module.state)
+            state['attempts'] += 1
+            self.student_module.state = json.dumps(state)
+            self.student_module.save()
+
+    def history(self):
+        """Return the stored history entries of the student module."""
+        return list(StudentModuleHistory.objects.filter(student_module=self.student_module).order_by('id'))
+
+    def full_states(self):
+        """Return the full states of the history of the student module."""
+        return [entry.state for entry in StudentModuleHistory.with_full_states(self.history())]
+
+    def snapshot_indices(self):
+        """Return the positions of the full snapshots in the history."""
+        return [
+            index for index, entry in enumerate(self.history())
+            if not StudentModuleHistory.is_delta(entry.state)
+        ]
+
+    def test_no_history(self):
+        StudentModuleHistory.objects.all().delete()
+        smhc = SmhcSayStubbed()
+        smhc.main()
+        self.assertEqual(smhc.said_lines, ["No history to compact"])
+
+    def test_compact(self):
+        self.submit(2 * StudentModuleHistory.SNAPSHOT_INTERVAL)
+        states = self.full_states()
+
+        smhc = SmhcSayStubbed()
+        smhc.main(batch_size=1000)
+        self.assertEqual(self.snapshot_indices(), [0, 10, 20])
+        self.assertEqual(self.full_states(), states)
+        self.assertEqual(smhc.rows_rewritten, 18)
+        self.assertGreater(smhc.bytes_saved, 0)
+
+        # compacting again changes nothing
+        smhc = SmhcSayStubbed()
+        smhc.main(batch_size=1000)
+        self.assertEqual(smhc.rows_rewritten, 0)
+
+    def test_dry_run(self):
+        self.submit(5)
+        smhc = SmhcSayStubbed(dry_run=True)
+        smhc.main(batch_size=1000)
+        self.assertEqual(smhc.rows_rewritten, 5)
+        self.assertEqual(self.snapshot_indices(), range(6))
+
+    def test_partly_compacted(self):
+        self.submit(3)
+        with patch.dict(settings.FEATURES, {'ENABLE_STUDENT_HISTORY_DELTAS': True}):
+            self.submit(3)
+        self.submit(3)
+        states = self.full_states()
+        self.assertEqual(self.snapshot_indices(), [0, 1, 2, 3, 7, 8, 9])
+
+        SmhcSayStubbed().main(batch_size=1000)
+        # the snapshot the existing diffs apply to is kept
+        self.assertEqual(self.snapshot_indices(), [0, 3])
+        self.assertEqual(self.full_states(), states)
@@ -2,6 +2,7 @@
 Classes to provide the LMS runtime data storage to XBlocks
 """
 
+import copy
 import json
 from collections import defaultdict
 from itertools import chain
@@ -57,6 +58,8 @@ class FieldDataCache(object):
         select_for_update: True if rows should be locked until end of transaction
         '''
         self.cache = {}
+        # maps the module_state_key of cached StudentModules to (student_module, state json, decoded state)
+        self._states = {}
         self.descriptors = descriptors
         self.select_for_update = select_for_update
         self.course_id = course_id
@@ -263,6 +266,39 @@ class FieldDataCache(object):
         self.cache[cache_key] = field_object
         return field_object
 
+    def get_state(self, student_module):
+        """
+        Return the decoded state of `student_module`, a StudentModule in this cache.
+
+        The state is only decoded again if the StudentModule's state has been replaced since,
+        so changes made to the returned dict are kept until `encode_state` is called. The dict
+        is shared by every block using this cache, so values read from it which blocks may
+        change in place must be copied (see `DjangoKeyValueStore.get`).
+        """
+        cached = self._states.get(student_module.module_state_key)
+        if cached is not None and cached[0] is student_module and cached[1] is student_module.state:
+            return cached[2]
+
+        state = json.loads(student_module.state)
+        self._states[student_module.module_state_key] = (student_module, student_module.state, state)
+        return state
+
+    def encode_state(self, student_module):
+        """
+        Encode the decoded state of `student_module` (see `get_state`) into its `state`.
+
+        Returns whether the state changed, and so whether the StudentModule needs to be saved.
+        """
+        state_json = json.dumps(self.get_state(student_module))
+        if state_json == student_module.state:
+            return False
+
+        student_module.state = state_json
+        self._states[student_module.module_state_key] = (
+            student_module, state_json, self._states[student_module.module_state_key][2]
+        )
+        return True
+
 
 class DjangoKeyValueStore(KeyValueStore):
     """
@@ -302,7 +338,10 @@ class DjangoKeyValueStore(KeyValueStore):
             raise KeyError(key.field_name)
 
         if key.scope == Scope.user_state:
-            return json.loads(field_object.state)[key.field_name]
+            # Each read gets its own copy of the value, like it did when the state was decoded for
+            # each read: values such as student_answers are changed in place by the blocks, which
+            # must not change the shared state until they're set.
+            return copy.deepcopy(self._field_data_cache.get_state(field_object)[key.field_name])
         else:
             return json.loads(field_object.value)
 
@@ -319,10 +358,13 @@ class DjangoKeyValueStore(KeyValueStore):
         `kv_dict`: A dictionary of dirty fields that maps
           xblock.DbModel._key : value
 
+        Rows whose stored value doesn't change are not saved.
         """
         saved_fields = []
         # field_objects maps a field_object to a list of associated fields
         field_objects = dict()
+        # the field objects whose value changed
+        changed_objects = set()
         for field in kv_dict:
             # Check field for validity
             if field.scope not in self._allowed_scopes:
@@ -330,25 +372,32 @@ class DjangoKeyValueStore(KeyValueStore):
 
             # If the field is valid and isn't already in the dictionary, add it.
             field_object = self._field_data_cache.find_or_create(field)
-            if field_object not in field_objects.keys():
+            if field_object not in field_objects:
                 field_objects[field_object] = []
             # Update the list of associated fields
             field_objects[field_object].append(field)
 
-            # Special case when scope is for the user state, because this scope saves fields in a single row
+            # Special case when scope is for the user state, because this scope saves fields in a single row,
+            # which is encoded once all its fields have been set
             if field.scope == Scope.user_state:
-                state = json.loads(field_object.state)
-                state[field.field_name] = kv_dict[field]
-                field_object.state = json.dumps(state)
+                self._field_data_cache.get_state(field_object)[field.field_name] = copy.deepcopy(kv_dict[field])
             else:
             # The remaining scopes save fields on different rows, so
             # we don't have to worry about conflicts
-                field_object.value = json.dumps(kv_dict[field])
+                value = json.dumps(kv_dict[field])
+                if value != field_object.value:
+                    field_object.value = value
+                    changed_objects.add(field_object)
+
+        for field_object in field_objects:
+            if isinstance(field_object, StudentModule) and self._field_data_cache.encode_state(field_object):
+                changed_objects.add(field_object)
 
         for field_object in field_objects:
             try:
-                # Save the field object that we made above
-                field_object.save()
+                # Save the field object that we made above, if its value changed
+                if field_object in changed_objects:
+                    field_object.save()
                 # If save is successful on this scope, add the saved fields to
                 # the list of successful saves
                 saved_fields.extend([field.field_name for field in field_objects[field_object]])
@@ -365,9 +414,9 @@ class DjangoKeyValueStore(KeyValueStore):
             raise KeyError(key.field_name)
 
         if key.scope == Scope.user_state:
-            state = json.loads(field_object.state)
+            state = self._field_data_cache.get_state(field_object)
             del state[key.field_name]
-            field_object.state = json.dumps(state)
+            self._field_data_cache.encode_state(field_object)
             field_object.save()
         else:
             field_object.delete()
@@ -381,6 +430,6 @@ class DjangoKeyValueStore(KeyValueStore):
             return False
 
         if key.scope == Scope.user_state:
-            return key.field_name in json.loads(field_object.state)
+            return key.field_name in self._field_data_cache.get_state(field_object)
         else:
             return True
@@ -12,11 +12,20 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+import json
+import logging
+import zlib
+from base64 import b64decode, b64encode
+
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+log = logging.getLogger(__name__)
+
 
 class StudentModule(models.Model):
     """
@@ -70,12 +79,58 @@ class StudentModule(models.Model):
         return unicode(repr(self))
 
 
+def diff_states(old, new):
+    """
+    Return the changes turning the dict `old` into the dict `new`, as a dict of
+    's' (the values set), 'd' (the keys deleted) and 'n' (the changes of nested dicts).
+    """
+    diff = {}
+    for key, value in new.iteritems():
+        if key not in old:
+            diff.setdefault('s', {})[key] = value
+        elif old[key] != value:
+            if isinstance(value, dict) and isinstance(old[key], dict):
+                diff.setdefault('n', {})[key] = diff_states(old[key], value)
+            else:
+                diff.setdefault('s', {})[key] = value
+    deleted = [key for key in old if key not in new]
+    if deleted:
+        diff['d'] = deleted
+    return diff
+
+
+def patch_state(state, diff):
+    """
+    Apply `diff` (see `diff_states`) to the dict `state`, in place, and return it.
+
+    Keys the diff deletes or changes which are missing from `state` (e.g. because
+    `state` was edited after the diff was taken) are skipped, or patched as empty dicts.
+    """
+    for key in diff.get('d', ()):
+        state.pop(key, None)
+    state.update(diff.get('s', {}))
+    for key, nested_diff in diff.get('n', {}).iteritems():
+        if not isinstance(state.get(key), dict):
+            state[key] = {}
+        patch_state(state[key], nested_diff)
+    return state
+
+
 class StudentModuleHistory(models.Model):
     """Keeps a complete history of state changes for a given XModule for a given
     Student. Right now, we restrict this to problems so that the table doesn't
-    explode in size."""
+    explode in size.
+
+    With the ENABLE_STUDENT_HISTORY_DELTAS feature, most entries only store the
+    compressed diff of their state against the module's latest full snapshot, as
+    "delta:<snapshot id>:<base64 zlib json diff>". A full snapshot is stored every
+    SNAPSHOT_INTERVAL entries. Use `with_full_states` to read
+    the states of entries.
+    """
 
     HISTORY_SAVING_TYPES = {'problem'}
+    DELTA_PREFIX = 'delta:'
+    SNAPSHOT_INTERVAL = 10
 
     class Meta:
         get_latest_by = "created"
@@ -92,14 +147,108 @@ class StudentModuleHistory(models.Model):
     @receiver(post_save, sender=StudentModule)
     def save_history(sender, instance, **kwargs):
         if instance.module_type in StudentModuleHistory.HISTORY_SAVING_TYPES:
+            state = instance.state
+            if settings.FEATURES.get('ENABLE_STUDENT_HISTORY_DELTAS'):
+                state = StudentModuleHistory.encode_state(instance)
             history_entry = StudentModuleHistory(student_module=instance,
                                                  version=None,
                                                  created=instance.modified,
-                                                 state=instance.state,
+                                                 state=state,
                                                  grade=instance.grade,
                                                  max_grade=instance.max_grade)
             history_entry.save()
 
+    @classmethod
+    def is_delta(cls, state):
+        """
+        Return whether `state`, the stored state of an entry, is a diff.
+        """
+        return state is not None and state.startswith(cls.DELTA_PREFIX)
+
+    @classmethod
+    def encode_delta(cls, snapshot_id, diff):
+        """
+        Return the stored state of an entry whose state is `diff` applied to the snapshot `snapshot_id`.
+        """
+        return '{0}{1}:{2}'.format(cls.DELTA_PREFIX, snapshot_id, b64encode(zlib.compress(json.dumps(diff))))
+
+    @classmethod
+    def delta_snapshot_id(cls, state):
+        """
+        Return the id of the snapshot the delta encoded `state` is a diff against.
+        """
+        return int(state[len(cls.DELTA_PREFIX):].split(':', 1)[0])
+
+    @classmethod
+    def decode_delta(cls, state):
+        """
+        Return the id of the snapshot and the diff of the delta encoded `state`.
+        """
+        snapshot_id, encoded_diff = state[len(cls.DELTA_PREFIX):].split(':', 1)
+        return int(snapshot_id), json.loads(zlib.decompress(b64decode(encoded_diff)))
+
+    @classmethod
+    def encode_state(cls, student_module):
+        """
+        Return the state to store in a new history entry of `student_module`: either a diff
+        against its latest snapshot, or a full snapshot when there is none to diff against,
+        or the latest one was followed by SNAPSHOT_INTERVAL - 1 diffs already.
+
+        This is called for every save of a problem's StudentModule, so it reads the latest
+        SNAPSHOT_INTERVAL entries of its history with a single query.
+        """
+        if student_module.state is None:
+            return student_module.state
+
+        latest_entries = cls.objects.filter(
+            student_module=student_module
+        ).order_by('-id').values_list('id', 'state')[:cls.SNAPSHOT_INTERVAL]
+        for following, (snapshot_id, snapshot_state) in enumerate(latest_entries):
+            if not cls.is_delta(snapshot_state):
+                break
+        else:
+            # no history yet, or SNAPSHOT_INTERVAL diffs since the latest snapshot
+            return student_module.state
+
+        if snapshot_state is None or following >= cls.SNAPSHOT_INTERVAL - 1:
+            return student_module.state
+
+        try:
+            old, new = json.loads(snapshot_state), json.loads(student_module.state)
+        except ValueError:
+            return student_module.state
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            return student_module.state
+
+        return cls.encode_delta(snapshot_id, diff_states(old, new))
+
+    @classmethod
+    def with_full_states(cls, entries):
+        """
+        Return a list of the history `entries`, with the state of the delta encoded ones
+        replaced by the full state they record (the entries aren't saved). The snapshots
+        they need which aren't among `entries` are read with a single query.
+        """
+        entries = list(entries)
+        snapshots = dict(
+            (entry.id, entry.state) for entry in entries if not cls.is_delta(entry.state)
+        )
+        deltas = [
+            (entry, cls.decode_delta(entry.state)) for entry in entries if cls.is_delta(entry.state)
+        ]
+        missing_ids = set(snapshot_id for _entry, (snapshot_id, _diff) in deltas) - set(snapshots)
+        if missing_ids:
+            snapshots.update(cls.objects.filter(id__in=missing_ids).values_list('id', 'state'))
+
+        for entry, (snapshot_id, diff) in deltas:
+            snapshot_state = snapshots.get(snapshot_id)
+            if snapshot_state is None or cls.is_delta(snapshot_state):
+                log.warning("Missing snapshot %s of StudentModuleHistory %s", snapshot_id, entry.id)
+                entry.state = json.dumps(None)
+            else:
+                entry.state = json.dumps(patch_state(json.loads(snapshot_state), diff))
+        return entries
+
 
 class XModuleUserStateSummaryField(models.Model):
     """
@@ -215,6 +364,56 @@ class OfflineComputedGrade(models.Model):
         return "[OfflineComputedGrade] %s: %s (%s) = %s" % (self.user, self.course_id, self.created, self.gradeset)
 
 
+class PersistentCourseGrade(models.Model):
+    """
+    A student's course grade summary (per-section totals, percent and letter
+    grade), as computed by courseware.grades.grade.
+
+    `course_version` identifies the grading structure of the course the grade
+    was computed for; a grade computed for a different version, or marked
+    stale because one of the student's scores changed since, is recomputed
+    on the next read.
+
+    `generation` counts the invalidations of the grade, so that a grade which
+    was invalidated while it was being computed isn't stored as up to date.
+    """
+    user = models.ForeignKey(User, db_index=True)
+    course_id = models.CharField(max_length=255, db_index=True)
+    course_version = models.CharField(max_length=255)
+
+    gradeset = models.TextField(null=True, blank=True)		# grades, stored as JSON
+    is_stale = models.BooleanField(default=False)
+    generation = models.IntegerField(default=0)
+
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        unique_together = (('user', 'course_id'), )
+
+    @classmethod
+    def invalidate(cls, user_id, course_id):
+        """
+        Mark the persisted grade of the user in the course as stale.
+
+        The generation is incremented even if the grade is stale already, since
+        it may be being computed from the scores from before the change.
+        """
+        cls.objects.filter(user=user_id, course_id=course_id).update(is_stale=True, generation=F('generation') + 1)
+
+    def __unicode__(self):
+        return "[PersistentCourseGrade] %s: %s (%s) = %s" % (self.user, self.course_id, self.course_version, self.gradeset)
+
+
+@receiver(post_delete, sender=StudentModule)
+def invalidate_grade_for_deleted_module(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Deleting a student's module state (e.g. from the instructor dashboard)
+    can change their grade.
+    """
+    PersistentCourseGrade.invalidate(instance.student_id, instance.course_id)
+
+
 class OfflineComputedGradeLog(models.Model):
     """
     Log of when offline grades are computed.
@@ -18,8 +18,9 @@ from django.views.decorators.csrf import csrf_exempt, csrf_protect
 
 from capa.xqueue_interface import XQueueInterface
 from courseware.access import has_access
-from courseware.masquerade import setup_masquerade
+from courseware.masquerade import setup_masquerade, is_masquerading_as_student
 from courseware.model_data import FieldDataCache, DjangoKeyValueStore
+from courseware.models import PersistentCourseGrade
 from lms.lib.xblock.field_data import LmsFieldData
 from lms.lib.xblock.runtime import LmsModuleSystem, handler_prefix, unquote_slashes
 from edxmako.shortcuts import render_to_string
@@ -184,6 +185,63 @@ def get_xqueue_callback_url_prefix(request):
     return settings.XQUEUE_INTERFACE.get('callback_url', prefix)
 
 
+class LmsModuleSystemFactory(object):
+    """
+    Holds the parts of the LmsModuleSystems of a user's modules in a course which
+    don't depend on the module, so that they are only built once per request (or
+    grading pass) rather than once per module.
+    """
+    def __init__(self, user, course_id, track_function, xqueue_callback_url_prefix):
+        self.user = user
+        self.course_id = course_id
+        self.track_function = track_function
+        self.xqueue_callback_url_prefix = xqueue_callback_url_prefix
+
+        # NOTE: module_id is empty string here. The 'module_id' will get assigned in the replacement
+        # function, we just need to specify something to get the reverse() to work.
+        self.jump_to_id_base_url = reverse('jump_to_id', kwargs={'course_id': course_id, 'module_id': ''})
+        self.replace_course_urls = partial(
+            static_replace.replace_course_urls,
+            course_id=course_id
+        )
+        self.replace_jump_to_id_urls = partial(
+            static_replace.replace_jump_to_id_urls,
+            course_id=course_id,
+            jump_to_id_base_url=self.jump_to_id_base_url
+        )
+        self.can_execute_unsafe_code = lambda: can_execute_unsafe_code(course_id)
+        self._staff_access = {}
+
+    def has_staff_access(self, location):
+        """
+        Return whether the user has staff access to `location`. Staff access is granted
+        per course, so it's only checked once for each course (and masquerading status).
+        """
+        key = (location.org, location.course, is_masquerading_as_student(self.user))
+        if key not in self._staff_access:
+            self._staff_access[key] = has_access(self.user, location, 'staff', self.course_id)
+        return self._staff_access[key]
+
+
+def get_module_system_factory(user, request, course_id):
+    """
+    Return the LmsModuleSystemFactory for `user` and `course_id` in `request`,
+    making it the first time it's asked for.
+
+    Only the factory of the last user is kept for each course, as grading passes
+    reuse a request for each student in turn.
+    """
+    factories = getattr(request, '_module_system_factories', None)
+    if factories is None:
+        factories = request._module_system_factories = {}  # pylint: disable=protected-access
+    factory = factories.get(course_id)
+    if factory is None or factory.user.id != user.id:
+        factory = factories[course_id] = LmsModuleSystemFactory(
+            user, course_id, make_track_function(request), get_xqueue_callback_url_prefix(request)
+        )
+    return factory
+
+
 def get_module_for_descriptor(user, request, descriptor, field_data_cache, course_id,
                               position=None, wrap_xmodule_display=True, grade_bucket_type=None,
                               static_asset_path=''):
@@ -196,22 +254,26 @@ def get_module_for_descriptor(user, request, descriptor, field_data_cache, cours
     if has_access(user, descriptor, 'staff', course_id):
         setup_masquerade(request, True)
 
-    track_function = make_track_function(request)
-    xqueue_callback_url_prefix = get_xqueue_callback_url_prefix(request)
+    system_factory = get_module_system_factory(user, request, course_id)
 
     return get_module_for_descriptor_internal(user, descriptor, field_data_cache, course_id,
-                                              track_function, xqueue_callback_url_prefix,
+                                              system_factory.track_function,
+                                              system_factory.xqueue_callback_url_prefix,
                                               position, wrap_xmodule_display, grade_bucket_type,
-                                              static_asset_path)
+                                              static_asset_path, system_factory)
 
 
 def get_module_for_descriptor_internal(user, descriptor, field_data_cache, course_id,
                                        track_function, xqueue_callback_url_prefix,
                                        position=None, wrap_xmodule_display=True, grade_bucket_type=None,
-                                       static_asset_path=''):
+                                       static_asset_path='', system_factory=None):
     """
     Actually implement get_module, without requiring a request.
 
+    system_factory: the LmsModuleSystemFactory to build the module's runtime with; one is
+    made if it's None. Pass the same one when getting many modules for the same user and
+    course.
+
     See get_module() docstring for further details.
     """
 
@@ -219,10 +281,12 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
     if not has_access(user, descriptor, 'load', course_id):
         return None
 
+    if system_factory is None:
+        system_factory = LmsModuleSystemFactory(user, course_id, track_function, xqueue_callback_url_prefix)
+
     student_data = DbModel(DjangoKeyValueStore(field_data_cache))
     descriptor._field_data = LmsFieldData(descriptor._field_data, student_data)
 
-
     def make_xqueue_callback(dispatch='score_update'):
         # Fully qualified callback URL for external queueing system
         relative_xqueue_callback_url = reverse(
@@ -284,7 +348,7 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
         return get_module_for_descriptor_internal(user, descriptor, field_data_cache, course_id,
                                                   track_function, make_xqueue_callback,
                                                   position, wrap_xmodule_display, grade_bucket_type,
-                                                  static_asset_path)
+                                                  static_asset_path, system_factory)
 
     def publish(event, custom_user=None):
         """A function that allows XModules to publish events. This only supports grade changes right now."""
@@ -311,6 +375,9 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
         # Save all changes to the underlying KeyValueStore
         student_module.save()
 
+        # The student's persisted course grade no longer reflects this score
+        PersistentCourseGrade.invalidate(user_id, course_id)
+
         # Bin score into range and increment stats
         score_bucket = get_score_bucket(student_module.grade, student_module.max_grade)
         org, course_num, run = course_id.split("/")
@@ -355,16 +422,16 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
     # this will rewrite intra-courseware links (/jump_to_id/<id>). This format
     # is an improvement over the /course/... format for studio authored courses,
     # because it is agnostic to course-hierarchy.
-    # NOTE: module_id is empty string here. The 'module_id' will get assigned in the replacement
-    # function, we just need to specify something to get the reverse() to work.
     block_wrappers.append(partial(
         replace_jump_to_id_urls,
         course_id,
-        reverse('jump_to_id', kwargs={'course_id': course_id, 'module_id': ''}),
+        system_factory.jump_to_id_base_url,
     ))
 
+    user_is_staff = system_factory.has_staff_access(descriptor.location)
+
     if settings.FEATURES.get('DISPLAY_HISTOGRAMS_TO_STAFF'):
-        if has_access(user, descriptor, 'staff', course_id):
+        if user_is_staff:
             block_wrappers.append(partial(add_histogram, user))
 
     # These modules store data using the anonymous_student_id as a key.
@@ -398,15 +465,8 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
             course_id=course_id,
             static_asset_path=static_asset_path or descriptor.static_asset_path,
         ),
-        replace_course_urls=partial(
-            static_replace.replace_course_urls,
-            course_id=course_id
-        ),
-        replace_jump_to_id_urls=partial(
-            static_replace.replace_jump_to_id_urls,
-            course_id=course_id,
-            jump_to_id_base_url=reverse('jump_to_id', kwargs={'course_id': course_id, 'module_id': ''})
-        ),
+        replace_course_urls=system_factory.replace_course_urls,
+        replace_jump_to_id_urls=system_factory.replace_jump_to_id_urls,
         node_path=settings.NODE_PATH,
         publish=publish,
         anonymous_student_id=anonymous_student_id,
@@ -414,7 +474,7 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
         open_ended_grading_interface=open_ended_grading_interface,
         s3_interface=s3_interface,
         cache=cache,
-        can_execute_unsafe_code=(lambda: can_execute_unsafe_code(course_id)),
+        can_execute_unsafe_code=system_factory.can_execute_unsafe_code,
         # TODO: When we merge the descriptor and module systems, we can stop reaching into the mixologist (cpennington)
         mixins=descriptor.runtime.mixologist._mixins,  # pylint: disable=protected-access
         wrappers=block_wrappers,
@@ -429,10 +489,10 @@ def get_module_for_descriptor_internal(user, descriptor, field_data_cache, cours
             make_psychometrics_data_update_handler(course_id, user, descriptor.location.url())
         )
 
-    system.set('user_is_staff', has_access(user, descriptor.location, 'staff', course_id))
+    system.set('user_is_staff', user_is_staff)
 
     # make an ErrorDescriptor -- assuming that the descriptor's system is ok
-    if has_access(user, descriptor.location, 'staff', course_id):
+    if user_is_staff:
         system.error_descriptor_class = ErrorDescriptor
     else:
         system.error_descriptor_class = NonStaffErrorDescriptor
@@ -8,6 +8,7 @@ from django.test.utils import override_settings
 
 from courseware.tests.factories import UserFactory, CourseEnrollmentAllowedFactory, StaffFactory, InstructorFactory
 from student.tests.factories import AnonymousUserFactory
+from xmodule.course_module import CourseSummary
 from xmodule.modulestore import Location
 from courseware.tests.tests import TEST_DATA_MIXED_MODULESTORE
 import pytz
@@ -98,3 +99,13 @@ class AccessTestCase(TestCase):
 
         # TODO:
         # Non-staff cannot enroll outside the open enrollment period if not specifically allowed
+
+    def test__has_access_course_summary(self):
+        # Course summaries are checked like the courses they summarize
+        yesterday = datetime.datetime.now(pytz.utc) - datetime.timedelta(days=1)
+        tomorrow = datetime.datetime.now(pytz.utc) + datetime.timedelta(days=1)
+        summary = CourseSummary(self.course, {'start': tomorrow, 'enrollment_start': yesterday})
+        self.assertTrue(access.has_access(self.student, summary, 'see_exists'))
+        self.assertTrue(access.has_access(self.student, summary, 'enroll'))
+        self.assertFalse(access.has_access(self.student, summary, 'load'))
+        self.assertTrue(access.has_access(self.course_staff, summary, 'load'))
@@ -1,19 +1,30 @@
 """
 Test grade calculation.
 """
+from datetime import timedelta
+
+from django.conf import settings
 from django.http import Http404
+from django.test.client import RequestFactory
 from django.test.utils import override_settings
+from django.utils import timezone
 from mock import patch
 
+from courseware.tests.factories import StudentModuleFactory
 from courseware.tests.modulestore_config import TEST_DATA_MIXED_MODULESTORE
 from student.tests.factories import UserFactory
+from xmodule.modulestore import Location
 from xmodule.modulestore.tests.factories import CourseFactory
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase
 
-from courseware.grades import grade, iterate_grades_for
+from courseware.grades import (
+    grade, iterate_grades_for, cached_grade, grading_structure_version, section_breakdown_labels,
+    StudentModuleScores
+)
+from courseware.models import PersistentCourseGrade
 
 
-def _grade_with_errors(student, request, course, keep_raw_scores=False):
+def _grade_with_errors(student, request, course, keep_raw_scores=False, scores_cache=None):
     """This fake grade method will throw exceptions for student3 and
     student4, but allow any other students to go through normal grading.
 
@@ -24,7 +35,7 @@ def _grade_with_errors(student, request, course, keep_raw_scores=False):
     if student.username in ['student3', 'student4']:
         raise Exception("I don't like {}".format(student.username))
 
-    return grade(student, request, course, keep_raw_scores=keep_raw_scores)
+    return grade(student, request, course, keep_raw_scores=keep_raw_scores, scores_cache=scores_cache)
 
 
 @override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
@@ -105,8 +116,32 @@ class TestGradeIteration(ModuleStoreTestCase):
         self.assertTrue(all_gradesets[student2])
         self.assertTrue(all_gradesets[student5])
 
+    def test_chunked_grading(self):
+        """Every student is graded when the students don't divide evenly
+        into chunks, and grading each student independently agrees."""
+        chunked_gradesets, chunked_errors = self._gradesets_and_errors_for(
+            self.course.id, self.students, chunk_size=2
+        )
+        single_gradesets, single_errors = self._gradesets_and_errors_for(
+            self.course.id, self.students, chunk_size=None
+        )
+        self.assertEqual(len(chunked_errors), 0)
+        self.assertEqual(len(single_errors), 0)
+        self.assertEqual(len(chunked_gradesets), 5)
+        for student in self.students:
+            self.assertEqual(chunked_gradesets[student]['percent'], single_gradesets[student]['percent'])
+
+    def test_section_breakdown_labels(self):
+        """The section breakdown labels computed from the grading policy match
+        the ones in every student's gradeset."""
+        labels = section_breakdown_labels(self.course)
+        self.assertTrue(labels)
+        all_gradesets, _ = self._gradesets_and_errors_for(self.course.id, self.students)
+        for gradeset in all_gradesets.values():
+            self.assertEqual(labels, [section['label'] for section in gradeset['section_breakdown']])
+
     ################################# Helpers #################################
-    def _gradesets_and_errors_for(self, course_id, students):
+    def _gradesets_and_errors_for(self, course_id, students, **kwargs):
         """Simple helper method to iterate through student grades and give us
         two dictionaries -- one that has all students and their respective
         gradesets, and one that has only students that could not be graded and
@@ -114,9 +149,143 @@ class TestGradeIteration(ModuleStoreTestCase):
         students_to_gradesets = {}
         students_to_errors = {}
 
-        for student, gradeset, err_msg in iterate_grades_for(course_id, students):
+        for student, gradeset, err_msg in iterate_grades_for(course_id, students, **kwargs):
             students_to_gradesets[student] = gradeset
             if err_msg:
                 students_to_errors[student] = err_msg
 
         return students_to_gradesets, students_to_errors
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestStudentModuleScores(ModuleStoreTestCase):
+    """
+    Test the in-memory StudentModule score table used for bulk grading.
+    """
+    COURSE_ID = "MITx/999/Robot_Super_Course"
+
+    def setUp(self):
+        self.student = UserFactory.create(username='student1')
+        self.other_student = UserFactory.create(username='student2')
+        self.graded = Location('i4x', 'MITx', '999', 'problem', 'graded')
+        self.ungraded = Location('i4x', 'MITx', '999', 'problem', 'ungraded')
+        self.unseen = Location('i4x', 'MITx', '999', 'problem', 'unseen')
+
+        StudentModuleFactory.create(
+            student=self.student, module_state_key=self.graded.url(), grade=1, max_grade=2
+        )
+        StudentModuleFactory.create(
+            student=self.student, module_state_key=self.ungraded.url()
+        )
+        StudentModuleFactory.create(
+            student=self.other_student, module_state_key=self.unseen.url(), grade=3, max_grade=3
+        )
+
+    def test_scores_for_group(self):
+        with self.assertNumQueries(1):
+            scores = StudentModuleScores(self.COURSE_ID, [self.student])
+
+        self.assertEqual(scores.get(self.student, self.graded), (1, 2))
+        self.assertEqual(scores.get(self.student, self.ungraded), (None, None))
+        self.assertIsNone(scores.get(self.student, self.unseen))
+        self.assertIsNone(scores.get(self.other_student, self.unseen))
+
+        self.assertTrue(scores.has_any(self.student, [self.unseen, self.ungraded]))
+        self.assertFalse(scores.has_any(self.student, [self.unseen]))
+        self.assertFalse(scores.has_any(self.other_student, [self.unseen]))
+
+    def test_no_students(self):
+        with self.assertNumQueries(0):
+            scores = StudentModuleScores(self.COURSE_ID, [])
+        self.assertIsNone(scores.get(self.student, self.graded))
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestPersistentCourseGrade(ModuleStoreTestCase):
+    """
+    Test that grades are persisted, and recomputed only once they are stale.
+    """
+    def setUp(self):
+        self.course = CourseFactory.create(display_name="persisted_grades_course")
+        self.student = UserFactory.create(username='student1')
+        self.request = RequestFactory().get('/')
+        self.request.user = self.student
+        self.request.session = {}
+
+    def _cached_grade(self):
+        """Return the cached grade of the student, and whether it was computed"""
+        with patch('courseware.grades.grade', wraps=grade) as mock_grade:
+            gradeset = cached_grade(self.student, self.request, self.course)
+        return gradeset, mock_grade.called
+
+    def test_grade_is_persisted(self):
+        gradeset, computed = self._cached_grade()
+        self.assertTrue(computed)
+        persisted = PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id)
+        self.assertEqual(persisted.course_version, grading_structure_version(self.course))
+        self.assertFalse(persisted.is_stale)
+
+        cached_gradeset, computed = self._cached_grade()
+        self.assertFalse(computed)
+        self.assertEqual(cached_gradeset['percent'], gradeset['percent'])
+        self.assertEqual(cached_gradeset['grade'], gradeset['grade'])
+        self.assertEqual(cached_gradeset['totaled_scores'], gradeset['totaled_scores'])
+
+    def test_invalidate(self):
+        self._cached_grade()
+        PersistentCourseGrade.invalidate(self.student.id, self.course.id)
+        self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+
+        _, computed = self._cached_grade()
+        self.assertTrue(computed)
+
+    def test_invalidate_while_grading(self):
+        def grade_and_invalidate(*args, **kwargs):
+            """A score is published while the grade is computed"""
+            gradeset = grade(*args, **kwargs)
+            PersistentCourseGrade.invalidate(self.student.id, self.course.id)
+            return gradeset
+
+        for _ in range(2):
+            # the first time there's no persisted grade yet, and the second time it's stale
+            with patch('courseware.grades.grade', side_effect=grade_and_invalidate):
+                cached_grade(self.student, self.request, self.course)
+            self.assertTrue(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+
+        _, computed = self._cached_grade()
+        self.assertTrue(computed)
+        self.assertFalse(PersistentCourseGrade.objects.get(user=self.student, course_id=self.course.id).is_stale)
+
+    def test_deleting_state_invalidates(self):
+        self._cached_grade()
+        module = StudentModuleFactory.create(student=self.student, course_id=self.course.id)
+        module.delete()
+        _, computed = self._cached_grade()
+        self.assertTrue(computed)
+
+    def test_course_version_change(self):
+        self._cached_grade()
+        PersistentCourseGrade.objects.filter(user=self.student).update(course_version='old')
+        _, computed = self._cached_grade()
+        self.assertTrue(computed)
+
+    def test_start_date_passed(self):
+        self._cached_grade()
+        self.course.start = timezone.now()
+        _, computed = self._cached_grade()
+        self.assertTrue(computed)
+
+    def test_max_age(self):
+        self._cached_grade()
+        PersistentCourseGrade.objects.filter(user=self.student).update(
+            updated=timezone.now() - timedelta(seconds=settings.PERSISTED_GRADES_MAX_AGE + 1)
+        )
+        _, computed = self._cached_grade()
+        self.assertTrue(computed)
+
+    def test_iterate_persisted_grades(self):
+        gradeset, _ = self._cached_grade()
+        with patch('courseware.grades.grade') as mock_grade:
+            results = list(iterate_grades_for(self.course.id, [self.student], use_persisted=True))
+        self.assertFalse(mock_grade.called)
+        self.assertEqual(results[0][1]['percent'], gradeset['percent'])
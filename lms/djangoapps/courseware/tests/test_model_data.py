@@ -2,6 +2,9 @@
 Test for lms courseware app, module data (runtime data storage for XBlocks)
 """
 import json
+import sys
+import time
+import unittest
 from mock import Mock, patch
 from functools import partial
 
@@ -17,6 +20,7 @@ from courseware.tests.factories import StudentPrefsFactory, StudentInfoFactory
 
 from xblock.fields import Scope, BlockScope
 from xmodule.modulestore import Location
+from django.conf import settings
 from django.test import TestCase
 from django.db import DatabaseError
 from xblock.core import KeyValueMultiSaveError
@@ -152,6 +156,39 @@ class TestStudentModuleStorage(TestCase):
                 self.kvs.set_many(kv_dict)
         self.assertEquals(len(exception_context.exception.saved_field_names), 0)
 
+    def test_state_decoded_once(self):
+        "Test that the state of a StudentModule is only decoded once, however many fields are read"
+        with patch('courseware.model_data.json.loads', wraps=json.loads) as mock_loads:
+            for __ in range(3):
+                self.assertEquals('a_value', self.kvs.get(user_state_key('a_field')))
+                self.assertEquals('b_value', self.kvs.get(user_state_key('b_field')))
+                self.assertTrue(self.kvs.has(user_state_key('a_field')))
+        self.assertEquals(mock_loads.call_count, 1)
+
+    def test_set_many_encodes_once(self):
+        "Test that the state of a StudentModule is encoded and saved once when setting many fields"
+        with patch('courseware.model_data.json.dumps', wraps=json.dumps) as mock_dumps:
+            with patch.object(StudentModule, 'save') as mock_save:
+                self.kvs.set_many(self.construct_kv_dict())
+        self.assertEquals(mock_dumps.call_count, 1)
+        self.assertEquals(mock_save.call_count, 1)
+        self.assertEquals(
+            {'a_field': 'a_value', 'b_field': 'b_value', 'field_a': 'new value', 'field_b': 'newer value'},
+            json.loads(self.field_data_cache.find(user_state_key('a_field')).state)
+        )
+
+    def test_set_unchanged_field(self):
+        "Test that setting fields to their current values doesn't update the StudentModule"
+        with self.assertNumQueries(0):
+            self.kvs.set_many({user_state_key('a_field'): 'a_value', user_state_key('b_field'): 'b_value'})
+
+    def test_state_replaced(self):
+        "Test that the state is decoded again if the StudentModule's state is replaced"
+        student_module = self.field_data_cache.find(user_state_key('a_field'))
+        self.assertEquals('a_value', self.kvs.get(user_state_key('a_field')))
+        student_module.state = json.dumps({'a_field': 'other_value'})
+        self.assertEquals('other_value', self.kvs.get(user_state_key('a_field')))
+
 
 class TestMissingStudentModule(TestCase):
     def setUp(self):
@@ -309,3 +346,102 @@ class TestStudentInfoStorage(StorageTestBase, TestCase):
     scope = Scope.user_info
     key_factory = user_info_key
     storage_class = XModuleStudentInfoField
+
+
+class TestProblemStateStorage(TestCase):
+    """
+    Test the storage of a capa problem's state, reading and writing its fields as a problem check does.
+    """
+    INPUTS = 50
+
+    def setUp(self):
+        inputs = ['input_{0}_2_1'.format(index) for index in range(self.INPUTS)]
+        self.state = {
+            'seed': 1,
+            'attempts': 0,
+            'done': False,
+            'student_answers': dict((name, 'answer ' * 20) for name in inputs),
+            'correct_map': dict(
+                (name, {'correctness': 'incorrect', 'npoints': None, 'msg': 'message ' * 20,
+                        'hint': '', 'hintmode': None, 'queuestate': None})
+                for name in inputs
+            ),
+            'input_state': dict((name, {}) for name in inputs),
+        }
+        student_module = StudentModuleFactory(state=json.dumps(self.state))
+        self.user = student_module.student
+        self.field_data_cache = FieldDataCache(
+            [mock_descriptor([mock_field(Scope.user_state, name) for name in self.state])], course_id, self.user
+        )
+        self.kvs = DjangoKeyValueStore(self.field_data_cache)
+
+    def _check(self, attempt):
+        """Read all the fields of the problem, and write them back with one more attempt"""
+        values = dict((name, self.kvs.get(user_state_key(name))) for name in self.state)
+        values['attempts'] = attempt
+        self.kvs.set_many(dict((user_state_key(name), value) for name, value in values.items()))
+
+    def test_values_are_not_shared(self):
+        student_answers = self.kvs.get(user_state_key('student_answers'))
+        student_answers['input_0_2_1'] = 'changed in place'
+        # another block reading the field, or saving another field of the row, doesn't see the change
+        self.assertEquals(self.kvs.get(user_state_key('student_answers'))['input_0_2_1'], 'answer ' * 20)
+        self.kvs.set(user_state_key('attempts'), 1)
+        self.assertEquals(
+            json.loads(StudentModule.objects.all()[0].state)['student_answers']['input_0_2_1'], 'answer ' * 20
+        )
+
+    def test_state_json_work(self):
+        with patch('courseware.model_data.json.loads', wraps=json.loads) as mock_loads:
+            with patch('courseware.model_data.json.dumps', wraps=json.dumps) as mock_dumps:
+                with patch.object(StudentModule, 'save') as mock_save:
+                    for attempt in range(1, 11):
+                        self._check(attempt)
+                    # checks which don't change the state don't save it
+                    self._check(10)
+        # the state is decoded once, and encoded (and saved) once per check
+        self.assertEquals(mock_loads.call_count, 1)
+        self.assertEquals(mock_dumps.call_count, 11)
+        self.assertEquals(mock_save.call_count, 10)
+
+
+@unittest.skipUnless(settings.FEATURES.get('RUN_BENCHMARKS'), "Benchmarks only run with RUN_BENCHMARKS set")
+class TestProblemCheckThroughput(TestProblemStateStorage):
+    """
+    Micro-benchmark of the problem checks per second with the state decoded once per FieldDataCache,
+    and with the state decoded and encoded for each field, as it was before.
+    """
+    CHECKS = 200
+
+    def _old_check(self, student_module, attempt):
+        """
+        Do what _check does, the way the key value store did before it kept the decoded state: decode
+        the state for each field read, decode and encode it for each field set, and save the row.
+        """
+        values = dict((name, json.loads(student_module.state)[name]) for name in self.state)
+        values['attempts'] = attempt
+        for name, value in values.items():
+            state = json.loads(student_module.state)
+            state[name] = value
+            student_module.state = json.dumps(state)
+        student_module.save()
+
+    def _checks_per_second(self, check):
+        """Run CHECKS checks with `check`, and return the number of checks per second."""
+        start = time.time()
+        for attempt in range(1, self.CHECKS + 1):
+            check(attempt)
+        return self.CHECKS / (time.time() - start)
+
+    def test_check_throughput(self):
+        student_module = StudentModule.objects.all()[0]
+        old_rate = self._checks_per_second(partial(self._old_check, student_module))
+        self.assertEquals(self.CHECKS, json.loads(StudentModule.objects.all()[0].state)['attempts'])
+
+        new_rate = self._checks_per_second(self._check)
+        self.assertEquals(self.CHECKS, json.loads(StudentModule.objects.all()[0].state)['attempts'])
+
+        sys.stderr.write(
+            '\n{0} problem checks of {1} inputs: {2:.0f} checks/s decoding the state per field, '
+            '{3:.0f} checks/s decoding it once\n'.format(self.CHECKS, self.INPUTS, old_rate, new_rate)
+        )
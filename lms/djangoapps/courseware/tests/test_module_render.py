@@ -522,6 +522,88 @@ class TestHtmlModifiers(ModuleStoreTestCase):
             result_fragment.content
         )
 
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestModuleSystemFactory(ModuleStoreTestCase):
+    """
+    Test sharing the parts of the runtimes of the modules rendered in a request, and count
+    the work that saves per module
+    """
+    NUM_CHILDREN = 30
+
+    def setUp(self):
+        self.user = UserFactory.create()
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = {}
+        self.course = CourseFactory.create()
+        self.sequential = ItemFactory.create(parent_location=self.course.location, category='sequential')
+        self.children = [
+            ItemFactory.create(
+                parent_location=self.sequential.location,
+                category='html',
+                data='<p>Child {0}</p>'.format(index)
+            )
+            for index in range(self.NUM_CHILDREN)
+        ]
+        self.field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
+            self.course.id,
+            self.user,
+            modulestore().get_item(self.sequential.location),
+            depth=None
+        )
+
+    def _count_calls(self, load_modules):
+        """
+        Run `load_modules`, and return how many times jump_to_id was reversed, and how
+        many times staff access was checked.
+        """
+        with patch('courseware.module_render.reverse', wraps=reverse) as mock_reverse:
+            with patch('courseware.module_render.has_access', wraps=render.has_access) as mock_has_access:
+                load_modules()
+        jump_to_id_reverses = [
+            call for call in mock_reverse.call_args_list if call[0][0] == 'jump_to_id'
+        ]
+        staff_checks = [
+            call for call in mock_has_access.call_args_list if call[0][2] == 'staff'
+        ]
+        return len(jump_to_id_reverses), len(staff_checks)
+
+    def test_calls_per_module(self):
+        num_modules = self.NUM_CHILDREN + 1
+
+        def load_with_factory():
+            """Render the sequential and its children, sharing the request's factory."""
+            module = render.get_module(
+                self.user, self.request, self.sequential.location, self.field_data_cache, self.course.id, depth=None
+            )
+            self.assertEqual(len(module.get_display_items()), self.NUM_CHILDREN)
+
+        def load_without_factory():
+            """Load the sequential and each of its children with a runtime built from scratch."""
+            for item in [self.sequential] + self.children:
+                module = render.get_module_for_descriptor_internal(
+                    self.user, modulestore().get_item(item.location), self.field_data_cache, self.course.id,
+                    track_function=Mock(), xqueue_callback_url_prefix='', system_factory=None
+                )
+                self.assertIsNotNone(module)
+
+        # each module builds its own jump_to_id url and checks staff access
+        self.assertEqual(self._count_calls(load_without_factory), (num_modules, num_modules))
+        # the modules share one jump_to_id url and staff check (and the masquerade check of
+        # get_module_for_descriptor)
+        self.assertEqual(self._count_calls(load_with_factory), (1, 2))
+
+    def test_factory_per_request(self):
+        factory = render.get_module_system_factory(self.user, self.request, self.course.id)
+        self.assertIs(factory, render.get_module_system_factory(self.user, self.request, self.course.id))
+
+        other_user = UserFactory.create()
+        self.assertIsNot(factory, render.get_module_system_factory(other_user, self.request, self.course.id))
+        other_request = RequestFactory().get('/')
+        self.assertIsNot(factory, render.get_module_system_factory(self.user, other_request, self.course.id))
+
+
 PER_COURSE_ANONYMIZED_DESCRIPTORS = (LTIDescriptor, )
 
 PER_STUDENT_ANONYMIZED_DESCRIPTORS = [
@@ -0,0 +1,147 @@
+"""
+Tests of the delta encoded StudentModuleHistory states
+"""
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from mock import patch
+
+from courseware.models import StudentModuleHistory, diff_states, patch_state
+from courseware.tests.factories import StudentModuleFactory
+
+
+class TestDiffStates(TestCase):
+    """
+    Test diffing and patching the states of modules.
+    """
+    def assert_round_trip(self, old, new):
+        """Assert that patching `old` with its diff to `new` gives `new`."""
+        diff = diff_states(old, new)
+        self.assertEqual(patch_state(json.loads(json.dumps(old)), json.loads(json.dumps(diff))), new)
+        return diff
+
+    def test_unchanged(self):
+        self.assertEqual(self.assert_round_trip({'attempts': 1}, {'attempts': 1}), {})
+
+    def test_changes(self):
+        diff = self.assert_round_trip(
+            {'attempts': 1, 'seed': 1, 'done': False},
+            {'attempts': 2, 'seed': 1, 'input_state': {}},
+        )
+        self.assertEqual(diff, {'s': {'attempts': 2, 'input_state': {}}, 'd': ['done']})
+
+    def test_nested_changes(self):
+        diff = self.assert_round_trip(
+            {'student_answers': {'1_2_1': 'a', '1_3_1': 'b'}, 'correct_map': {}},
+            {'student_answers': {'1_2_1': 'a', '1_3_1': 'c'}, 'correct_map': None},
+        )
+        self.assertEqual(diff, {'n': {'student_answers': {'s': {'1_3_1': 'c'}}}, 's': {'correct_map': None}})
+
+    def test_patch_missing_keys(self):
+        # e.g. input_state was removed from the snapshot after the diff was taken
+        diff = diff_states(
+            {'attempts': 1, 'input_state': {'1_2_1': {}}, 'done': False},
+            {'attempts': 2, 'input_state': {'1_2_1': {}, '1_3_1': {}}},
+        )
+        self.assertEqual(patch_state({'attempts': 1}, diff), {'attempts': 2, 'input_state': {'1_3_1': {}}})
+
+
+@patch.dict(settings.FEATURES, {'ENABLE_STUDENT_HISTORY_DELTAS': True})
+class TestStudentModuleHistoryDeltas(TestCase):
+    """
+    Test writing and reading the history of modules as diffs against snapshots.
+    """
+    def setUp(self):
+        self.student_module = StudentModuleFactory(state=json.dumps({'attempts': 0, 'seed': 1}))
+
+    def _submit(self, attempts):
+        """Save a new state of the student module."""
+        self.student_module.state = json.dumps({'attempts': attempts, 'seed': 1})
+        self.student_module.save()
+
+    def _history(self):
+        """Return the stored history entries of the student module."""
+        return list(StudentModuleHistory.objects.filter(student_module=self.student_module).order_by('id'))
+
+    def test_snapshots(self):
+        for attempts in range(1, 2 * StudentModuleHistory.SNAPSHOT_INTERVAL + 1):
+            self._submit(attempts)
+        entries = self._history()
+
+        self.assertEqual(
+            [index for index, entry in enumerate(entries) if not StudentModuleHistory.is_delta(entry.state)],
+            [0, StudentModuleHistory.SNAPSHOT_INTERVAL, 2 * StudentModuleHistory.SNAPSHOT_INTERVAL],
+        )
+        # each diff applies to the latest snapshot before it
+        self.assertEqual(
+            StudentModuleHistory.delta_snapshot_id(entries[-1].state),
+            entries[StudentModuleHistory.SNAPSHOT_INTERVAL].id
+        )
+        self.assertEqual(
+            [json.loads(entry.state) for entry in StudentModuleHistory.with_full_states(entries)],
+            [{'attempts': attempts, 'seed': 1} for attempts in range(len(entries))],
+        )
+
+    def test_missing_snapshots_are_read(self):
+        for attempts in range(1, 4):
+            self._submit(attempts)
+        latest = self._history()[-1:]
+
+        with self.assertNumQueries(1):
+            entries = StudentModuleHistory.with_full_states(latest)
+        self.assertEqual(json.loads(entries[0].state), {'attempts': 3, 'seed': 1})
+
+    def test_states_which_cant_be_diffed(self):
+        self.student_module.state = None
+        self.student_module.save()
+        self.student_module.state = json.dumps([1])
+        self.student_module.save()
+        self._submit(1)
+
+        entries = self._history()
+        self.assertFalse(any(StudentModuleHistory.is_delta(entry.state) for entry in entries))
+        self.assertEqual([entry.state for entry in StudentModuleHistory.with_full_states(entries)],
+                         [entry.state for entry in entries])
+
+    def test_encoding_is_a_single_query(self):
+        for attempts in range(1, 4):
+            self._submit(attempts)
+        with self.assertNumQueries(1):
+            state = StudentModuleHistory.encode_state(self.student_module)
+        self.assertTrue(StudentModuleHistory.is_delta(state))
+
+    def test_remove_input_state(self):
+        StudentModuleHistory.objects.filter(student_module=self.student_module).delete()
+        # the snapshot and the diffs against it all have input_state
+        for attempts in range(4):
+            input_state = dict(('1_{0}_1'.format(index), {}) for index in range(attempts + 1))
+            self.student_module.state = json.dumps({'attempts': attempts, 'seed': 1, 'input_state': input_state})
+            self.student_module.save()
+
+        idlist_file, idlist_path = tempfile.mkstemp()
+        self.addCleanup(os.remove, idlist_path)
+        os.write(idlist_file, 'id\n{0}\n'.format(self.student_module.id))
+        os.close(idlist_file)
+        call_command('remove_input_state', idlist_path, save_changes=True)
+
+        entries = self._history()
+        self.assertTrue(any(StudentModuleHistory.is_delta(entry.state) for entry in entries))
+        # fixing the student module itself saved another entry
+        self.assertEqual(
+            [json.loads(entry.state) for entry in StudentModuleHistory.with_full_states(entries)],
+            [{'attempts': attempts, 'seed': 1} for attempts in [0, 1, 2, 3, 3]],
+        )
+
+    def test_disabled(self):
+        with patch.dict(settings.FEATURES, {'ENABLE_STUDENT_HISTORY_DELTAS': False}):
+            self._submit(1)
+            self._submit(2)
+        self.assertEqual([entry.state for entry in self._history()], [
+            json.dumps({'attempts': 0, 'seed': 1}),
+            json.dumps({'attempts': 1, 'seed': 1}),
+            json.dumps({'attempts': 2, 'seed': 1}),
+        ])
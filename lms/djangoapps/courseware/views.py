@@ -636,7 +636,7 @@ def _progress(request, course_id, student_id):
 
     courseware_summary = grades.progress_summary(student, request, course)
 
-    grade_summary = grades.grade(student, request, course)
+    grade_summary = grades.cached_grade(student, request, course)
 
     if courseware_summary is None:
         #This means the student didn't have access to the course (which the instructor requested)
@@ -682,16 +682,16 @@ def submission_history(request, course_id, student_username, location):
     except StudentModule.DoesNotExist:
         return HttpResponse(escape("{0} has never accessed problem {1}".format(student_username, location)))
 
-    history_entries = StudentModuleHistory.objects.filter(
+    history_entries = StudentModuleHistory.with_full_states(StudentModuleHistory.objects.filter(
         student_module=student_module
-    ).order_by('-id')
+    ).order_by('-id'))
 
     # If no history records exist, let's force a save to get history started.
     if not history_entries:
         student_module.save()
-        history_entries = StudentModuleHistory.objects.filter(
+        history_entries = StudentModuleHistory.with_full_states(StudentModuleHistory.objects.filter(
             student_module=student_module
-        ).order_by('-id')
+        ).order_by('-id'))
 
     context = {
         'history_entries': history_entries,
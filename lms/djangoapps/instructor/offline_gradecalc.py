@@ -89,7 +89,9 @@ def student_grades(student, request, course, keep_raw_scores=False, use_offline=
     '''
 
     if not use_offline:
-        return grades.grade(student, request, course, keep_raw_scores=keep_raw_scores)
+        if keep_raw_scores:
+            return grades.grade(student, request, course, keep_raw_scores=True)
+        return grades.cached_grade(student, request, course)
 
     try:
         ocg = models.OfflineComputedGrade.objects.get(user=student, course_id=course.id)
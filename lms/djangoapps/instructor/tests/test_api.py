@@ -783,8 +783,8 @@ class TestInstructorAPILevelsDataDump(ModuleStoreTestCase, LoginEnrollmentTestCa
         Test the CSV output for the anonymized user ids.
         """
         url = reverse('get_anon_ids', kwargs={'course_id': self.course.id})
-        with patch('instructor.views.api.unique_id_for_user') as mock_unique:
-            mock_unique.return_value = '42'
+        with patch('instructor.views.api.anonymous_ids_for_users') as mock_anonymous_ids:
+            mock_anonymous_ids.side_effect = lambda users, course_id: dict((user.id, '42') for user in users)
             response = self.client.get(url, {})
         self.assertEqual(response['Content-Type'], 'text/csv')
         body = response.content.replace('\r', '')
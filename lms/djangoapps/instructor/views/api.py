@@ -28,7 +28,7 @@ from django_comment_common.models import (Role,
                                           FORUM_ROLE_COMMUNITY_TA)
 
 from courseware.models import StudentModule
-from student.models import unique_id_for_user
+from student.models import anonymous_ids_for_users
 import instructor_task.api
 from instructor_task.api_helper import AlreadyRunningError
 from instructor_task.views import get_task_completion_info
@@ -449,7 +449,8 @@ def get_anon_ids(request, course_id):  # pylint: disable=W0613
         courseenrollment__course_id=course_id,
     ).order_by('id')
     header = ['User ID', 'Anonymized user ID']
-    rows = [[s.id, unique_id_for_user(s)] for s in students]
+    anonymous_ids = anonymous_ids_for_users(students, '')
+    rows = [[s.id, anonymous_ids[s.id]] for s in students]
     return csv_response(course_id.replace('/', '-') + '-anon-ids.csv', header, rows)
 
 
@@ -9,6 +9,7 @@ from courseware.module_render import get_xqueue_callback_url_prefix
 
 from xmodule.modulestore.django import modulestore
 from instructor_task.models import InstructorTask, PROGRESS
+from instructor_task.subtasks import update_instructor_task_from_subtasks
 
 
 log = logging.getLogger(__name__)
@@ -96,9 +97,9 @@ def _update_instructor_task(instructor_task, task_result):
 
     Tasks that are in progress and have subtasks doing the processing do not look
     to the task's AsyncResult object.  When subtasks are running, the
-    InstructorTask object itself is updated with the subtasks' progress,
-    not any AsyncResult object.  In this case, the InstructorTask is
-    not updated at all.
+    InstructorTask's progress is aggregated from the status of its subtasks,
+    not from any AsyncResult object.  In this case, the InstructorTask is
+    only saved if all the subtasks are done.
 
     Calculates json to store in "task_output" field of the `instructor_task`,
     as well as updating the task_state.
@@ -128,8 +129,10 @@ def _update_instructor_task(instructor_task, task_result):
         # meaning that the subtasks have successfully been defined.  However, the InstructorTask
         # will be marked as in PROGRESS, until the last subtask completes and marks it as SUCCESS.
         # We want to ignore the parent SUCCESS if subtasks are still running, and just trust the
-        # contents of the InstructorTask.
+        # status of the subtasks.
         entry_needs_updating = False
+        if update_instructor_task_from_subtasks(instructor_task):
+            instructor_task.save()
     elif result_state in [PROGRESS, SUCCESS]:
         # construct a status message directly from the task result's result:
         # it needs to go back with the entry passed in.
@@ -12,7 +12,7 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
-from cStringIO import StringIO
+from contextlib import contextmanager
 from gzip import GzipFile
 from uuid import uuid4
 import csv
@@ -20,6 +20,7 @@ import json
 import hashlib
 import os
 import os.path
+import tempfile
 import urllib
 
 from boto.s3.connection import S3Connection
@@ -189,12 +190,42 @@ class InstructorTask(models.Model):
         return json.dumps({'message': 'Task revoked before running'})
 
 
+class InstructorSubtask(models.Model):
+    """
+    Stores the status of one subtask of an InstructorTask (see instructor_task.subtasks).
+
+    Each subtask updates only its own row; so, subtasks finishing at the same time
+    don't contend for a lock on their InstructorTask, and an update doesn't depend on
+    the number of subtasks.  The progress of the InstructorTask is aggregated from
+    these rows when it is read, and when its last subtask completes.
+
+    The status fields match the attributes of instructor_task.subtasks.SubtaskStatus:
+    `attempted`, `succeeded`, `failed` and `skipped` count the items the subtask processed,
+    `retried_nomax` and `retried_withmax` count its retries, and `state` is its celery state.
+    """
+    STATUS_FIELDS = ('attempted', 'succeeded', 'failed', 'skipped', 'retried_nomax', 'retried_withmax', 'state')
+
+    instructor_task = models.ForeignKey(InstructorTask, db_index=True)
+    task_id = models.CharField(max_length=255, unique=True)  # max_length from celery_taskmeta
+    state = models.CharField(max_length=50, db_index=True)  # max_length from celery_taskmeta
+    attempted = models.IntegerField(default=0)
+    succeeded = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    retried_nomax = models.IntegerField(default=0)
+    retried_withmax = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return u"InstructorSubtask<{0} of task {1}: {2}>".format(self.task_id, self.instructor_task_id, self.state)
+
+
 class GradesStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for grades
-    download. Should probably refactor later to create a GradesFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download. Rows can either be passed in all at once (`store_rows()`), or
+    written out one at a time (`open_rows()`) so that the whole dataset never
+    has to be held in memory.
     """
     @classmethod
     def from_config(cls):
@@ -208,6 +239,22 @@ class GradesStore(object):
         elif storage_type.lower() == "localfs":
             return LocalFSGradesStore.from_config()
 
+    def open_rows(self, course_id, filename):
+        """
+        Return a context manager giving a `csv.writer` to write the rows of the
+        file `filename` for `course_id` with. The file is stored once the
+        context exits without an error, so only complete files are ever stored.
+        """
+        raise NotImplementedError
+
+    def store_rows(self, course_id, filename, rows):
+        """
+        Given a `course_id`, `filename`, and `rows` (each row is an iterable of
+        strings), store them as a csv file.
+        """
+        with self.open_rows(course_id, filename) as writer:
+            writer.writerows(rows)
+
 
 class S3GradesStore(GradesStore):
     """
@@ -294,21 +341,35 @@ class S3GradesStore(GradesStore):
             }
         )
 
-    def store_rows(self, course_id, filename, rows):
+    @contextmanager
+    def open_rows(self, course_id, filename):
         """
-        Given a `course_id`, `filename`, and `rows` (each row is an iterable of
-        strings), create a buffer that is a gzip'd csv file, and then `store()`
-        that buffer.
+        Yield a `csv.writer` that writes a gzip'd csv file to a temporary file,
+        which is uploaded to the key for `course_id` and `filename` once the
+        context exits.
 
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
         """
-        output_buffer = StringIO()
-        gzip_file = GzipFile(fileobj=output_buffer, mode="wb")
-        csv.writer(gzip_file).writerows(rows)
-        gzip_file.close()
-
-        self.store(course_id, filename, output_buffer)
+        with tempfile.TemporaryFile() as temp_file:
+            gzip_file = GzipFile(fileobj=temp_file, mode="wb")
+            yield csv.writer(gzip_file)
+            gzip_file.close()
+
+            size = temp_file.tell()
+            temp_file.seek(0)
+
+            key = self.key_for(course_id, filename)
+            key.content_encoding = "gzip"
+            key.content_type = "text/csv"
+            key.set_contents_from_file(
+                temp_file,
+                headers={
+                    "Content-Encoding": "gzip",
+                    "Content-Length": size,
+                    "Content-Type": "text/csv",
+                }
+            )
 
     def links_for(self, course_id):
         """
@@ -377,14 +438,26 @@ class LocalFSGradesStore(GradesStore):
         with open(full_path, "wb") as f:
             f.write(buff.getvalue())
 
-    def store_rows(self, course_id, filename, rows):
+    @contextmanager
+    def open_rows(self, course_id, filename):
         """
-        Given a course_id, filename, and rows (each row is an iterable of strings),
-        write this data out.
+        Yield a `csv.writer` that writes to a temporary file, which is moved to
+        the path for `course_id` and `filename` once the context exits.
         """
-        output_buffer = StringIO()
-        csv.writer(output_buffer).writerows(rows)
-        self.store(course_id, filename, output_buffer)
+        full_path = self.path_to(course_id, filename)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+
+        # keep the temporary file out of the course's directory, so it isn't listed by links_for()
+        temp_file = tempfile.NamedTemporaryFile(dir=self.root_path, delete=False)
+        try:
+            with temp_file:
+                yield csv.writer(temp_file)
+            os.rename(temp_file.name, full_path)
+        finally:
+            if os.path.exists(temp_file.name):
+                os.remove(temp_file.name)
 
     def links_for(self, course_id):
         """
@@ -11,9 +11,11 @@ from celery.states import SUCCESS, READY_STATES, RETRY
 from dogapi import dog_stats_api
 
 from django.db import transaction, DatabaseError
+from django.db.models import Count, Sum
+from django.utils import timezone
 from django.core.cache import cache
 
-from instructor_task.models import InstructorTask, PROGRESS, QUEUING
+from instructor_task.models import InstructorTask, InstructorSubtask, PROGRESS, QUEUING
 
 TASK_LOG = get_task_logger(__name__)
 
@@ -22,6 +24,8 @@ SUBTASK_LOCK_EXPIRE = 60 * 10  # Lock expires in 10 minutes
 # Number of times to retry if a subtask update encounters a lock on the InstructorTask.
 # (These are recursive retries, so don't make this number too large.)
 MAX_DATABASE_LOCK_RETRIES = 5
+# Number of InstructorSubtask rows to insert per query when subtasks are defined.
+SUBTASK_CREATE_BATCH_SIZE = 500
 
 
 class DuplicateTaskException(Exception):
@@ -197,9 +201,9 @@ def initialize_subtask_info(entry, action_name, total_num, subtask_id_list):
     Once the counters for 'succeeded' and 'failed' match the 'total', the subtasks are done and
     the InstructorTask's "status" will be changed to SUCCESS.
 
-    The "subtasks" field also contains a 'status' key, that contains a dict that stores status
-    information for each subtask.  The value for each subtask (keyed by its task_id)
-    is its subtask status, as defined by SubtaskStatus.to_dict().
+    The status of each subtask is stored in its own InstructorSubtask row, which starts
+    out with the values of a new SubtaskStatus.  Keeping them out of the InstructorTask lets
+    each subtask update its status without locking the InstructorTask.
 
     This information needs to be set up in the InstructorTask before any of the subtasks start
     running.  If not, there is a chance that the subtasks could complete before the parent task
@@ -225,22 +229,111 @@ def initialize_subtask_info(entry, action_name, total_num, subtask_id_list):
 
     # Write out the subtasks information.
     num_subtasks = len(subtask_id_list)
-    # Note that may not be necessary to store initial value with all those zeroes!
-    # Write out as a dict, so it will go more smoothly into json.
-    subtask_status = {subtask_id: (SubtaskStatus.create(subtask_id)).to_dict() for subtask_id in subtask_id_list}
     subtask_dict = {
         'total': num_subtasks,
         'succeeded': 0,
         'failed': 0,
-        'status': subtask_status
     }
     entry.subtasks = json.dumps(subtask_dict)
+    _create_subtask_statuses(entry, subtask_id_list)
 
     # and save the entry immediately, before any subtasks actually start work:
     entry.save_now()
     return task_progress
 
 
+@transaction.autocommit
+def _create_subtask_statuses(entry, subtask_id_list):
+    """
+    Creates an InstructorSubtask row with the initial status of each of the subtasks of `entry`.
+
+    Any rows left over from a previous definition of the subtasks of `entry` are removed first.
+    The rows are committed immediately, so that the subtasks can find them as soon as they start.
+    """
+    InstructorSubtask.objects.filter(instructor_task=entry).delete()
+    for start in range(0, len(subtask_id_list), SUBTASK_CREATE_BATCH_SIZE):
+        InstructorSubtask.objects.bulk_create([
+            InstructorSubtask(instructor_task=entry, task_id=subtask_id, state=QUEUING)
+            for subtask_id in subtask_id_list[start:start + SUBTASK_CREATE_BATCH_SIZE]
+        ])
+
+
+def get_subtask_status(entry_id, subtask_id):
+    """
+    Returns the SubtaskStatus stored for the subtask `subtask_id` of the InstructorTask `entry_id`.
+
+    Returns None if the InstructorTask has no such subtask.
+    """
+    try:
+        subtask = InstructorSubtask.objects.get(instructor_task=entry_id, task_id=subtask_id)
+    except InstructorSubtask.DoesNotExist:
+        return None
+    status = {field: getattr(subtask, field) for field in InstructorSubtask.STATUS_FIELDS}
+    return SubtaskStatus.create(subtask_id, **status)
+
+
+def update_instructor_task_from_subtasks(entry):
+    """
+    Aggregates the status of the subtasks of the InstructorTask `entry` into its progress.
+
+    The InstructorTask's "task_output" field is updated in place (but not saved).  The values for
+    'attempted', 'succeeded', 'failed', 'skipped' are the sums of the values of the subtasks that
+    are done.  Also updates the 'duration_ms' value with the current interval since the original
+    InstructorTask started.  Note that this value is only approximate, since the subtask may be
+    running on a different server than the original task, so is subject to clock skew.
+
+    The InstructorTask's "subtasks" field is also updated, with the number of subtasks that
+    'succeeded' and 'failed'.  Once these match the 'total', the subtasks are done and the
+    InstructorTask's "status" is changed to SUCCESS.
+
+    This takes a single query, regardless of the number of subtasks, and gives the same result
+    however many times it is called; so it is used both when the progress is read and when the last
+    subtask completes.
+
+    Returns True if all the subtasks are done.
+    """
+    subtask_dict = json.loads(entry.subtasks)
+    task_progress = json.loads(entry.task_output)
+    counts_by_state = InstructorSubtask.objects.filter(
+        instructor_task=entry, state__in=READY_STATES
+    ).values('state').annotate(
+        num_subtasks=Count('id'),
+        num_attempted=Sum('attempted'),
+        num_succeeded=Sum('succeeded'),
+        num_failed=Sum('failed'),
+        num_skipped=Sum('skipped'),
+    )
+
+    subtask_dict['succeeded'] = 0
+    subtask_dict['failed'] = 0
+    for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
+        task_progress[statname] = 0
+    for counts in counts_by_state:
+        if counts['state'] == SUCCESS:
+            subtask_dict['succeeded'] += counts['num_subtasks']
+        else:
+            subtask_dict['failed'] += counts['num_subtasks']
+        for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
+            task_progress[statname] += counts['num_' + statname]
+
+    # Set the estimate of duration, but only if it
+    # increases.  Clock skew between time() returned by different machines
+    # may result in non-monotonic values for duration.
+    new_duration = int((time() - task_progress['start_time']) * 1000)
+    task_progress['duration_ms'] = max(task_progress['duration_ms'], new_duration)
+
+    # If we're done with the last task, update the parent status to indicate that.
+    # At present, we mark the task as having succeeded.  In future, we should see
+    # if there was a catastrophic failure that occurred, and figure out how to
+    # report that here.
+    num_remaining = subtask_dict['total'] - subtask_dict['succeeded'] - subtask_dict['failed']
+    if num_remaining <= 0:
+        entry.task_state = SUCCESS
+    entry.subtasks = json.dumps(subtask_dict)
+    entry.task_output = InstructorTask.create_output_for_success(task_progress)
+    return num_remaining <= 0
+
+
 def queue_subtasks_for_query(entry, action_name, create_subtask_fcn, item_queryset, item_fields, items_per_query, items_per_task):
     """
     Generates and queues subtasks to each execute a chunk of "items" generated by a queryset.
@@ -369,9 +462,8 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
         raise DuplicateTaskException(msg)
 
     # Confirm that the InstructorTask knows about this particular subtask.
-    subtask_dict = json.loads(entry.subtasks)
-    subtask_status_info = subtask_dict['status']
-    if current_task_id not in subtask_status_info:
+    subtask_status = get_subtask_status(entry_id, current_task_id)
+    if subtask_status is None:
         format_str = "Unexpected task_id '{}': unable to find status for subtask of instructor task '{}': rejecting task {}"
         msg = format_str.format(current_task_id, entry, new_subtask_status)
         TASK_LOG.warning(msg)
@@ -380,7 +472,6 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
 
     # Confirm that the InstructorTask doesn't think that this subtask has already been
     # performed successfully.
-    subtask_status = SubtaskStatus.from_dict(subtask_status_info[current_task_id])
     subtask_state = subtask_status.state
     if subtask_state in READY_STATES:
         format_str = "Unexpected task_id '{}': already completed - status {} for subtask of instructor task '{}': rejecting task {}"
@@ -416,12 +507,10 @@ def check_subtask_is_valid(entry_id, current_task_id, new_subtask_status):
 
 def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_count=0):
     """
-    Update the status of the subtask in the parent InstructorTask object tracking its progress.
+    Update the status of the subtask, and of the parent InstructorTask object once all its subtasks are done.
 
-    Because select_for_update is used to lock the InstructorTask object while it is being updated,
-    multiple subtasks updating at the same time may time out while waiting for the lock.
     The actual update operation is surrounded by a try/except/else that permits the update to be
-    retried if the transaction times out.
+    retried if it fails with a DatabaseError (e.g. a lock wait timeout).
 
     The subtask lock acquired in the call to check_subtask_is_valid() is released here, only when
     the attempting of retries has concluded.
@@ -448,97 +537,55 @@ def update_subtask_status(entry_id, current_task_id, new_subtask_status, retry_c
         _release_subtask_lock(current_task_id)
 
 
-@transaction.commit_manually
+@transaction.autocommit
 def _update_subtask_status(entry_id, current_task_id, new_subtask_status):
     """
-    Update the status of the subtask in the parent InstructorTask object tracking its progress.
-
-    Uses select_for_update to lock the InstructorTask object while it is being updated.
-    The operation is surrounded by a try/except/else that permit the manual transaction to be
-    committed on completion, or rolled back on error.
+    Update the status of the subtask in its InstructorSubtask row.
 
-    The InstructorTask's "task_output" field is updated.  This is a JSON-serialized dict.
-    Accumulates values for 'attempted', 'succeeded', 'failed', 'skipped' from `new_subtask_status`
-    into the corresponding values in the InstructorTask's task_output.  Also updates the 'duration_ms'
-    value with the current interval since the original InstructorTask started.  Note that this
-    value is only approximate, since the subtask may be running on a different server than the
-    original task, so is subject to clock skew.
+    This writes only the row of the subtask, so subtasks updating at the same time don't wait on
+    each other, and it takes the same time however many subtasks the InstructorTask has.  Each
+    write is committed immediately, so that the subtasks see each other's states.
 
-    The InstructorTask's "subtasks" field is also updated.  This is also a JSON-serialized dict.
-    Keys include 'total', 'succeeded', 'retried', 'failed', which are counters for the number of
-    subtasks.  'Total' is expected to have been set at the time the subtasks were created.
-    The other three counters are incremented depending on the value of `status`.  Once the counters
-    for 'succeeded' and 'failed' match the 'total', the subtasks are done and the InstructorTask's
-    "status" is changed to SUCCESS.
-
-    The "subtasks" field also contains a 'status' key, that contains a dict that stores status
-    information for each subtask.  At the moment, the value for each subtask (keyed by its task_id)
-    is the value of the SubtaskStatus.to_dict(), but could be expanded in future to store information
-    about failure messages, progress made, etc.
+    The progress of the parent InstructorTask is aggregated from the rows of all its subtasks by
+    update_instructor_task_from_subtasks() when it is read.  When a subtask is done, it also
+    checks whether it was the last one; if so, the InstructorTask is updated and saved with its
+    final progress and the SUCCESS state.
     """
     TASK_LOG.info("Preparing to update status for subtask %s for instructor task %d with status %s",
                   current_task_id, entry_id, new_subtask_status)
 
+    status = {field: getattr(new_subtask_status, field) for field in InstructorSubtask.STATUS_FIELDS}
+    # update() doesn't set auto_now fields
+    status['updated'] = timezone.now()
+    num_updated = InstructorSubtask.objects.filter(
+        instructor_task=entry_id, task_id=current_task_id
+    ).update(**status)
+    if num_updated == 0:
+        # unexpected error -- raise an exception
+        format_str = "Unexpected task_id '{}': unable to update status for subtask of instructor task '{}'"
+        msg = format_str.format(current_task_id, entry_id)
+        TASK_LOG.warning(msg)
+        raise ValueError(msg)
+
+    # Only the completion of a subtask can complete the parent task.
+    if new_subtask_status.state not in READY_STATES:
+        return
+    subtasks_running = InstructorSubtask.objects.filter(
+        instructor_task=entry_id
+    ).exclude(state__in=READY_STATES).exists()
+    if subtasks_running:
+        return
+
+    # This is the last subtask to complete (or one of several completing at the same time, which
+    # all save the same result).
     try:
-        entry = InstructorTask.objects.select_for_update().get(pk=entry_id)
-        subtask_dict = json.loads(entry.subtasks)
-        subtask_status_info = subtask_dict['status']
-        if current_task_id not in subtask_status_info:
-            # unexpected error -- raise an exception
-            format_str = "Unexpected task_id '{}': unable to update status for subtask of instructor task '{}'"
-            msg = format_str.format(current_task_id, entry_id)
-            TASK_LOG.warning(msg)
-            raise ValueError(msg)
-
-        # Update status:
-        subtask_status_info[current_task_id] = new_subtask_status.to_dict()
-
-        # Update the parent task progress.
-        # Set the estimate of duration, but only if it
-        # increases.  Clock skew between time() returned by different machines
-        # may result in non-monotonic values for duration.
-        task_progress = json.loads(entry.task_output)
-        start_time = task_progress['start_time']
-        prev_duration = task_progress['duration_ms']
-        new_duration = int((time() - start_time) * 1000)
-        task_progress['duration_ms'] = max(prev_duration, new_duration)
-
-        # Update counts only when subtask is done.
-        # In future, we can make this more responsive by updating status
-        # between retries, by comparing counts that change from previous
-        # retry.
-        new_state = new_subtask_status.state
-        if new_subtask_status is not None and new_state in READY_STATES:
-            for statname in ['attempted', 'succeeded', 'failed', 'skipped']:
-                task_progress[statname] += getattr(new_subtask_status, statname)
-
-        # Figure out if we're actually done (i.e. this is the last task to complete).
-        # This is easier if we just maintain a counter, rather than scanning the
-        # entire new_subtask_status dict.
-        if new_state == SUCCESS:
-            subtask_dict['succeeded'] += 1
-        elif new_state in READY_STATES:
-            subtask_dict['failed'] += 1
-        num_remaining = subtask_dict['total'] - subtask_dict['succeeded'] - subtask_dict['failed']
-
-        # If we're done with the last task, update the parent status to indicate that.
-        # At present, we mark the task as having succeeded.  In future, we should see
-        # if there was a catastrophic failure that occurred, and figure out how to
-        # report that here.
-        if num_remaining <= 0:
-            entry.task_state = SUCCESS
-        entry.subtasks = json.dumps(subtask_dict)
-        entry.task_output = InstructorTask.create_output_for_success(task_progress)
-
-        TASK_LOG.debug("about to save....")
-        entry.save()
-        TASK_LOG.info("Task output updated to %s for subtask %s of instructor task %d",
-                      entry.task_output, current_task_id, entry_id)
+        entry = InstructorTask.objects.get(pk=entry_id)
+        if update_instructor_task_from_subtasks(entry):
+            TASK_LOG.debug("about to save....")
+            entry.save()
+            TASK_LOG.info("Task output updated to %s for subtask %s of instructor task %d",
+                          entry.task_output, current_task_id, entry_id)
     except Exception:
         TASK_LOG.exception("Unexpected error while updating InstructorTask.")
-        transaction.rollback()
         dog_stats_api.increment('instructor_task.subtask.update_exception')
         raise
-    else:
-        TASK_LOG.debug("about to commit....")
-        transaction.commit()
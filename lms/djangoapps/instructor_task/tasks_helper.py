@@ -19,7 +19,8 @@ from pytz import UTC
 from xmodule.modulestore.django import modulestore
 from track.views import task_track
 
-from courseware.grades import iterate_grades_for
+from courseware.courses import get_course_by_id
+from courseware.grades import iterate_grades_for, section_breakdown_labels
 from courseware.models import StudentModule
 from courseware.model_data import FieldDataCache
 from courseware.module_render import get_module_for_descriptor_internal
@@ -475,13 +476,10 @@ def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input,
     For a given `course_id`, generate a grades CSV file for all students that
     are enrolled, and store using a `GradesStore`. Once created, the files can
     be accessed by instantiating another `GradesStore` (via
-    `GradesStore.from_config()`) and calling `link_for()` on it. Writes are
-    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
-    that are visible in GradesStore will be complete ones.
-
-    As we start to add more CSV downloads, it will probably be worthwhile to
-    make a more general CSVDoc class instead of building out the rows like we
-    do here.
+    `GradesStore.from_config()`) and calling `link_for()` on it. Rows are
+    written out as students are graded, but files are only stored once
+    complete -- i.e. any files that are visible in GradesStore will be complete
+    ones.
     """
     start_time = datetime.now(UTC)
     status_interval = 100
@@ -509,58 +507,59 @@ def push_grades_to_s3(_xmodule_instance_args, _entry_id, course_id, _task_input,
 
         return progress
 
-    # Loop over all our students and build our CSV lists in memory
-    header = None
-    rows = []
-    err_rows = [["id", "username", "error_msg"]]
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
-        # Periodically update task status (this is a cache write)
-        if num_attempted % status_interval == 0:
-            update_task_progress()
-        num_attempted += 1
-
-        if gradeset:
-            # We were able to successfully grade this student for this course.
-            num_succeeded += 1
-            if not header:
-                # Encode the header row in utf-8 encoding in case there are unicode characters
-                header = [section['label'].encode('utf-8') for section in gradeset[u'section_breakdown']]
-                rows.append(["id", "email", "username", "grade"] + header)
-
-            percents = {
-                section['label']: section.get('percent', 0.0)
-                for section in gradeset[u'section_breakdown']
-                if 'label' in section
-            }
-
-            # Not everybody has the same gradable items. If the item is not
-            # found in the user's gradeset, just assume it's a 0. The aggregated
-            # grades for their sections and overall course will be calculated
-            # without regard for the item they didn't have access to, so it's
-            # possible for a student to have a 0.0 show up in their row but
-            # still have 100% for the course.
-            row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append([student.id, student.email, student.username, gradeset['percent']] + row_percents)
-        else:
-            # An empty gradeset means we failed to grade a student.
-            num_failed += 1
-            err_rows.append([student.id, student.username, err_msg])
-
-    # By this point, we've got the rows we're going to stuff into our CSV files.
-    curr_step = "Uploading CSVs"
-    update_task_progress()
-
     # Generate parts of the file name
     timestamp_str = start_time.strftime("%Y-%m-%d-%H%M")
     course_id_prefix = urllib.quote(course_id.replace("/", "_"))
 
-    # Perform the actual upload
+    # The sections in the header are determined by the grading policy, so are
+    # the same for all students
+    header = section_breakdown_labels(get_course_by_id(course_id))
+
+    # Loop over all our students, writing out their rows as we go
     grades_store = GradesStore.from_config()
-    grades_store.store_rows(
+    err_rows = [["id", "username", "error_msg"]]
+    with grades_store.open_rows(
         course_id,
-        "{}_grade_report_{}.csv".format(course_id_prefix, timestamp_str),
-        rows
-    )
+        "{}_grade_report_{}.csv".format(course_id_prefix, timestamp_str)
+    ) as writer:
+        # Encode the header row in utf-8 encoding in case there are unicode characters
+        writer.writerow(["id", "email", "username", "grade"] + [label.encode('utf-8') for label in header])
+
+        # Don't let the queryset cache every student
+        for student, gradeset, err_msg in iterate_grades_for(
+            course_id, enrolled_students.iterator(), use_persisted=True
+        ):
+            # Periodically update task status (this is a cache write)
+            if num_attempted % status_interval == 0:
+                update_task_progress()
+            num_attempted += 1
+
+            if gradeset:
+                # We were able to successfully grade this student for this course.
+                num_succeeded += 1
+
+                percents = {
+                    section['label']: section.get('percent', 0.0)
+                    for section in gradeset[u'section_breakdown']
+                    if 'label' in section
+                }
+
+                # Not everybody has the same gradable items. If the item is not
+                # found in the user's gradeset, just assume it's a 0. The aggregated
+                # grades for their sections and overall course will be calculated
+                # without regard for the item they didn't have access to, so it's
+                # possible for a student to have a 0.0 show up in their row but
+                # still have 100% for the course.
+                row_percents = [percents.get(label, 0.0) for label in header]
+                writer.writerow([student.id, student.email, student.username, gradeset['percent']] + row_percents)
+            else:
+                # An empty gradeset means we failed to grade a student.
+                num_failed += 1
+                err_rows.append([student.id, student.username, err_msg])
+
+        # By this point, we've written all the rows; the file is stored when we're done here.
+        curr_step = "Uploading CSVs"
+        update_task_progress()
 
     # If there are any error rows (don't count the header), write them out as well
     if len(err_rows) > 1:
@@ -0,0 +1,55 @@
+"""
+Tests for the GradesStore classes in instructor_task.models
+"""
+import csv
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from instructor_task.models import LocalFSGradesStore
+
+COURSE_ID = 'edX/test/2013_Fall'
+
+
+class TestLocalFSGradesStore(TestCase):
+    """
+    Test writing grade reports to the local filesystem.
+    """
+    def setUp(self):
+        self.root_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root_path)
+        self.store = LocalFSGradesStore(self.root_path)
+
+    def _read_rows(self, filename):
+        """Return the rows of the csv file `filename` of the course."""
+        with open(self.store.path_to(COURSE_ID, filename)) as csv_file:
+            return list(csv.reader(csv_file))
+
+    def test_open_rows(self):
+        with self.store.open_rows(COURSE_ID, 'grades.csv') as writer:
+            writer.writerow(['id', 'grade'])
+            # nothing is visible until all the rows have been written
+            self.assertEqual(self.store.links_for(COURSE_ID), [])
+            writer.writerow([1, 0.5])
+
+        self.assertEqual([filename for filename, _ in self.store.links_for(COURSE_ID)], ['grades.csv'])
+        self.assertEqual(self._read_rows('grades.csv'), [['id', 'grade'], ['1', '0.5']])
+
+    def test_open_rows_error(self):
+        with self.assertRaises(ValueError):
+            with self.store.open_rows(COURSE_ID, 'grades.csv') as writer:
+                writer.writerow(['id', 'grade'])
+                raise ValueError
+
+        # incomplete files are neither stored nor left behind
+        self.assertEqual(self.store.links_for(COURSE_ID), [])
+        self.assertEqual(os.listdir(self.root_path), [os.path.basename(os.path.dirname(
+            self.store.path_to(COURSE_ID, 'grades.csv')
+        ))])
+
+    def test_store_rows(self):
+        rows = [['id', 'grade'], ['1', '0.5'], ['2', '1.0']]
+        self.store.store_rows(COURSE_ID, 'grades.csv', rows)
+        self.assertEqual(self._read_rows('grades.csv'), rows)
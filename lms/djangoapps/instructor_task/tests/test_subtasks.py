@@ -0,0 +1,73 @@
+"""
+Tests of the subtask status stored in InstructorSubtask rows
+"""
+import json
+from uuid import uuid4
+
+from celery.states import SUCCESS, FAILURE, RETRY
+from django.test import TestCase
+from mock import patch
+
+from instructor_task.api_helper import get_updated_instructor_task
+from instructor_task.models import InstructorTask, InstructorSubtask, PROGRESS
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    get_subtask_status,
+    initialize_subtask_info,
+    update_subtask_status,
+)
+from instructor_task.tests.factories import InstructorTaskFactory
+
+
+class TestSubtaskStatus(TestCase):
+    """
+    Test updating the subtasks of an InstructorTask and aggregating their progress.
+    """
+    def setUp(self):
+        self.entry = InstructorTaskFactory.create(task_id=str(uuid4()), task_key='key')
+        self.subtask_ids = [str(uuid4()) for _ in range(3)]
+        initialize_subtask_info(self.entry, 'emailed', 30, self.subtask_ids)
+
+    def _complete(self, subtask_id, state=SUCCESS, succeeded=10, failed=0):
+        """Mark the subtask `subtask_id` as done."""
+        status = SubtaskStatus.create(subtask_id, succeeded=succeeded, failed=failed, state=state)
+        update_subtask_status(self.entry.id, subtask_id, status)
+
+    def test_initialize(self):
+        self.assertEqual(InstructorSubtask.objects.filter(instructor_task=self.entry).count(), 3)
+        self.assertEqual(json.loads(self.entry.subtasks), {'total': 3, 'succeeded': 0, 'failed': 0})
+        status = get_subtask_status(self.entry.id, self.subtask_ids[0])
+        self.assertEqual(status.to_dict(), SubtaskStatus.create(self.subtask_ids[0]).to_dict())
+        self.assertIsNone(get_subtask_status(self.entry.id, 'bogus-subtask-id'))
+
+    def test_update_is_a_single_write(self):
+        status = SubtaskStatus.create(self.subtask_ids[0], retried_nomax=1, state=RETRY)
+        # the subtask's row is updated, without reading or locking the InstructorTask
+        with self.assertNumQueries(1):
+            update_subtask_status(self.entry.id, self.subtask_ids[0], status)
+        self.assertEqual(get_subtask_status(self.entry.id, self.subtask_ids[0]).to_dict(), status.to_dict())
+
+    def test_progress_is_aggregated_when_read(self):
+        self._complete(self.subtask_ids[0])
+        self._complete(self.subtask_ids[1], state=FAILURE, succeeded=4, failed=6)
+
+        with patch('instructor_task.api_helper.AsyncResult') as mock_result:
+            mock_result.return_value.state = SUCCESS
+            entry = get_updated_instructor_task(self.entry.task_id)
+        self.assertEqual(entry.task_state, PROGRESS)
+        progress = json.loads(entry.task_output)
+        self.assertEqual(
+            (progress['attempted'], progress['succeeded'], progress['failed'], progress['total']),
+            (20, 14, 6, 30)
+        )
+        self.assertEqual(json.loads(entry.subtasks), {'total': 3, 'succeeded': 1, 'failed': 1})
+
+    def test_last_subtask_completes_task(self):
+        for subtask_id in self.subtask_ids:
+            self._complete(subtask_id)
+
+        entry = InstructorTask.objects.get(pk=self.entry.id)
+        self.assertEqual(entry.task_state, SUCCESS)
+        progress = json.loads(entry.task_output)
+        self.assertEqual((progress['attempted'], progress['succeeded']), (30, 30))
+        self.assertEqual(json.loads(entry.subtasks), {'total': 3, 'succeeded': 3, 'failed': 0})
@@ -1,6 +1,10 @@
 import datetime
 import json
 import logging
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+from time import time
 
 from django.conf import settings
 
@@ -17,7 +21,20 @@ from .staff_grading_service import StaffGradingService
 
 log = logging.getLogger(__name__)
 
+# Notifications are fresh for NOTIFICATION_CACHE_TIME seconds.  After that, the cached notifications
+# are still shown for up to NOTIFICATION_STALE_TIME seconds, while they are refreshed in the background.
 NOTIFICATION_CACHE_TIME = 300
+NOTIFICATION_STALE_TIME = 60 * 60
+# Only one refresh of each user's notifications is started per NOTIFICATION_REFRESH_LOCK_TIME seconds.
+NOTIFICATION_REFRESH_LOCK_TIME = 30
+# After CIRCUIT_FAILURE_THRESHOLD failures to get notifications within CIRCUIT_FAILURE_WINDOW seconds,
+# no requests are made to the grading controller for CIRCUIT_OPEN_TIME seconds.
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_FAILURE_WINDOW = 60
+CIRCUIT_OPEN_TIME = 30
+# Number of threads of the pool which refreshes notifications in the background, and makes the
+# requests to the grading controller of bulk_combined_notifications.
+BULK_NOTIFICATION_THREADS = 8
 KEY_PREFIX = "open_ended_"
 
 NOTIFICATION_TYPES = (
@@ -27,80 +44,133 @@ NOTIFICATION_TYPES = (
     ('flagged_submissions_exist', 'open_ended_flagged_problems', 'Flagged Submissions')
 )
 
+# The services are created on first use by each thread, and kept for all its requests, so that
+# rendering the course tabs doesn't set up a module system and a session with the grading controller.
+# They aren't shared between threads, as their requests sessions aren't thread safe.
+_services = threading.local()
 
-def staff_grading_notifications(course, user):
-    staff_gs = StaffGradingService(settings.OPEN_ENDED_GRADING_INTERFACE)
-    pending_grading = False
-    img_path = ""
-    course_id = course.id
-    student_id = unique_id_for_user(user)
-    notification_type = "staff"
+# The thread pool of this process, which is created on first use (see _thread_pool).
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
 
-    success, notification_dict = get_value_from_cache(student_id, course_id, notification_type)
-    if success:
-        return notification_dict
 
-    try:
-        notifications = json.loads(staff_gs.get_notifications(course_id))
-        if notifications['success']:
-            if notifications['staff_needs_to_grade']:
-                pending_grading = True
-    except:
-        #Non catastrophic error, so no real action
-        notifications = {}
-        #This is a dev_facing_error
-        log.info(
-            "Problem with getting notifications from staff grading service for course {0} user {1}.".format(course_id,
-                                                                                                            student_id))
+def _service(service_type):
+    """
+    Returns this thread's service of `service_type` ('staff', 'peer' or 'combined') for getting notifications.
+    """
+    service = getattr(_services, service_type, None)
+    if service is None:
+        system = LmsModuleSystem(
+            static_url="/static",
+            track_function=None,
+            get_module=None,
+            render_template=render_to_string,
+            replace_urls=None,
+        )
+        if service_type == 'staff':
+            service = StaffGradingService(settings.OPEN_ENDED_GRADING_INTERFACE)
+        elif service_type == 'peer':
+            service = peer_grading_service.PeerGradingService(settings.OPEN_ENDED_GRADING_INTERFACE, system)
+        else:
+            service = ControllerQueryService(settings.OPEN_ENDED_GRADING_INTERFACE, system)
+        setattr(_services, service_type, service)
+    return service
+
+
+def _thread_pool():
+    """
+    Returns the pool of BULK_NOTIFICATION_THREADS threads of this process which make requests to the grading
+    controller outside of the request threads.
 
-    if pending_grading:
-        img_path = "/static/images/grading_notification.png"
+    It is created on first use, rather than on import, so that processes forked after importing this
+    (which don't inherit its threads) create their own.
+    """
+    global _pool, _pool_pid  # pylint: disable=W0603
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPool(BULK_NOTIFICATION_THREADS)
+            _pool_pid = os.getpid()
+        return _pool
 
-    notification_dict = {'pending_grading': pending_grading, 'img_path': img_path, 'response': notifications}
 
-    set_value_in_cache(student_id, course_id, notification_type, notification_dict)
+def _decode(response):
+    """
+    Returns the json decoded `response` of a grading service (some services decode their responses already).
+    """
+    if isinstance(response, basestring):
+        return json.loads(response)
+    return response
 
-    return notification_dict
+
+def _notification_dict(pending_grading, notifications):
+    """
+    Returns the notifications shown for a user: pending_grading, the image for it, and the controller's response.
+    """
+    img_path = "/static/images/grading_notification.png" if pending_grading else ""
+    return {'pending_grading': pending_grading, 'img_path': img_path, 'response': notifications}
+
+
+def staff_grading_notifications(course, user):
+    course_id = course.id
+    student_id = unique_id_for_user(user)
+
+    def fetch():
+        notifications = _decode(_service('staff').get_notifications(course_id))
+        pending_grading = bool(notifications['success'] and notifications['staff_needs_to_grade'])
+        return pending_grading, notifications
+
+    #This is a dev_facing_error
+    error_message = "Problem with getting notifications from staff grading service for course {0} user {1}.".format(
+        course_id, student_id)
+    return _get_notifications(create_key_name(student_id, course_id, "staff"), fetch, error_message)
 
 
 def peer_grading_notifications(course, user):
-    system = LmsModuleSystem(
-        track_function=None,
-        get_module = None,
-        render_template=render_to_string,
-        replace_urls=None,
-    )
-    peer_gs = peer_grading_service.PeerGradingService(settings.OPEN_ENDED_GRADING_INTERFACE, system)
-    pending_grading = False
-    img_path = ""
     course_id = course.id
     student_id = unique_id_for_user(user)
-    notification_type = "peer"
 
-    success, notification_dict = get_value_from_cache(student_id, course_id, notification_type)
-    if success:
-        return notification_dict
+    def fetch():
+        notifications = _decode(_service('peer').get_notifications(course_id, student_id))
+        pending_grading = bool(notifications['success'] and notifications['student_needs_to_peer_grade'])
+        return pending_grading, notifications
 
-    try:
-        notifications = json.loads(peer_gs.get_notifications(course_id, student_id))
-        if notifications['success']:
-            if notifications['student_needs_to_peer_grade']:
-                pending_grading = True
-    except:
-        #Non catastrophic error, so no real action
-        notifications = {}
-        #This is a dev_facing_error
-        log.info(
-            "Problem with getting notifications from peer grading service for course {0} user {1}.".format(course_id,
-                                                                                                           student_id))
-    if pending_grading:
-        img_path = "/static/images/grading_notification.png"
+    #This is a dev_facing_error
+    error_message = "Problem with getting notifications from peer grading service for course {0} user {1}.".format(
+        course_id, student_id)
+    return _get_notifications(create_key_name(student_id, course_id, "peer"), fetch, error_message)
 
-    notification_dict = {'pending_grading': pending_grading, 'img_path': img_path, 'response': notifications}
 
-    set_value_in_cache(student_id, course_id, notification_type, notification_dict)
+def _combined_notifications_request(course, user):
+    """
+    Returns the cache key, fetch function and error message for the combined notifications of `user` in `course`.
 
-    return notification_dict
+    Everything which needs the database is done here, so that the fetch function can be run
+    in another thread.
+    """
+    student_id = unique_id_for_user(user)
+    user_is_staff = has_access(user, course, 'staff')
+    course_id = course.id
+
+    #Get the time of the last login of the user
+    last_login = user.last_login
+    last_time_viewed = last_login - datetime.timedelta(seconds=(NOTIFICATION_CACHE_TIME + 60))
+
+    def fetch():
+        #Get the notifications from the grading controller
+        controller_response = _service('combined').check_combined_notifications(
+            course_id, student_id, user_is_staff, last_time_viewed
+        )
+        notifications = json.loads(controller_response)
+        pending_grading = bool(notifications.get('success') and (
+            notifications.get('staff_needs_to_grade') or notifications.get('student_needs_to_peer_grade')
+        ))
+        return pending_grading, notifications
+
+    #This is a dev_facing_error
+    error_message = "Problem with getting notifications from controller query service for course {0} user {1}.".format(
+        course_id, student_id)
+    return create_key_name(student_id, course_id, "combined"), fetch, error_message
 
 
 def combined_notifications(course, user):
@@ -112,65 +182,145 @@ def combined_notifications(course, user):
     @return: A dictionary with boolean pending_grading (true if there is pending grading), img_path (for notification
     image), and response (actual response from grading controller server).
     """
-    #Set up return values so that we can return them for error cases
-    pending_grading = False
-    img_path = ""
-    notifications={}
-    notification_dict = {'pending_grading': pending_grading, 'img_path': img_path, 'response': notifications}
-
     #We don't want to show anonymous users anything.
     if not user.is_authenticated():
-        return notification_dict
-
-    #Define a mock modulesystem
-    system = LmsModuleSystem(
-        static_url="/static",
-        track_function=None,
-        get_module = None,
-        render_template=render_to_string,
-        replace_urls=None,
-    )
-    #Initialize controller query service using our mock system
-    controller_qs = ControllerQueryService(settings.OPEN_ENDED_GRADING_INTERFACE, system)
-    student_id = unique_id_for_user(user)
-    user_is_staff = has_access(user, course, 'staff')
-    course_id = course.id
-    notification_type = "combined"
+        return _notification_dict(False, {})
 
-    #See if we have a stored value in the cache
-    success, notification_dict = get_value_from_cache(student_id, course_id, notification_type)
-    if success:
-        return notification_dict
+    return _get_notifications(*_combined_notifications_request(course, user))
+
+
+def bulk_combined_notifications(course_user_pairs):
+    """
+    Get the combined notifications for each of a list of (course, user) pairs at once.
+
+    All the cached notifications are read with a single cache query.  The notifications which
+    aren't cached are requested from the grading controller in parallel, by the threads of the
+    process's pool.
+    @param course_user_pairs: A list of (course, user) tuples
+    @return: A list of the dictionaries combined_notifications would return for each pair, in the same order.
+    """
+    results = [_notification_dict(False, {}) for _ in course_user_pairs]
+    requests = [
+        (index, _combined_notifications_request(course, user))
+        for index, (course, user) in enumerate(course_user_pairs)
+        #We don't want to show anonymous users anything.
+        if user.is_authenticated()
+    ]
+
+    entries = _get_cache_entries([key_name for _, (key_name, _, _) in requests])
+    missing = []
+    stale = []
+    for index, request in requests:
+        entry = entries.get(request[0])
+        if entry is None:
+            missing.append((index, request))
+            continue
+        results[index], is_stale = entry
+        if is_stale:
+            stale.append(request)
+
+    if stale:
+        _refresh_in_background(stale)
+    if missing:
+        fetched = _thread_pool().map(lambda item: _refresh_notifications(*item[1]), missing)
+        for (index, _), notification_dict in zip(missing, fetched):
+            results[index] = notification_dict
+    return results
+
+
+def _get_notifications(key_name, fetch, error_message):
+    """
+    Returns the notifications cached under `key_name`.
+
+    Stale notifications are returned as they are, and refreshed in the background.  Notifications
+    which aren't cached at all are requested from the grading controller with `fetch`.
+    """
+    entry = _get_cache_entries([key_name]).get(key_name)
+    if entry is None:
+        return _refresh_notifications(key_name, fetch, error_message)
+    notification_dict, is_stale = entry
+    if is_stale:
+        _refresh_in_background([(key_name, fetch, error_message)])
+    return notification_dict
 
-    #Get the time of the last login of the user
-    last_login = user.last_login
-    last_time_viewed = last_login - datetime.timedelta(seconds=(NOTIFICATION_CACHE_TIME + 60))
 
+def _refresh_notifications(key_name, fetch, error_message, keep_stale=False):
+    """
+    Get notifications from the grading controller with `fetch`, and cache them under `key_name`.
+
+    `fetch` returns whether there is pending grading, and the decoded response of the controller.
+    Errors aren't catastrophic, so they are logged, and no notifications are shown.  If `keep_stale`
+    is set, the cached notifications are kept instead when there is an error.
+    """
+    if _circuit_is_open():
+        return _notification_dict(False, {})
     try:
-        #Get the notifications from the grading controller
-        controller_response = controller_qs.check_combined_notifications(course.id, student_id, user_is_staff,
-                                                                         last_time_viewed)
-        notifications = json.loads(controller_response)
-        if notifications.get('success'):
-            if (notifications.get('staff_needs_to_grade') or
-                notifications.get('student_needs_to_peer_grade')):
-                pending_grading = True
-    except:
+        pending_grading, notifications = fetch()
+    except Exception:
         #Non catastrophic error, so no real action
-        #This is a dev_facing_error
-        log.exception(
-            "Problem with getting notifications from controller query service for course {0} user {1}.".format(
-                course_id, student_id))
+        log.exception(error_message)
+        _record_failure()
+        if keep_stale:
+            return None
+        pending_grading, notifications = False, {}
 
-    if pending_grading:
-        img_path = "/static/images/grading_notification.png"
+    notification_dict = _notification_dict(pending_grading, notifications)
+    #Store the notifications in the cache
+    _set_value_in_cache(key_name, notification_dict)
+    return notification_dict
 
-    notification_dict = {'pending_grading': pending_grading, 'img_path': img_path, 'response': notifications}
 
-    #Store the notifications in the cache
-    set_value_in_cache(student_id, course_id, notification_type, notification_dict)
+def _refresh_in_background(requests):
+    """
+    Refresh the stale notifications of each of `requests`, a list of (key_name, fetch, error_message) tuples,
+    in the background, unless they are already being refreshed.
+    """
+    requests = [
+        request for request in requests
+        if cache.add(request[0] + '_refreshing', True, NOTIFICATION_REFRESH_LOCK_TIME)
+    ]
+    if requests:
+        _run_in_background(_refresh_all, requests)
 
-    return notification_dict
+
+def _refresh_all(requests):
+    """
+    Refresh the notifications of each of `requests`, keeping the stale notifications of any that fail.
+    """
+    for key_name, fetch, error_message in requests:
+        _refresh_notifications(key_name, fetch, error_message, keep_stale=True)
+
+
+def _run_in_background(function, *args):
+    """
+    Call function(*args) in a thread of the process's pool.
+    """
+    _thread_pool().apply_async(function, args)
+
+
+def _circuit_is_open():
+    """
+    Returns True if requests to the grading controller have failed too often recently to make more.
+    """
+    return cache.get(KEY_PREFIX + 'circuit_open') is not None
+
+
+def _record_failure():
+    """
+    Count a failed request to the grading controller, and stop making requests if there have been too many.
+    """
+    failures_key = KEY_PREFIX + 'failures'
+    cache.add(failures_key, 0, CIRCUIT_FAILURE_WINDOW)
+    try:
+        failures = cache.incr(failures_key)
+    except ValueError:
+        # the count expired
+        return
+    if failures >= CIRCUIT_FAILURE_THRESHOLD:
+        log.warning("%d failures getting notifications from the grading controller: not trying again for %d seconds",
+                    failures, CIRCUIT_OPEN_TIME)
+        cache.set(KEY_PREFIX + 'circuit_open', True, CIRCUIT_OPEN_TIME)
+        cache.delete(failures_key)
 
 
 def get_value_from_cache(student_id, course_id, notification_type):
@@ -190,18 +340,30 @@ def create_key_name(student_id, course_id, notification_type):
     return key_name
 
 
+def _get_cache_entries(key_names):
+    """
+    Returns a dict of the cached notifications of each of `key_names` which is cached, and whether they are stale.
+    """
+    entries = {}
+    for key_name, value in cache.get_many(key_names).items():
+        try:
+            value = json.loads(value)
+            entries[key_name] = (value['notifications'], value['refresh_at'] < time())
+        except (ValueError, TypeError, KeyError):
+            pass
+    return entries
+
+
 def _get_value_from_cache(key_name):
-    value = cache.get(key_name)
-    success = False
-    if value is None:
-        return success, value
-    try:
-        value = json.loads(value)
-        success = True
-    except:
-        pass
-    return success, value
+    entry = _get_cache_entries([key_name]).get(key_name)
+    if entry is None:
+        return False, None
+    return True, entry[0]
 
 
 def _set_value_in_cache(key_name, value):
-    cache.set(key_name, json.dumps(value), NOTIFICATION_CACHE_TIME)
+    cache.set(
+        key_name,
+        json.dumps({'notifications': value, 'refresh_at': time() + NOTIFICATION_CACHE_TIME}),
+        NOTIFICATION_STALE_TIME
+    )
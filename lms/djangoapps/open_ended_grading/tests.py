@@ -6,9 +6,13 @@ Tests for open ended grading interfaces
 
 import json
 import logging
+import threading
+import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
 
 from django.conf import settings
-from django.contrib.auth.models import User
+from django.contrib.auth.models import User, AnonymousUser
+from django.core.cache import get_cache
 from django.core.urlresolvers import reverse
 from django.test.utils import override_settings
 from mock import MagicMock, patch, Mock
@@ -30,7 +34,7 @@ from courseware.roles import CourseStaffRole
 from edxmako.shortcuts import render_to_string
 from student.models import unique_id_for_user
 
-from open_ended_grading import staff_grading_service, views, utils
+from open_ended_grading import staff_grading_service, views, utils, open_ended_notifications
 
 log = logging.getLogger(__name__)
 
@@ -468,3 +472,123 @@ class TestStudentProblemList(ModuleStoreTestCase):
         self.assertEqual(len(valid_problems), 2)
         # Ensure that human names are being set properly.
         self.assertEqual(valid_problems[0]['grader_type_display_name'], "Instructor Assessment")
+
+
+class StubControllerRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers the grading controller's combined notifications requests with the server's `notifications`.
+    """
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.server.notifications is None:
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(self.server.notifications))
+
+    def log_message(self, *args):
+        pass
+
+
+class StubController(HTTPServer):
+    """
+    A grading controller on a local port.  Set `notifications` to None to make requests fail.
+    """
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StubControllerRequestHandler)
+        self.requests = []
+        self.notifications = {'success': True, 'student_needs_to_peer_grade': True, 'staff_needs_to_grade': False}
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """Stop the server and free up the port."""
+        self.shutdown()
+        self.socket.close()
+
+
+@override_settings(MODULESTORE=TEST_DATA_MIXED_MODULESTORE)
+class TestCombinedNotifications(ModuleStoreTestCase):
+    """
+    Test caching, refreshing, and bulk fetching the combined notifications from a stub grading controller.
+    """
+    def setUp(self):
+        self.course = modulestore().get_course('edX/open_ended/2012_Fall')
+        self.users = [factories.UserFactory() for _ in range(3)]
+
+        self.controller = StubController()
+        self.addCleanup(self.controller.stop)
+        url = 'http://127.0.0.1:{0}/'.format(self.controller.server_port)
+        for patcher in [
+            patch.dict(settings.OPEN_ENDED_GRADING_INTERFACE, {'url': url}),
+            patch('open_ended_grading.open_ended_notifications._services', threading.local()),
+            patch('open_ended_grading.open_ended_notifications.cache', get_cache(
+                'django.core.cache.backends.locmem.LocMemCache', LOCATION='open_ended_notifications'
+            )),
+            # refresh in the foreground, so that the tests can see the result
+            patch('open_ended_grading.open_ended_notifications._run_in_background', lambda function, *args: function(*args)),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        open_ended_notifications.cache.clear()
+
+    def test_cached(self):
+        notifications = open_ended_notifications.combined_notifications(self.course, self.users[0])
+        self.assertTrue(notifications['pending_grading'])
+        self.assertEqual(notifications['response'], self.controller.notifications)
+
+        self.assertEqual(open_ended_notifications.combined_notifications(self.course, self.users[0]), notifications)
+        self.assertEqual(len(self.controller.requests), 1)
+
+    def test_stale_while_revalidate(self):
+        notifications = open_ended_notifications.combined_notifications(self.course, self.users[0])
+        self.controller.notifications = {'success': True, 'student_needs_to_peer_grade': False}
+
+        later = time.time() + open_ended_notifications.NOTIFICATION_CACHE_TIME + 1
+        with patch('open_ended_grading.open_ended_notifications.time', Mock(return_value=later)):
+            # the stale notifications are shown while they are refreshed
+            self.assertEqual(open_ended_notifications.combined_notifications(self.course, self.users[0]), notifications)
+            self.assertEqual(len(self.controller.requests), 2)
+            self.assertFalse(open_ended_notifications.combined_notifications(self.course, self.users[0])['pending_grading'])
+        self.assertEqual(len(self.controller.requests), 2)
+
+    def test_stale_kept_on_error(self):
+        notifications = open_ended_notifications.combined_notifications(self.course, self.users[0])
+        self.controller.notifications = None
+
+        later = time.time() + open_ended_notifications.NOTIFICATION_CACHE_TIME + 1
+        with patch('open_ended_grading.open_ended_notifications.time', Mock(return_value=later)):
+            self.assertEqual(open_ended_notifications.combined_notifications(self.course, self.users[0]), notifications)
+            # the refresh failed, and isn't retried straight away
+            self.assertEqual(open_ended_notifications.combined_notifications(self.course, self.users[0]), notifications)
+        self.assertEqual(len(self.controller.requests), 2)
+
+    @patch('open_ended_grading.open_ended_notifications.CIRCUIT_FAILURE_THRESHOLD', 2)
+    def test_circuit_breaker(self):
+        self.controller.notifications = None
+        for user in self.users:
+            notifications = open_ended_notifications.combined_notifications(self.course, user)
+            self.assertFalse(notifications['pending_grading'])
+        # no requests are made after the second failure
+        self.assertEqual(len(self.controller.requests), 2)
+
+    def test_bulk(self):
+        cached = open_ended_notifications.combined_notifications(self.course, self.users[0])
+        self.controller.notifications = {'success': True, 'student_needs_to_peer_grade': False}
+
+        pairs = [(self.course, user) for user in self.users] + [(self.course, AnonymousUser())]
+        results = open_ended_notifications.bulk_combined_notifications(pairs)
+        self.assertEqual(results[0], cached)
+        for notifications in results[1:3]:
+            self.assertFalse(notifications['pending_grading'])
+            self.assertEqual(notifications['response'], self.controller.notifications)
+        self.assertEqual(results[3]['response'], {})
+        self.assertEqual(len(self.controller.requests), 3)
+
+        # now they are all cached
+        self.assertEqual(open_ended_notifications.bulk_combined_notifications(pairs), results)
+        self.assertEqual(len(self.controller.requests), 3)
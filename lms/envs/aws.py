@@ -141,6 +141,10 @@ SESSION_ENGINE = ENV_TOKENS.get('SESSION_ENGINE', SESSION_ENGINE)
 SESSION_COOKIE_DOMAIN = ENV_TOKENS.get('SESSION_COOKIE_DOMAIN')
 REGISTRATION_OPTIONAL_FIELDS = ENV_TOKENS.get('REGISTRATION_OPTIONAL_FIELDS', REGISTRATION_OPTIONAL_FIELDS)
 
+MAKO_PRECOMPILED_DIR = ENV_TOKENS.get('MAKO_PRECOMPILED_DIR', MAKO_PRECOMPILED_DIR)
+MAKO_FILESYSTEM_CHECKS = ENV_TOKENS.get('MAKO_FILESYSTEM_CHECKS', MAKO_FILESYSTEM_CHECKS)
+MAKO_PRELOAD_TEMPLATES = ENV_TOKENS.get('MAKO_PRELOAD_TEMPLATES', MAKO_PRELOAD_TEMPLATES)
+
 CMS_BASE = ENV_TOKENS.get('CMS_BASE', 'studio.edx.org')
 
 # allow for environments to specify what cookie name our login subsystem should use
@@ -181,6 +185,8 @@ BULK_EMAIL_MAX_RETRIES = ENV_TOKENS.get('BULK_EMAIL_MAX_RETRIES', BULK_EMAIL_MAX
 BULK_EMAIL_INFINITE_RETRY_CAP = ENV_TOKENS.get('BULK_EMAIL_INFINITE_RETRY_CAP', BULK_EMAIL_INFINITE_RETRY_CAP)
 BULK_EMAIL_LOG_SENT_EMAILS = ENV_TOKENS.get('BULK_EMAIL_LOG_SENT_EMAILS', BULK_EMAIL_LOG_SENT_EMAILS)
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = ENV_TOKENS.get('BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS', BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS)
+BULK_EMAIL_MAX_SENDS_PER_SECOND = ENV_TOKENS.get('BULK_EMAIL_MAX_SENDS_PER_SECOND', BULK_EMAIL_MAX_SENDS_PER_SECOND)
+BULK_EMAIL_CONNECTION_POOL_SIZE = ENV_TOKENS.get('BULK_EMAIL_CONNECTION_POOL_SIZE', BULK_EMAIL_CONNECTION_POOL_SIZE)
 # We want Bulk Email running on the high-priority queue, so we define the
 # routing key that points to it.  At the moment, the name is the same.
 # We have to reset the value here, since we have changed the value of the queue name.
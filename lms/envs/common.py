@@ -136,6 +136,10 @@ FEATURES = {
     # Staff Debug tool.
     'ENABLE_STUDENT_HISTORY_VIEW': True,
 
+    # Store the StudentModuleHistory of problems as compressed diffs against
+    # periodic full snapshots, rather than as full copies of the state.
+    'ENABLE_STUDENT_HISTORY_DELTAS': False,
+
     # segment.io for LMS--need to explicitly turn it on for production.
     'SEGMENT_IO_LMS': False,
 
@@ -256,6 +260,14 @@ MAKO_TEMPLATES['main'] = [PROJECT_ROOT / 'templates',
                           COMMON_ROOT / 'lib' / 'capa' / 'capa' / 'templates',
                           COMMON_ROOT / 'djangoapps' / 'pipeline_mako' / 'templates']
 
+# When set, the compiled templates are kept in a subdirectory of this directory for the version of the
+# templates, which the precompile_templates management command fills in ahead of time.
+MAKO_PRECOMPILED_DIR = None
+# Turn off to compile (or load) each template once, without checking whether it has changed on each lookup.
+MAKO_FILESYSTEM_CHECKS = True
+# The uris of the templates of each namespace to load when the process starts, e.g. {'main': ['main.html']}
+MAKO_PRELOAD_TEMPLATES = {}
+
 # This is where Django Template lookup is defined. There are a few of these
 # still left lying around.
 TEMPLATE_DIRS = [
@@ -910,6 +922,15 @@ BULK_EMAIL_LOG_SENT_EMAILS = False
 # parallel, and what the SES rate is.
 BULK_EMAIL_RETRY_DELAY_BETWEEN_SENDS = 0.02
 
+# Maximum number of bulk email messages to send per second, over all the workers
+# sharing the default cache.  When set, this replaces the delay above.  0 means
+# there is no limit.
+BULK_EMAIL_MAX_SENDS_PER_SECOND = 0
+
+# Number of connections to the email backend each worker keeps open between
+# bulk email tasks.  0 opens a new connection for each task.
+BULK_EMAIL_CONNECTION_POOL_SIZE = 0
+
 
 
 ################################### APPS ######################################
@@ -1075,6 +1096,11 @@ REGISTRATION_OPTIONAL_FIELDS = set([
     'goals',
 ])
 
+###################### Persisted Grades ######################
+# Persisted grades are recomputed once they are this old (in seconds), as
+# changes in course access don't mark them stale
+PERSISTED_GRADES_MAX_AGE = 24 * 60 * 60
+
 ###################### Grade Downloads ######################
 GRADES_DOWNLOAD_ROUTING_KEY = HIGH_MEM_QUEUE
 
@@ -40,6 +40,9 @@ FEATURES['ENABLE_SHOPPING_CART'] = True
 FEATURES['ENABLE_S3_GRADE_DOWNLOADS'] = True
 FEATURES['ALLOW_COURSE_STAFF_GRADE_DOWNLOADS'] = True
 
+# The benchmarks among the tests time things rather than test them; so, they are only run when asked for
+FEATURES['RUN_BENCHMARKS'] = 'RUN_BENCHMARKS' in os.environ
+
 # Need wiki for courseware views to work. TODO (vshnayder): shouldn't need it.
 WIKI_ENABLED = True
 